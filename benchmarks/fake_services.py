@@ -0,0 +1,298 @@
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# A silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono. Each frame holds
+# 1152 samples; an all-zero side info block decodes to silence, so audio of
+# any length can be produced without an encoder.
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+# Speaking rate used to size synthetic speech and transcripts
+WORDS_PER_SECOND = 2.5
+
+# Made-up speaker IDs returned by the fake speech-to-text, in turn order
+SPEAKER_IDS = ["speaker_0", "speaker_1", "speaker_2"]
+
+
+def synthetic_mp3(seconds):
+    """Silent MP3 bytes lasting about `seconds`."""
+    return MP3_FRAME * max(1, int(seconds / MP3_FRAME_SECONDS))
+
+
+def mp3_duration(data):
+    """Duration of MP3 bytes made of fixed-size frames like `synthetic_mp3`'s."""
+    return len(data) // len(MP3_FRAME) * MP3_FRAME_SECONDS
+
+
+class ServiceSettings:
+    """
+    Behaviour of one fake service.
+
+    Args:
+        latency (float, optional): Seconds added to every request
+        latency_per_kb (float, optional): Extra seconds per KB of request or response body
+        max_concurrent (int, optional): Requests above this many in flight get a 429
+        error_rate (float, optional): Fraction of requests answered with a 429 anyway
+        retry_after (float, optional): Value of the Retry-After header sent with 429s
+    """
+
+    def __init__(self, latency=0.0, latency_per_kb=0.0, max_concurrent=None, error_rate=0.0, retry_after=1.0):
+        self.latency = latency
+        self.latency_per_kb = latency_per_kb
+        self.max_concurrent = max_concurrent
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+
+class FakeServices:
+    """
+    Local stand-ins for the OpenAI, ElevenLabs and Transistor.fm APIs.
+
+    One HTTP server answers all three under /openai, /elevenlabs and
+    /transistor. `env()` returns the environment variables that point the
+    tools (and the official SDKs) at it:
+
+        with FakeServices(elevenlabs=ServiceSettings(latency=0.3, max_concurrent=4)) as services:
+            subprocess.run([...], env=dict(os.environ, **services.env()))
+    """
+
+    def __init__(self, openai=None, elevenlabs=None, transistor=None, seed=0, ranged_uploads=True):
+        self.settings = {
+            "openai": openai or ServiceSettings(),
+            "elevenlabs": elevenlabs or ServiceSettings(),
+            "transistor": transistor or ServiceSettings(),
+        }
+        self.requests = {}
+        self.rejected = {}
+        self._in_flight = {name: 0 for name in self.settings}
+        # Like resumable storage APIs when True, like a plain pre-signed S3 PUT when False
+        self.ranged_uploads = ranged_uploads
+        self.uploads = {}
+        self._episode_ids = iter(range(100000, 10 ** 9))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/openai/v1",
+            "OPENAI_API_KEY": "fake-openai-key",
+            "OPENAI_MODEL": "fake-model",
+            "ELEVEN_LABS_BASE_URL": f"{self.url}/elevenlabs",
+            "ELEVEN_LABS_API_KEY": "fake-elevenlabs-key",
+            "TRANSISTOR_FM_API_URL": f"{self.url}/transistor/v1",
+            "TRANSISTOR_FM_API_KEY": "fake-transistor-key",
+            "TRANSISTOR_FM_SHOW_ID": "1",
+            "NARRATOR_VOICE_ID": "fake-narrator",
+            "LEO_VOICE_ID": "fake-leo",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def stats(self):
+        """Requests served and rejected with a 429, per endpoint."""
+        with self._lock:
+            return {"requests": dict(self.requests), "rejected": dict(self.rejected)}
+
+    def _admit(self, service, endpoint):
+        """Count a request and decide whether it is rate limited."""
+        settings = self.settings[service]
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            over_limit = settings.max_concurrent is not None and self._in_flight[service] >= settings.max_concurrent
+            if over_limit or self._random.random() < settings.error_rate:
+                self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+                return False
+            self._in_flight[service] += 1
+            return True
+
+    def _release(self, service):
+        with self._lock:
+            self._in_flight[service] -= 1
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PUT(self):
+                self._dispatch("PUT")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+            def _dispatch(self, method):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                parsed = urlparse(self.path)
+                service = parsed.path.strip("/").split("/")[0]
+                route = services._route(method, parsed.path)
+                if service not in services.settings or route is None:
+                    return self._send(404, {"error": f"No fake endpoint for {method} {parsed.path}"})
+
+                endpoint, handler = route
+                settings = services.settings[service]
+                if not services._admit(service, endpoint):
+                    return self._send(429, {"error": "rate_limited"}, headers={"Retry-After": str(settings.retry_after)})
+                try:
+                    status, payload, content_type, *headers = handler(self, parsed, body)
+                    size = len(body) + (len(payload) if isinstance(payload, bytes) else 0)
+                    time.sleep(settings.latency + settings.latency_per_kb * size / 1024)
+                finally:
+                    services._release(service)
+                self._send(status, payload, content_type=content_type, headers=headers[0] if headers else None)
+
+            def _send(self, status, payload, content_type="application/json", headers=None):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def _route(self, method, path):
+        routes = [
+            ("POST", r"/openai/v1/chat/completions", "openai.chat", self._chat_completion),
+            ("POST", r"/elevenlabs/v1/text-to-speech/[^/]+", "elevenlabs.text_to_speech", self._text_to_speech),
+            ("POST", r"/elevenlabs/v1/sound-generation", "elevenlabs.sound_effect", self._sound_effect),
+            ("POST", r"/elevenlabs/v1/speech-to-text", "elevenlabs.speech_to_text", self._speech_to_text),
+            ("GET", r"/transistor/v1/episodes/authorize_upload", "transistor.authorize_upload", self._authorize_upload),
+            ("PUT", r"/transistor/uploads/.+", "transistor.upload_audio", self._upload_audio),
+            ("POST", r"/transistor/v1/episodes", "transistor.create_episode", self._create_episode),
+            ("PATCH", r"/transistor/v1/episodes/[^/]+/publish", "transistor.publish_status", self._publish_status),
+            ("PATCH", r"/transistor/v1/episodes/[^/]+", "transistor.update_episode", self._update_episode),
+        ]
+        for route_method, pattern, endpoint, handler in routes:
+            if method == route_method and re.fullmatch(pattern, path):
+                return endpoint, handler
+        return None
+
+    # OpenAI
+
+    def _chat_completion(self, request, parsed, body):
+        messages = json.loads(body)["messages"]
+        system_prompt = messages[0]["content"] if messages else ""
+        if "speaker_mapping" in system_prompt:
+            content = json.dumps({"speaker_mapping": {"speaker_0": "Narrator", "speaker_1": "Leo", "speaker_2": "Guest"}})
+        elif '"linkedin"' in system_prompt:
+            content = json.dumps({"linkedin": "A new episode is out.", "x": "A new episode is out."})
+        else:
+            content = "Solo cello and harpsichord, slow and warm, 15 seconds, no vocals."
+        prompt_tokens = sum(len(message["content"].split()) for message in messages)
+        return 200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake-model",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content.split()),
+                      "total_tokens": prompt_tokens + len(content.split())},
+        }, "application/json"
+
+    # ElevenLabs
+
+    def _text_to_speech(self, request, parsed, body):
+        text = json.loads(body)["text"]
+        return 200, synthetic_mp3(len(text.split()) / WORDS_PER_SECOND), "audio/mpeg"
+
+    def _sound_effect(self, request, parsed, body):
+        duration = json.loads(body).get("duration_seconds") or 5.0
+        return 200, synthetic_mp3(float(duration)), "audio/mpeg"
+
+    def _speech_to_text(self, request, parsed, body):
+        # The multipart body is mostly the audio file; its size is enough to size the transcript
+        seconds = len(body) / len(MP3_FRAME) * MP3_FRAME_SECONDS
+        words = []
+        for i in range(int(seconds * WORDS_PER_SECOND)):
+            start = i / WORDS_PER_SECOND
+            words.append({"text": f"word{i}", "type": "word", "start": start, "end": start + 0.3,
+                          "speaker_id": SPEAKER_IDS[(i // 40) % len(SPEAKER_IDS)], "logprob": 0.0})
+        return 200, {
+            "language_code": "en",
+            "language_probability": 1.0,
+            "text": " ".join(word["text"] for word in words),
+            "words": words,
+        }, "application/json"
+
+    # Transistor.fm
+
+    def _authorize_upload(self, request, parsed, body):
+        filename = parse_qs(parsed.query).get("filename", ["audio.mp3"])[0]
+        return 200, {"data": {"attributes": {
+            "upload_url": f"{self.url}/transistor/uploads/{filename}",
+            "audio_url": f"{self.url}/transistor/audio/{filename}",
+            "content_type": "audio/mpeg",
+        }}}, "application/json"
+
+    def _upload_audio(self, request, parsed, body):
+        content_range = request.headers.get("Content-Range")
+        if not (self.ranged_uploads and content_range):
+            with self._lock:
+                self.uploads[parsed.path] = bytearray(body)
+            return 200, b"", "text/plain"
+        # "bytes START-END/TOTAL" appends a chunk, "bytes */TOTAL" asks how much was received
+        span, total = content_range.split(" ", 1)[1].split("/")
+        with self._lock:
+            received = self.uploads.setdefault(parsed.path, bytearray())
+            if span != "*":
+                start = int(span.split("-")[0])
+                if start > len(received):
+                    return 416, {"error": f"Chunk starts at {start}, {len(received)} bytes received"}, "application/json"
+                received[start:] = body
+            size = len(received)
+        if size >= int(total):
+            return 200, b"", "text/plain"
+        return 308, b"", "text/plain", {"Range": f"bytes=0-{size - 1}"} if size else {}
+
+    def _create_episode(self, request, parsed, body):
+        episode = json.loads(body)["episode"]
+        with self._lock:
+            episode_id = str(next(self._episode_ids))
+        return 201, {"data": {"id": episode_id, "type": "episode", "attributes": dict(episode, status="draft")}}, "application/json"
+
+    def _update_episode(self, request, parsed, body):
+        episode_id = parsed.path.strip("/").split("/")[-1]
+        return 200, {"data": {"id": episode_id, "type": "episode", "attributes": json.loads(body)["episode"]}}, "application/json"
+
+    def _publish_status(self, request, parsed, body):
+        episode_id = parsed.path.strip("/").split("/")[-2]
+        return 200, {"data": {"id": episode_id, "type": "episode", "attributes": json.loads(body)["episode"]}}, "application/json"
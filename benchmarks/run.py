@@ -0,0 +1,146 @@
+"""
+Offline benchmark suite.
+
+Starts local stand-ins for OpenAI, ElevenLabs and Transistor.fm, runs each
+scenario at each script size in a fresh process, and reports wall time and
+peak memory. Results are compared with benchmarks/baselines.json and any
+scenario slower or bigger than its baseline by more than the tolerance is
+flagged as a regression (exit code 1).
+
+Usage:
+    python benchmarks/run.py                                  # every scenario, 20 to 1000 lines
+    python benchmarks/run.py --scenarios audio_assembly --lines 100 500
+    python benchmarks/run.py --tts-latency 0.4 --max-concurrent 4 --error-rate 0.05
+    python benchmarks/run.py --save-baseline                  # record the current numbers
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_services import FakeServices, ServiceSettings
+from scenarios import SCENARIOS
+
+DEFAULT_LINES = [20, 100, 500, 1000]
+BASELINES_PATH = os.path.join(BENCHMARKS_DIR, "baselines.json")
+# Allowed slowdown or memory growth over the baseline before flagging a regression
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are measurement noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.5
+MIN_RSS_DELTA_MB = 20
+
+
+def run_once(scenario, lines, env):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{scenario}-{lines}-")
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.join(BENCHMARKS_DIR, "scenarios.py"), scenario, str(lines), workdir],
+            env=env, capture_output=True, text=True
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{scenario} ({lines} lines) failed:\n{completed.stderr[-3000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(scenario, lines, env, repeat):
+    """Median time and maximum peak RSS of `repeat` runs."""
+    runs = [run_once(scenario, lines, env) for _ in range(repeat)]
+    return {
+        "seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "children_peak_rss_mb": max(run["children_peak_rss_mb"] for run in runs),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Names of the metrics of `result` that regressed against `baseline`."""
+    regressions = []
+    if result["seconds"] > baseline["seconds"] * (1 + tolerance) and result["seconds"] - baseline["seconds"] > MIN_SECONDS_DELTA:
+        regressions.append("time")
+    if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance) and result["peak_rss_mb"] - baseline["peak_rss_mb"] > MIN_RSS_DELTA_MB:
+        regressions.append("memory")
+    return regressions
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--lines", nargs="+", type=int, default=DEFAULT_LINES, help="Script sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark (the median time is kept)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every fake API request")
+    parser.add_argument("--tts-latency", type=float, help="Seconds added to ElevenLabs requests (defaults to --latency)")
+    parser.add_argument("--max-concurrent", type=int, help="Concurrent requests per service before the fakes answer 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429 anyway")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--baseline", default=BASELINES_PATH, help="Baselines file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed regression ratio")
+    args = parser.parse_args()
+
+    def settings(latency):
+        return ServiceSettings(latency=latency, max_concurrent=args.max_concurrent,
+                               error_rate=args.error_rate, retry_after=args.retry_after)
+
+    services = FakeServices(
+        openai=settings(args.latency),
+        elevenlabs=settings(args.latency if args.tts_latency is None else args.tts_latency),
+        transistor=settings(args.latency),
+    )
+    baselines = load_baselines(args.baseline)
+    results = {}
+    regressed = []
+
+    print(f"{'BENCHMARK':<28}{'TIME s':>9}{'BASE s':>9}{'RSS MB':>9}{'BASE MB':>9}{'CHILD MB':>11}  STATUS")
+    with services:
+        env = dict(os.environ, **services.env())
+        for scenario in args.scenarios:
+            for lines in args.lines:
+                key = f"{scenario}/{lines}"
+                result = run_benchmark(scenario, lines, env, args.repeat)
+                results[key] = result
+                baseline = baselines.get(key)
+                status = "new"
+                if baseline:
+                    regressions = compare(result, baseline, args.tolerance)
+                    status = "REGRESSED (" + ", ".join(regressions) + ")" if regressions else "ok"
+                    if regressions:
+                        regressed.append(key)
+                print(f"{key:<28}{result['seconds']:>9.2f}{baseline['seconds'] if baseline else float('nan'):>9.2f}"
+                      f"{result['peak_rss_mb']:>9.1f}{baseline['peak_rss_mb'] if baseline else float('nan'):>9.1f}"
+                      f"{result['children_peak_rss_mb']:>11.1f}  {status}")
+        stats = services.stats()
+
+    print(f"\nFake API requests: {sum(stats['requests'].values())} "
+          f"({sum(stats['rejected'].values())} answered with 429)")
+    for endpoint, count in sorted(stats["requests"].items()):
+        print(f"  {endpoint:<32}{count:>8}{stats['rejected'].get(endpoint, 0):>8} rejected")
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaselines saved to {args.baseline}")
+
+    if regressed:
+        print(f"\n❌ Regressions: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
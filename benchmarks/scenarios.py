@@ -0,0 +1,180 @@
+"""
+Benchmark scenarios, each run in its own process by benchmarks/run.py.
+
+Usage: python benchmarks/scenarios.py <scenario> <lines> <workdir>
+
+Prints one JSON line with the scenario's wall time and peak memory. The
+environment must point the tools at FakeServices (see run.py).
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), "src"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_services import synthetic_mp3, WORDS_PER_SECOND
+
+GUEST_NAME = "Benchmark Guest"
+GUEST_VOICE_ID = "fake-guest"
+
+# Share of script lines in each section (the rest is the conversation)
+INTRO_LINES = 2
+ARRIVAL_LINES = 2
+OUTRO_LINES = 2
+# One sound effect every this many conversation lines
+SFX_EVERY = 25
+
+WORDS = ("time machine candle letter empire river question library engine future "
+         "war peace science poem voyage crown map star ocean idea journey court").split()
+
+
+def make_script(lines, seed=0):
+    """
+    Deterministic synthetic script with `lines` items across all sections.
+
+    Line lengths follow a real episode (20 to 120 words) and a sound effect
+    is placed every SFX_EVERY conversation lines.
+    """
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))).capitalize() + "."
+
+    conversation_lines = max(1, lines - INTRO_LINES - ARRIVAL_LINES - OUTRO_LINES)
+    conversation = []
+    for i in range(conversation_lines):
+        if i and i % SFX_EVERY == 0:
+            conversation.append({"speaker": "SFX", "text": f"Distant {rng.choice(WORDS)} sounds, softly.", "duration": 4})
+        else:
+            conversation.append({"speaker": "Leo" if i % 2 == 0 else GUEST_NAME, "text": sentence()})
+
+    return {
+        "title": f"Benchmark episode ({lines} lines)",
+        "description": "Synthetic episode used by the benchmark suite.",
+        "historical_figure": GUEST_NAME,
+        "time_period": "Any time",
+        "location": "Anywhere",
+        "intro": [{"speaker": "Narrator", "text": sentence()}, {"speaker": "SFX", "text": "Clock ticking.", "duration": 5}],
+        "arrival_scene": [{"speaker": "Narrator", "text": sentence()}, {"speaker": "SFX", "text": "Door creaks.", "duration": 3}],
+        "conversation": conversation,
+        "outro": [{"speaker": "Leo", "text": sentence()}, {"speaker": "Narrator", "text": sentence()}],
+    }
+
+
+def write_episode_files(lines, workdir):
+    """Write the script and background research of a synthetic episode; returns (script_path, research_path)."""
+    folder = os.path.join(workdir, "output", GUEST_NAME.replace(" ", "_"))
+    os.makedirs(folder, exist_ok=True)
+    script_path = os.path.join(folder, "script.json")
+    with open(script_path, 'w', encoding='utf-8') as f:
+        json.dump(make_script(lines), f, indent=2)
+    research_path = os.path.join(folder, "background_research.txt")
+    with open(research_path, 'w', encoding='utf-8') as f:
+        f.write("Synthetic background research.\n" * 50)
+    return script_path, research_path
+
+
+def scenario_audio(episode, workdir):
+    """Synthesize every segment against the fake ElevenLabs, then assemble the mix."""
+    from tools import audio
+    return lambda: audio.generate_podcast_audio(episode, GUEST_VOICE_ID, episode.output_dir)
+
+
+def scenario_audio_assembly(episode, workdir):
+    """Assemble the mix from an already complete segment cache (decode, fades, concatenation, export)."""
+    from tools import audio
+    audio.generate_podcast_audio(episode, GUEST_VOICE_ID, episode.output_dir)
+    return lambda: audio.generate_podcast_audio(episode, GUEST_VOICE_ID, episode.output_dir)
+
+
+def scenario_transcript(episode, workdir):
+    """Build the VTT transcript from the fake speech-to-text of an episode-length file."""
+    from tools import transcript
+    audio_path = os.path.join(episode.output_dir, "audio.mp3")
+    with open(audio_path, 'wb') as f:
+        f.write(synthetic_mp3(episode.word_count / WORDS_PER_SECOND))
+    return lambda: transcript.generate_vtt_from_audio(episode, audio_path)
+
+
+def scenario_pipeline(episode, workdir):
+    """Run the whole non-interactive pipeline, from the script to a draft publication."""
+    import main
+    args = argparse.Namespace(
+        character_name=GUEST_NAME,
+        background_research_path=os.path.join(episode.output_dir, "background_research.txt"),
+        script_path=episode.script_path,
+        guest_voice_id=GUEST_VOICE_ID,
+        audio_path=None,
+        transcript_path=None,
+        social_media_path=None,
+        non_interactive=True,
+        image_path=None,
+        publish_status="draft",
+        published_at=None,
+        max_workers=4,
+        force=[],
+        batch=None,
+        batch_workers=1,
+    )
+    return lambda: main.run_pipeline(args)
+
+
+SCENARIOS = {
+    "audio": scenario_audio,
+    "audio_assembly": scenario_audio_assembly,
+    "transcript": scenario_transcript,
+    "pipeline": scenario_pipeline,
+}
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(who).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scenario(name, lines, workdir):
+    """
+    Prepare and time one scenario in the current process.
+
+    Returns:
+        dict: seconds, peak_rss_mb (this process) and children_peak_rss_mb (ffmpeg)
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    from tools.episode_metadata import load_episode
+
+    script_path, _ = write_episode_files(lines, ".")
+    episode = load_episode(script_path)
+    work = SCENARIOS[name](episode, workdir)
+
+    start = time.perf_counter()
+    work()
+    seconds = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "lines": lines,
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "children_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one benchmark scenario")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("lines", type=int)
+    parser.add_argument("workdir")
+    args = parser.parse_args()
+
+    # Keep the tools' progress output out of the result line
+    result_stream = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    result = run_scenario(args.scenario, args.lines, os.path.abspath(args.workdir))
+    result_stream.write(json.dumps(result) + "\n")
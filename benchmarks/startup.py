@@ -0,0 +1,65 @@
+"""
+CLI startup benchmark.
+
+Measures, in fresh processes, how long each single-stage command takes to get
+ready to work: starting the interpreter, importing main.py and the one tool
+the command uses. This is compared with importing every tool up front, which
+is what main.py did before the subcommands.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeat 20 --commands render publish
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Tool modules each command imports
+COMMAND_TOOLS = {
+    "script": ["discussion_script"],
+    "voice": ["voice_design"],
+    "render": ["audio"],
+    "transcribe": ["transcript"],
+    "social": ["social_media"],
+    "publish": ["publication"],
+    "artwork": ["artwork"],
+}
+# Tools main.py used to import at startup, whatever the command
+EAGER_TOOLS = ["voice_design", "discussion_script", "audio", "publication", "transcript", "background_search", "social_media"]
+
+
+def startup_seconds(tools, repeat):
+    """Median wall time of a fresh interpreter importing main and `tools`."""
+    code = "import main\n" + "".join(f"from tools import {tool}\n" for tool in tools)
+    timings = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", f"import time\nstart = time.perf_counter()\n{code}print(time.perf_counter() - start)"],
+            cwd=SRC_DIR, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {', '.join(tools) or 'main'} failed:\n{completed.stderr[-3000:]}")
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time per command")
+    parser.add_argument("--commands", nargs="+", choices=sorted(COMMAND_TOOLS), default=list(COMMAND_TOOLS))
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per measurement (the median is kept)")
+    args = parser.parse_args()
+
+    eager = startup_seconds(EAGER_TOOLS, args.repeat)
+    print(f"{'COMMAND':<14}{'IMPORTS ms':>12}{'EAGER ms':>12}{'SPEEDUP':>10}")
+    print(f"{'(parse only)':<14}{startup_seconds([], args.repeat) * 1000:>12.0f}{eager * 1000:>12.0f}")
+    for command in args.commands:
+        seconds = startup_seconds(COMMAND_TOOLS[command], args.repeat)
+        print(f"{command:<14}{seconds * 1000:>12.0f}{eager * 1000:>12.0f}{eager / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import argparse
 import os
-from tools import voice_design
-from tools import discussion_script
-from tools import audio
-from tools import publication
-from tools import transcript
-from tools import background_search
-from tools import social_media
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tools import episode_metadata
+from tools.tracing import tracer
+from tools.clients import load_config
 import json
 
+# Tools are imported by the commands that use them, so that a single-stage
+# command does not pay for loading openai, elevenlabs, pydub and numpy.
+
 
 def print_header(text):
     """Print a formatted header."""
@@ -22,9 +24,443 @@ def print_step(number, title, total=8):
     print_header(f"STEP {number}/{total}: {title}")
 
 
-def main():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Time Traveler Podcast Generator")
+def build_pipeline(args, episode_folder, listener=None):
+    """
+    Declare the unattended episode pipeline as a graph of stages.
+    
+    Each stage lists the artifacts it needs and produces, so independent
+    stages (voice design and script generation, social media and audio,
+    upload and transcription) run at the same time. Each stage also lists
+    the model names and prompt templates its output depends on, so a stage
+    whose inputs are unchanged since its last run is skipped.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+        episode_folder (str): The episode output folder
+        listener (callable, optional): Called with (pipeline, stage_name, event) as stages progress
+    
+    Returns:
+        Pipeline: The pipeline, ready to run
+    """
+    # Before the tools are imported: their settings are read from the environment when they load
+    load_config()
+    from tools import discussion_script, voice_design, audio, music, social_media, transcript, publication
+    from tools import audio_qa, loudness, ssml_formatting
+    from tools.pipeline import Pipeline, Stage
+    from tools.manifest import ManifestStore
+
+    openai_model = os.getenv("OPENAI_MODEL")
+    research_path = args.background_research_path or f"{episode_folder}/background_research.txt"
+
+    def read_if_exists(path, loader):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            return loader(file)
+
+    def load_research():
+        with open(research_path, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def write_script(character_name, background_research):
+        script_path = discussion_script.generate_podcast_script(
+            historical_figure=character_name,
+            background_research=background_research,
+            previous_episodes_character_names=os.listdir("output"),
+            interactive=False
+        )
+        return episode_metadata.load_episode(script_path)
+
+    def existing_script(**inputs):
+        script_path = f"{episode_folder}/script.json"
+        return episode_metadata.load_episode(script_path) if os.path.exists(script_path) else None
+
+    def design_voice(character_name):
+        guest_voice_id, _ = voice_design.generate_voice(character_name=character_name, interactive=False)
+        return guest_voice_id
+
+    def existing_voice(**inputs):
+        return read_if_exists(f"{episode_folder}/voice_id.json", lambda file: json.load(file)["voice_id"])
+
+    def render_audio(episode, guest_voice_id):
+        return audio.process_script_to_audio(episode, guest_voice_id)
+
+    def write_music_prompt(episode):
+        return music.generate_music_prompt(episode, interactive=False)
+
+    def existing_music_prompt(**inputs):
+        return read_if_exists(f"{episode_folder}/music_prompt.txt", lambda file: file.read())
+
+    def write_social_media_posts(episode, background_research):
+        _, social_media_path = social_media.generate_social_media_posts(
+            episode=episode,
+            background_research=background_research,
+            interactive=False
+        )
+        return social_media_path
+
+    def existing_social_media_posts(**inputs):
+        path = f"{episode_folder}/social_media_posts.json"
+        return path if os.path.exists(path) else None
+
+    def transcribe(episode, audio_path):
+        return transcript.generate_vtt_from_audio(episode, audio_path)
+
+    def existing_transcript(**inputs):
+        path = f"{episode_folder}/transcript.vtt"
+        return path if os.path.exists(path) else None
+
+    def upload(audio_path):
+        return publication.upload_episode_audio(audio_path)
+
+    def existing_upload(audio_path):
+        # An earlier upload is only reused while it is of the current audio file
+        state = publication.load_upload_state(audio_path)
+        return state["audio_url"] if state and state.get("completed") else None
+
+    def make_artwork():
+        from tools import artwork
+        return artwork.prepare_artwork(args.image_path)
+
+    def publish(episode, audio_path, audio_url, transcript_path, artwork=None):
+        # The artwork variants are ready (cached) by now: publish_episode only picks and uploads the cover
+        result = publication.publish_episode(
+            episode=episode,
+            audio_path=audio_path,
+            audio_url=audio_url,
+            transcript_path=transcript_path,
+            image_path=args.image_path,
+            publish_status=args.publish_status,
+            published_at=args.published_at
+        )
+        return result["data"]["id"]
+
+    def existing_publication(**inputs):
+        details = read_if_exists(f"{episode_folder}/publishing_details.json", json.load)
+        # Only adopted as published the way it is requested now: otherwise the stage updates the episode
+        if not details or details.get("status") != args.publish_status:
+            return None
+        if args.published_at and details.get("published_at") != args.published_at:
+            return None
+        return details["episode_id"]
+
+    stages = [
+        Stage("research", load_research, outputs=["background_research"], manifest=False),
+        Stage("script", write_script, inputs=["character_name", "background_research"], outputs=["episode"], resource="openai",
+              extra_inputs={"model": openai_model, "prompt": "src/prompts/script_generation.hbr"}, existing=existing_script),
+        Stage("voice", design_voice, inputs=["character_name"], outputs=["guest_voice_id"], resource="elevenlabs",
+              extra_inputs={"model": openai_model}, existing=existing_voice),
+        Stage("audio", render_audio, inputs=["episode", "guest_voice_id"], outputs=["audio_path"], resource="elevenlabs",
+              extra_inputs={"model": audio.TTS_MODEL_ID, "format": audio.TTS_OUTPUT_FORMAT,
+                            "narrator_voice_id": os.getenv("NARRATOR_VOICE_ID"), "leo_voice_id": os.getenv("LEO_VOICE_ID"),
+                            "music": music.find_music(episode_folder), "music_sections": music.MUSIC_SECTIONS,
+                            # Lexicon files are fingerprinted by content: editing a pronunciation re-renders
+                            "lexicon": ssml_formatting.GLOBAL_LEXICON_PATH,
+                            "episode_lexicon": os.path.join(episode_folder, ssml_formatting.EPISODE_LEXICON_FILE),
+                            "emphasis": ssml_formatting.EMPHASIS_STYLE, "loudness_target": loudness.TARGET_LUFS,
+                            "qa": [audio_qa.QA_ENABLED, audio_qa.QA_MAX_RETRIES, audio_qa.QA_RETRY_BUDGET],
+                            "renditions": audio.ENABLED_RENDITIONS}),
+        Stage("music", write_music_prompt, inputs=["episode"], outputs=["music_prompt"], resource="openai",
+              extra_inputs={"model": openai_model}, existing=existing_music_prompt),
+        Stage("social", write_social_media_posts, inputs=["episode", "background_research"], outputs=["social_media_path"], resource="openai",
+              extra_inputs={"model": openai_model}, existing=existing_social_media_posts),
+        Stage("transcript", transcribe, inputs=["episode", "audio_path"], outputs=["transcript_path"], resource="elevenlabs",
+              extra_inputs={"model": transcript.STT_MODEL_ID, "speaker_model": openai_model}, existing=existing_transcript),
+    ]
+    if args.image_path:
+        # Variants are cached by the artwork module itself
+        stages.append(Stage("artwork", make_artwork, outputs=["artwork"], manifest=False))
+    if args.publish_status:
+        stages += [
+            Stage("upload", upload, inputs=["audio_path"], outputs=["audio_url"], resource="transistor", existing=existing_upload),
+            Stage("publish", publish, inputs=["episode", "audio_path", "audio_url", "transcript_path"] + (["artwork"] if args.image_path else []),
+                  outputs=["episode_id"], resource="transistor",
+                  extra_inputs={"status": args.publish_status, "published_at": args.published_at, "image": args.image_path},
+                  existing=existing_publication),
+        ]
+    return Pipeline(stages, max_workers=args.max_workers, manifests=ManifestStore(episode_folder), force=args.force, listener=listener)
+
+
+def run_pipeline(args, listener=None, trace=True):
+    """Produce an episode without prompts, running independent stages in parallel."""
+    if not args.character_name:
+        raise SystemExit("--character-name is required with --non-interactive")
+
+    episode_folder = f"output/{args.character_name.replace(' ', '_')}"
+    os.makedirs(episode_folder, exist_ok=True)
+
+    # Artifacts given on the command line skip the stages that produce them
+    context = {"character_name": args.character_name}
+    if args.script_path:
+        context["episode"] = episode_metadata.load_episode(args.script_path)
+    if args.guest_voice_id:
+        context["guest_voice_id"] = args.guest_voice_id
+    if args.audio_path:
+        context["audio_path"] = args.audio_path
+    if args.transcript_path:
+        context["transcript_path"] = args.transcript_path
+    if args.social_media_path:
+        context["social_media_path"] = args.social_media_path
+
+    print_header(f"PRODUCING EPISODE: {args.character_name}")
+    if trace:
+        tracer.start(f"{episode_folder}/traces", "pipeline")
+    try:
+        context = build_pipeline(args, episode_folder, listener=listener).run(context)
+    finally:
+        if trace:
+            tracer.finish()
+    print_header("PODCAST GENERATION COMPLETE")
+    return context
+
+
+def load_batch(batch_path):
+    """
+    Read the list of episodes to produce in a batch.
+    
+    A `.json` file holds a list of character names or of objects with a
+    `character_name` and optionally `background_research_path`,
+    `guest_voice_id` and `script_path`. Any other file is read as one
+    character name per line, like NEXT_EPISODES_REQUESTS.md.
+    
+    Args:
+        batch_path (str): Path to the batch file
+    
+    Returns:
+        list: One dict per episode
+    """
+    with open(batch_path, 'r', encoding='utf-8') as file:
+        if batch_path.endswith(".json"):
+            entries = json.load(file)
+        else:
+            entries = [line.strip() for line in file if line.strip()]
+    return [{"character_name": entry} if isinstance(entry, str) else entry for entry in entries]
+
+
+def run_batch(args):
+    """
+    Produce several episodes concurrently.
+    
+    Every episode runs its own pipeline, but they all share the process-wide
+    synthesis and encode pools and the per-service rate limits, so API
+    limits hold across the whole batch rather than per episode.
+    """
+    entries = load_batch(args.batch)
+    batch_start = time.perf_counter()
+    lock = threading.Lock()
+    stages_done = {}
+    finished = []
+    failed = []
+
+    def report_progress(character_name, pipeline, stage_name, event):
+        if event == "started":
+            return
+        with lock:
+            stages_done[character_name] = stages_done.get(character_name, 0) + 1
+            print(f"📦 [{len(finished)}/{len(entries)} episodes] {character_name}: {stage_name} {event} "
+                  f"({stages_done[character_name]}/{len(pipeline.stages)} stages)")
+
+    def produce(entry):
+        episode_args = argparse.Namespace(**dict(vars(args), **{
+            "character_name": entry["character_name"],
+            "background_research_path": entry.get("background_research_path"),
+            "guest_voice_id": entry.get("guest_voice_id"),
+            "script_path": entry.get("script_path"),
+            "audio_path": None,
+            "transcript_path": None,
+            "social_media_path": None,
+        }))
+
+        def listener(pipeline, stage_name, event):
+            report_progress(entry["character_name"], pipeline, stage_name, event)
+
+        return run_pipeline(episode_args, listener=listener, trace=False)
+
+    print_header(f"BATCH: {len(entries)} EPISODES")
+    tracer.start("output/traces", "batch")
+    with ThreadPoolExecutor(max_workers=args.batch_workers, thread_name_prefix="episode") as executor:
+        futures = {executor.submit(produce, entry): entry["character_name"] for entry in entries}
+        for future in as_completed(futures):
+            character_name = futures[future]
+            try:
+                future.result()
+                finished.append(character_name)
+                print(f"🎉 [{len(finished)}/{len(entries)} episodes] {character_name} complete")
+            except Exception as e:
+                failed.append(character_name)
+                print(f"❌ {character_name} failed: {e}")
+
+    elapsed_hours = (time.perf_counter() - batch_start) / 3600
+    tracer.finish()
+    print_header("BATCH COMPLETE")
+    print(f"✅ {len(finished)} episodes produced, {len(failed)} failed in {elapsed_hours * 60:.1f} minutes")
+    if finished:
+        print(f"⏱️  Throughput: {len(finished) / elapsed_hours:.1f} episodes per hour")
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+
+
+def read_research(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def command_script(args):
+    from tools import discussion_script
+    research_path = args.background_research_path or f"output/{args.character_name.replace(' ', '_')}/background_research.txt"
+    script_path = discussion_script.generate_podcast_script(
+        historical_figure=args.character_name,
+        background_research=read_research(research_path),
+        previous_episodes_character_names=os.listdir("output") if os.path.isdir("output") else [],
+        interactive=not args.non_interactive
+    )
+    print(f"✅ Script saved at path: {script_path}")
+
+
+def command_voice(args):
+    from tools import voice_design
+    guest_voice_id, voice_file_path = voice_design.generate_voice(args.character_name, interactive=not args.non_interactive, reuse=not args.new)
+    print(f"✅ Voice ID {guest_voice_id} saved at path: {voice_file_path}")
+
+
+def command_render(args):
+    episode = episode_metadata.load_episode(args.script_path)
+    guest_voice_id = args.guest_voice_id or episode.saved_guest_voice_id()
+    if not guest_voice_id:
+        raise SystemExit(f"No voice_id.json in {episode.output_dir}, pass --guest-voice-id")
+    if args.preview:
+        if args.shared_dir:
+            raise SystemExit("Previews are rendered locally, --shared-dir only applies to full renders")
+        from tools import preview
+        audio_path = preview.preview_episode(episode, guest_voice_id, draft=args.draft or bool(args.sections or args.lines),
+                                             sections=args.sections, max_lines=args.lines, play=not args.no_play)
+        print(f"▶️ Preview saved at path: {audio_path}")
+        return
+    if args.draft or args.sections or args.lines:
+        if args.shared_dir:
+            raise SystemExit("Drafts are rendered locally, --shared-dir only applies to full renders")
+        from tools import audio
+        audio_path = audio.render_draft(episode, guest_voice_id, sections=args.sections, max_lines=args.lines)
+        print(f"📝 Draft saved at path: {audio_path}")
+        return
+    if args.shared_dir:
+        from tools import distributed
+        audio_path = distributed.render_distributed(episode, guest_voice_id, args.shared_dir, timeout=args.timeout)
+    else:
+        from tools import audio
+        audio_path = audio.process_script_to_audio(episode, guest_voice_id)
+    print(f"✅ Audio saved at path: {audio_path}")
+
+
+def command_transcribe(args):
+    from tools import transcript
+    episode = episode_metadata.load_episode(args.script_path)
+    audio_path = args.audio_path or f"{episode.output_dir}/audio.mp3"
+    transcript_path = transcript.generate_vtt_from_audio(episode, audio_path, args.output)
+    print(f"✅ Transcript saved at path: {transcript_path}")
+
+
+def command_social(args):
+    from tools import social_media
+    episode = episode_metadata.load_episode(args.script_path)
+    research_path = args.background_research_path or f"{episode.output_dir}/background_research.txt"
+    _, social_media_path = social_media.generate_social_media_posts(
+        episode=episode,
+        background_research=read_research(research_path),
+        interactive=not args.non_interactive
+    )
+    print(f"✅ Social media posts saved at path: {social_media_path}")
+
+
+def command_publish(args):
+    from tools import publication
+    episode = episode_metadata.load_episode(args.script_path)
+    transcript_path = args.transcript_path or f"{episode.output_dir}/transcript.vtt"
+    result = publication.publish_episode(
+        episode=episode,
+        audio_path=args.audio_path or f"{episode.output_dir}/audio.mp3",
+        transcript_path=transcript_path if os.path.exists(transcript_path) else None,
+        image_path=args.image_path,
+        publish_status=args.status,
+        published_at=args.published_at,
+        audio_url=args.audio_url
+    )
+    print(f"🎉 Episode {result['data']['id']} saved with status: {args.status}")
+
+
+def command_artwork(args):
+    from tools import artwork
+    start = time.perf_counter()
+    variants = artwork.prepare_artwork(args.image_path)
+    elapsed = time.perf_counter() - start
+    for name, path in variants.items():
+        print(f"{name:<20}{os.path.getsize(path) / 1024:>8.0f} KB  {path}")
+    print(f"✅ {len(variants)} artwork variants ready in {elapsed:.2f}s, cover to upload: {artwork.choose_cover(variants)}")
+
+
+def command_season(args):
+    from datetime import datetime
+    from tools import publication
+    if args.characters:
+        episodes = [episode_metadata.load_episode(f"output/{name.replace(' ', '_')}/script.json") for name in args.characters]
+    else:
+        episodes = publication.find_ready_episodes()
+    start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    results = publication.publish_season(episodes, publish_status=args.status, start=start, max_workers=args.workers)
+
+    print_header("SEASON PUBLISHED")
+    for result in results:
+        print(f"{result['published_at'] or '-':<26}{result['status']:<11}{result['action']:<9}{result['episode_id']:<12}{result['title']}")
+
+
+def command_worker(args):
+    from tools import distributed
+    store = distributed.SharedStore(args.shared_dir)
+    distributed.Worker(store, threads=args.threads, exit_when_idle=args.exit_when_idle).run()
+
+
+def command_serve(args):
+    from tools import daemon
+    daemon.serve(queue_path=args.queue, host=args.host, port=args.port, socket_path=args.socket, workers=args.workers)
+
+
+def command_submit(args):
+    from tools.daemon import DaemonClient
+    options = ["guest_voice_id", "audio_path", "audio_url", "transcript_path", "image_path", "status", "published_at", "output"]
+    payload = {"script_path": os.path.abspath(args.script_path)}
+    payload.update({name: getattr(args, name) for name in options if getattr(args, name) is not None})
+    for name in ("audio_path", "transcript_path", "image_path", "output"):
+        if name in payload:
+            payload[name] = os.path.abspath(payload[name])
+    job = DaemonClient(args.daemon).submit(args.kind, payload, priority=args.priority)
+    print(f"📥 Job {job['id']} queued ({job['kind']}, priority {job['priority']})")
+
+
+def print_job(job):
+    outcome = job["error"] or (json.dumps(job["result"]) if job["result"] else "")
+    cancelling = " (cancelling)" if job["cancel_requested"] and job["status"] == "running" else ""
+    print(f"{job['id']:>6}  {job['kind']:<11}{job['priority']:>4}  {job['status'] + cancelling:<22}"
+          f"{os.path.basename(os.path.dirname(job['payload'].get('script_path', ''))):<24}{outcome}")
+
+
+def command_jobs(args):
+    from tools.daemon import DaemonClient
+    client = DaemonClient(args.daemon)
+    jobs = [client.get(args.job_id)] if args.job_id else client.list(status=args.status, limit=args.limit)
+    print(f"{'ID':>6}  {'KIND':<11}{'PRI':>4}  {'STATUS':<22}{'EPISODE':<24}RESULT")
+    for job in jobs:
+        print_job(job)
+
+
+def command_cancel(args):
+    from tools.daemon import DaemonClient
+    print_job(DaemonClient(args.daemon).cancel(args.job_id))
+
+
+def add_pipeline_arguments(parser):
+    """Options shared by the default flow and the `run` command."""
     parser.add_argument("--character-name", help="Name of the historical character")
     parser.add_argument("--background-research-path", help="Path to the background research file")
     parser.add_argument("--script-path", help="Path to an existing script file")
@@ -32,7 +468,148 @@ def main():
     parser.add_argument("--audio-path", help="Path to an existing audio file")
     parser.add_argument("--transcript-path", help="Path to an existing transcript file")
     parser.add_argument("--social-media-path", help="Path to an existing social media posts file")
-    args = parser.parse_args()
+    parser.add_argument("--image-path", help="Path to the episode image")
+    parser.add_argument("--publish-status", choices=["published", "draft", "scheduled"], help="Publish the episode with this status (non-interactive mode)")
+    parser.add_argument("--published-at", help="Publication date for scheduled episodes (YYYY-MM-DD HH:MM:SS EDT)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Maximum number of stages running at once (non-interactive mode)")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE", help="Re-run a stage even if its output is up to date (non-interactive mode, repeatable)")
+    parser.add_argument("--batch", metavar="FILE", help="Produce every episode listed in FILE concurrently (JSON list or one name per line)")
+    parser.add_argument("--batch-workers", type=int, default=3, help="Number of episodes produced at once in batch mode")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time Traveler Podcast Generator")
+    add_pipeline_arguments(parser)
+    parser.add_argument("--non-interactive", action="store_true", help="Run every step without prompts, in parallel where possible")
+
+    # Single-stage commands; with no command, the full interactive (or --non-interactive) flow runs
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    def add_command(name, handler, help_text, interactive=False):
+        command = commands.add_parser(name, help=help_text, description=help_text)
+        command.set_defaults(handler=handler)
+        if interactive:
+            command.add_argument("--non-interactive", action="store_true", help="Skip prompts and feedback rounds")
+        return command
+
+    command = add_command("script", command_script, "Generate an episode script", interactive=True)
+    command.add_argument("character_name", help="Name of the historical character")
+    command.add_argument("--background-research-path", help="Defaults to the episode's background_research.txt")
+
+    command = add_command("voice", command_voice, "Design and save the guest voice", interactive=True)
+    command.add_argument("character_name", help="Name of the historical character")
+    command.add_argument("--new", action="store_true", help="Design a new voice even if the character is in the voice library")
+
+    command = add_command("render", command_render, "Render the episode audio from a script")
+    command.add_argument("script_path", help="Path to the script file")
+    command.add_argument("--guest-voice-id", help="Defaults to the episode's voice_id.json")
+    command.add_argument("--shared-dir", help="Have `worker` processes make the segments through this shared directory, then mix them here")
+    command.add_argument("--timeout", type=float, help="With --shared-dir, seconds to wait for the workers")
+    command.add_argument("--draft", action="store_true", help="Quick, cheaper draft (faster model, mono, lower sample rate) in draft/draft.mp3")
+    command.add_argument("--sections", nargs="+", choices=["intro", "arrival_scene", "conversation", "outro"], help="Draft only these sections (implies --draft)")
+    command.add_argument("--lines", type=int, metavar="N", help="Draft only the first N lines (implies --draft)")
+    command.add_argument("--preview", action="store_true", help="Play the first lines while the rest are rendered, into preview.wav")
+    command.add_argument("--no-play", action="store_true", help="With --preview, only write preview.wav")
+
+    command = add_command("artwork", command_artwork, "Make the cover and social media sizes of an episode image")
+    command.add_argument("image_path", help="Source image")
+
+    command = add_command("season", command_season, "Publish several episodes at once, scheduled on consecutive Tuesdays")
+    command.add_argument("characters", nargs="*", help="Episodes to publish, in order. Defaults to every episode with audio in output/")
+    command.add_argument("--status", choices=["scheduled", "draft"], default="scheduled", help="Defaults to scheduled")
+    command.add_argument("--start", help="First possible slot (YYYY-MM-DD). Defaults to the next Tuesday")
+    command.add_argument("--workers", type=int, default=4, help="Episodes uploaded at once")
+
+    command = add_command("worker", command_worker, "Synthesize and decode segments published to a shared directory")
+    command.add_argument("shared_dir", help="Directory shared with the coordinator and the other workers")
+    command.add_argument("--threads", type=int, default=10, help="Tasks processed at once by this worker")
+    command.add_argument("--exit-when-idle", action="store_true", help="Stop once no task is pending or leased")
+
+    command = add_command("transcribe", command_transcribe, "Generate the VTT transcript of the episode audio")
+    command.add_argument("script_path", help="Path to the script file")
+    command.add_argument("--audio-path", help="Local path or URL of the audio. Defaults to the episode's audio.mp3")
+    command.add_argument("--output", help="Transcript path. Defaults to the episode's transcript.vtt")
+
+    command = add_command("social", command_social, "Generate the social media posts", interactive=True)
+    command.add_argument("script_path", help="Path to the script file")
+    command.add_argument("--background-research-path", help="Defaults to the episode's background_research.txt")
+
+    command = add_command("publish", command_publish, "Upload and publish the episode to Transistor.fm")
+    command.add_argument("script_path", help="Path to the script file")
+    command.add_argument("--audio-path", help="Defaults to the episode's audio.mp3")
+    command.add_argument("--audio-url", help="Audio already uploaded with an earlier publish (skips the upload)")
+    command.add_argument("--transcript-path", help="Defaults to the episode's transcript.vtt")
+    command.add_argument("--image-path", help="Path to the episode image")
+    command.add_argument("--status", choices=["published", "draft", "scheduled"], default="draft", help="Defaults to draft")
+    command.add_argument("--published-at", help="Publication date for scheduled episodes (YYYY-MM-DD HH:MM:SS EDT)")
+
+    command = add_command("serve", command_serve, "Run the render daemon, processing queued render, transcribe and publish jobs")
+    command.add_argument("--queue", default="output/jobs.sqlite3", help="SQLite queue file")
+    command.add_argument("--host", default="127.0.0.1", help="Interface the HTTP API listens on")
+    command.add_argument("--port", type=int, default=8765, help="Port of the HTTP API")
+    command.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    command.add_argument("--workers", type=int, default=3, help="Jobs run at once")
+
+    def add_daemon_argument(command):
+        command.add_argument("--daemon", default=os.getenv("RENDER_DAEMON_ADDRESS", "http://127.0.0.1:8765"),
+                             help="Daemon address, http://HOST:PORT or unix:PATH (defaults to RENDER_DAEMON_ADDRESS)")
+
+    command = add_command("submit", command_submit, "Queue a job on the render daemon")
+    command.add_argument("kind", choices=["render", "transcribe", "publish"])
+    command.add_argument("script_path", help="Path to the script file")
+    command.add_argument("--priority", type=int, default=0, help="Higher runs first")
+    command.add_argument("--guest-voice-id", help="render: defaults to the episode's voice_id.json")
+    command.add_argument("--audio-path", help="transcribe, publish: defaults to the episode's audio.mp3")
+    command.add_argument("--output", help="transcribe: defaults to the episode's transcript.vtt")
+    command.add_argument("--audio-url", help="publish: audio already uploaded")
+    command.add_argument("--transcript-path", help="publish: defaults to the episode's transcript.vtt")
+    command.add_argument("--image-path", help="publish: path to the episode image")
+    command.add_argument("--status", choices=["published", "draft", "scheduled"], help="publish: defaults to draft")
+    command.add_argument("--published-at", help="publish: date for scheduled episodes")
+    add_daemon_argument(command)
+
+    command = add_command("jobs", command_jobs, "List the render daemon's jobs")
+    command.add_argument("job_id", nargs="?", type=int, help="Show only this job")
+    command.add_argument("--status", choices=["queued", "running", "done", "failed", "cancelled"])
+    command.add_argument("--limit", type=int, default=20)
+    add_daemon_argument(command)
+
+    command = add_command("cancel", command_cancel, "Cancel a queued or running job")
+    command.add_argument("job_id", type=int)
+    add_daemon_argument(command)
+
+    command = add_command("run", lambda args: run_batch(args) if args.batch else run_pipeline(args),
+                          "Produce a whole episode without prompts (same as --non-interactive)")
+    add_pipeline_arguments(command)
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    load_config()
+
+    if args.command:
+        args.handler(args)
+        return
+
+    if args.batch:
+        run_batch(args)
+        return
+
+    if args.non_interactive:
+        run_pipeline(args)
+        return
+
+    try:
+        run_interactive(args)
+    finally:
+        tracer.finish()
+
+
+def run_interactive(args):
+    """Produce an episode step by step, prompting for each decision."""
+    from tools import background_search, discussion_script, voice_design, audio, transcript, social_media, publication
 
     character_name = None
     background_research_path = None
@@ -61,6 +638,8 @@ def main():
     os.makedirs(f"output/{character_name.replace(' ', '_')}", exist_ok=True)
     current_episode_folder_path = f"output/{character_name.replace(' ', '_')}"
     
+    tracer.start(f"{current_episode_folder_path}/traces", "interactive")
+    
     print(f"✅ Historical character selected: {character_name}")
 
     # =============================================
@@ -105,10 +684,9 @@ def main():
         print(f"✅ Podcast script generated successfully and saved at path: {script_path}")
     
     print(f"🔄 Loading script data from {script_path}...")
-    with open(script_path, 'r', encoding='utf-8') as file:
-        script_data = json.load(file)
+    episode = episode_metadata.load_episode(script_path)
 
-    print(f"✅ Podcast script generated successfully and saved at path: {script_path}")
+    print(f"✅ Podcast script loaded and validated: {len(episode.items)} lines, ~{episode.estimated_minutes():.1f} minutes")
 
     # =============================================
     # ========= STEP 4: VOICE GENERATION =========
@@ -142,10 +720,13 @@ def main():
     if audio_path:
         print(f"ℹ️ Using audio provided via command line: {audio_path}")
     else:
+        # Resolve every speaker's voice now so missing voice IDs fail before any audio is requested
+        # (audio given on the command line needs no voices)
+        episode.resolve_voices(guest_voice_id)
         input("🔊 Generating podcast audio, press Enter to continue...")
 
         print(f"🔄 Generating podcast audio for script at {script_path}...")
-        audio_path = audio.process_script_to_audio(script_path, guest_voice_id)
+        audio_path = audio.process_script_to_audio(episode, guest_voice_id)
     
     print(f"✅ Podcast audio generated successfully and saved at path: {audio_path}")
 
@@ -159,8 +740,8 @@ def main():
         print(f"ℹ️ Using transcript provided via command line: {transcript_path}")
     else:
         input("📝 Generating podcast transcript, press Enter to continue...")
-        print(f"🔄 Generating transcript for {script_data['title']}...")
-        transcript_path = transcript.generate_vtt_from_audio(script_data, audio_path)
+        print(f"🔄 Generating transcript for {episode.title}...")
+        transcript_path = transcript.generate_vtt_from_audio(episode, audio_path)
     
     print(f"✅ Transcript generated successfully and saved at path: {transcript_path}")
 
@@ -174,9 +755,9 @@ def main():
         print(f"ℹ️ Using social media posts provided via command line: {social_media_path}")
     else:
         input("📱 Generating social media posts, press Enter to continue...")
-        print(f"🔄 Generating social media posts for {script_data['title']}...")
+        print(f"🔄 Generating social media posts for {episode.title}...")
         posts, social_media_path = social_media.generate_social_media_posts(
-            script_path=script_path,
+            episode=episode,
             background_research=background_research
         )
     
@@ -200,16 +781,16 @@ def main():
         print("⏭️ Episode publication skipped.")
         return
     
-    print(f"🔄 Publishing episode '{script_data['title']}'...")
-    episode = publication.publish_episode(
-        script_path=script_path,
+    print(f"🔄 Publishing episode '{episode.title}'...")
+    publication.publish_episode(
+        episode=episode,
         audio_path=audio_path,
         transcript_path=transcript_path,
         image_path=image_path,
         publish_status=publish_status,
         published_at=published_at
     )
-    print(f"🎉 Episode '{script_data['title']}' published successfully!")
+    print(f"🎉 Episode '{episode.title}' published successfully!")
 
     # =============================================
     # ============= COMPLETION MESSAGE ===========
@@ -0,0 +1,159 @@
+import io
+import os
+import math
+import json
+import hashlib
+from PIL import Image, ImageOps
+
+try:
+    from tools.manifest import file_digest
+    from tools.workers import get_pool
+    from tools.tracing import span, count
+except ImportError:  # Running this tool directly as a script
+    from manifest import file_digest
+    from workers import get_pool
+    from tracing import span, count
+
+# Where variants are kept, shared by every episode (the same source image is often reused)
+ARTWORK_CACHE_DIR = "output/artwork"
+
+# Variants made from an episode's source image. Covers follow Apple Podcasts and
+# Transistor.fm (square RGB JPEG or PNG, 1400 to 3000 px); the social sizes are
+# the link preview and feed formats of X, LinkedIn, YouTube and Instagram.
+ARTWORK_SPECS = {
+    "cover_3000": {"width": 3000, "height": 3000, "format": "JPEG", "max_bytes": 512 * 1024, "cover": True},
+    "cover_1400": {"width": 1400, "height": 1400, "format": "JPEG", "max_bytes": 512 * 1024, "cover": True},
+    "social_landscape": {"width": 1280, "height": 720, "format": "JPEG", "max_bytes": 300 * 1024, "cover": False},
+    "social_square": {"width": 1080, "height": 1080, "format": "JPEG", "max_bytes": 300 * 1024, "cover": False},
+}
+
+# JPEG qualities tried in turn until a variant fits its size limit
+JPEG_QUALITIES = [90, 85, 80, 75, 70, 65, 60]
+
+# Cover requirements checked before uploading
+COVER_MIN_SIZE = 1400
+COVER_MAX_SIZE = 3000
+COVER_FORMATS = ("JPEG", "PNG")
+
+
+def spec_key(spec):
+    return hashlib.md5(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def variant_path(source_digest, name, spec):
+    extension = "jpg" if spec["format"] == "JPEG" else spec["format"].lower()
+    return os.path.join(ARTWORK_CACHE_DIR, f"{source_digest[:16]}-{name}-{spec_key(spec)}.{extension}")
+
+
+def _encode(image, spec):
+    """Encode at the best quality that fits the spec's size limit (the smallest tried if none does)."""
+    if spec["format"] != "JPEG":
+        buffer = io.BytesIO()
+        image.save(buffer, format=spec["format"], optimize=True)
+        return buffer.getvalue()
+    data = None
+    for quality in JPEG_QUALITIES:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True, subsampling="4:2:0")
+        data = buffer.getvalue()
+        if len(data) <= spec["max_bytes"]:
+            break
+    return data
+
+
+def _center_crop(source_size, target_size):
+    """Largest box of the target's aspect ratio centered in the source."""
+    width, height = source_size
+    ratio = target_size[0] / target_size[1]
+    crop_width, crop_height = min(width, height * ratio), min(height, width / ratio)
+    left, top = (width - crop_width) / 2, (height - crop_height) / 2
+    return (left, top, left + crop_width, top + crop_height)
+
+
+def make_variant(source_path, name, spec, path):
+    """
+    Resize, crop and encode one variant of the source image.
+
+    The image is cropped around its center to the target aspect ratio. JPEG
+    sources are decoded at a reduced scale when the target is much smaller,
+    which is most of the work saved for social sizes.
+    """
+    size = (spec["width"], spec["height"])
+    with span("artwork.variant", variant=name) as s:
+        with Image.open(source_path) as source:
+            scale = max(size[0] / source.width, size[1] / source.height)
+            source.draft("RGB", (math.ceil(source.width * scale), math.ceil(source.height * scale)))
+            image = ImageOps.exif_transpose(source).convert("RGB")
+        image = image.resize(size, Image.LANCZOS, box=_center_crop(image.size, size), reducing_gap=3.0)
+        data = _encode(image, spec)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        s.set("bytes", len(data))
+    return path
+
+
+def prepare_artwork(source_path, specs=ARTWORK_SPECS):
+    """
+    Make every artwork variant of a source image, reusing the cached ones.
+
+    Variants are cached by the digest of the source file and their spec, so
+    each one is only built once; missing ones are built in parallel on the
+    shared encode pool.
+
+    Args:
+        source_path (str): The source image
+        specs (dict, optional): {name: spec} of the variants to make
+
+    Returns:
+        dict: {name: path of the variant}
+    """
+    os.makedirs(ARTWORK_CACHE_DIR, exist_ok=True)
+    digest = file_digest(source_path)
+    paths = {name: variant_path(digest, name, spec) for name, spec in specs.items()}
+
+    missing = [name for name, path in paths.items() if not os.path.exists(path)]
+    count("cache.artwork.hit", len(paths) - len(missing))
+    count("cache.artwork.miss", len(missing))
+    if missing:
+        print(f"Making {len(missing)} artwork variants of {source_path}...")
+        list(get_pool("encode").map(lambda name: make_variant(source_path, name, specs[name], paths[name]), missing))
+    return paths
+
+
+def is_compliant_cover(path, max_bytes=None):
+    """Whether an image can be used as podcast episode artwork."""
+    with Image.open(path) as image:
+        width, height = image.size
+        compliant = (width == height and COVER_MIN_SIZE <= width <= COVER_MAX_SIZE
+                     and image.mode == "RGB" and image.format in COVER_FORMATS)
+    return compliant and (max_bytes is None or os.path.getsize(path) <= max_bytes)
+
+
+def choose_cover(variants, specs=ARTWORK_SPECS):
+    """
+    The smallest compliant cover among the variants.
+
+    Args:
+        variants (dict): {name: path} as returned by prepare_artwork
+
+    Returns:
+        str: Path of the cover to upload
+    """
+    covers = [path for name, path in variants.items()
+              if specs[name]["cover"] and is_compliant_cover(path, specs[name]["max_bytes"])]
+    if not covers:
+        raise ValueError(f"No artwork variant meets the cover requirements: {sorted(variants)}")
+    return min(covers, key=os.path.getsize)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        variants = prepare_artwork(sys.argv[1])
+        for name, path in variants.items():
+            print(f"{name:<20}{os.path.getsize(path) / 1024:>8.0f} KB  {path}")
+        print(f"Cover to upload: {choose_cover(variants)}")
+    else:
+        print("Usage: python artwork.py <source_image>")
@@ -1,13 +1,44 @@
 import os
 import json
 import time
-import hashlib
-from pathlib import Path
+import shutil
+import subprocess
+from concurrent.futures import CancelledError
 from pydub import AudioSegment
-from elevenlabs.client import ElevenLabs
-from dotenv import load_dotenv
 import numpy as np
 
+try:
+    from tools.episode_metadata import SECTIONS, load_episode
+    from tools.script_history import ScriptHistory
+    from tools.clients import get_elevenlabs, ELEVEN_LABS_REQUEST_OPTIONS
+    from tools.workers import get_pool
+    from tools.resilience import call
+    from tools.tracing import span, count
+    from tools import loudness, audio_qa, ssml_formatting, sound_effects, music
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import SECTIONS, load_episode
+    from script_history import ScriptHistory
+    from clients import get_elevenlabs, ELEVEN_LABS_REQUEST_OPTIONS
+    from workers import get_pool
+    from resilience import call
+    from tracing import span, count
+    import loudness
+    import audio_qa
+    import ssml_formatting
+    import sound_effects
+    import music
+
+# ElevenLabs text-to-speech settings
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Draft renders: a faster, cheaper model at a lower sample rate, for listening while the script changes
+DRAFT_TTS_MODEL_ID = os.getenv("DRAFT_TTS_MODEL_ID", "eleven_flash_v2_5")
+DRAFT_TTS_OUTPUT_FORMAT = "mp3_22050_32"
+DRAFT_FRAME_RATE = 22050
+# Draft segments and mixes live here, in the episode folder, apart from the full quality ones
+DRAFT_DIR = "draft"
+
 # Constants for audio processing
 # Sound effect fade durations (percentages of total duration)
 SFX_FADE_IN_PERCENT = 0.2
@@ -34,8 +65,34 @@ SPEECH_PAUSE_LOGNORMAL_SIGMA = 0.9
 SPEECH_PAUSE_MIN_MS = 300
 SPEECH_PAUSE_MAX_MS = 900
 
-# Default SFX duration if not specified
-DEFAULT_SFX_DURATION = 5.0
+# Renditions encoded from the final mix, written next to audio.mp3 (the published one)
+# Each is an ffmpeg output format and encoder arguments
+AUDIO_RENDITIONS = {
+    "mp3_128k": {"filename": "audio.mp3", "format": "mp3", "args": ["-c:a", "libmp3lame", "-b:a", "128k"]},
+    "mp3_64k_mono": {"filename": "audio_64k.mp3", "format": "mp3", "args": ["-c:a", "libmp3lame", "-b:a", "64k", "-ac", "1"]},
+    # Speech-tuned low bandwidth renditions
+    "opus_speech": {"filename": "audio_speech.opus", "format": "ogg",
+                    "args": ["-c:a", "libopus", "-b:a", "32k", "-ac", "1", "-ar", "48000", "-application", "voip"]},
+    "aac_speech": {"filename": "audio_speech.m4a", "format": "ipod",
+                   "args": ["-c:a", "aac", "-b:a", "48k", "-ac", "1", "-movflags", "+faststart"]},
+    # Lossless master, for archiving
+    "flac_master": {"filename": "audio_master.flac", "format": "flac", "args": ["-c:a", "flac", "-compression_level", "8"]},
+    # Draft renders only
+    "mp3_draft": {"filename": "draft.mp3", "format": "mp3", "args": ["-c:a", "libmp3lame", "-b:a", "48k", "-ac", "1"]},
+}
+PRIMARY_RENDITION = "mp3_128k"
+
+def _enabled_renditions(names):
+    """Rendition names from a comma separated list, checked before anything is rendered."""
+    enabled = [name.strip() for name in names.split(",") if name.strip() and name.strip() != "mp3_draft"]
+    unknown = [name for name in enabled if name not in AUDIO_RENDITIONS]
+    if unknown:
+        raise ValueError(f"Unknown AUDIO_RENDITIONS {', '.join(unknown)}: expected names from {', '.join(AUDIO_RENDITIONS)}")
+    return enabled
+
+# Renditions made by each render (comma separated names). Only audio.mp3 by default, which is always made:
+# list the others to encode them too, e.g. AUDIO_RENDITIONS=mp3_128k,opus_speech,flac_master
+ENABLED_RENDITIONS = _enabled_renditions(os.getenv("AUDIO_RENDITIONS", PRIMARY_RENDITION))
 
 def generate_sound_effect(text: str, duration_seconds: float, output_path: str):
     """
@@ -44,201 +101,406 @@ def generate_sound_effect(text: str, duration_seconds: float, output_path: str):
     Args:
         text (str): Description of the sound effect
         output_path (str): Path to save the sound effect
-        client (ElevenLabs, optional): ElevenLabs client instance
     """
-    client = ElevenLabs(api_key=os.getenv("ELEVEN_LABS_API_KEY"))
+    client = get_elevenlabs()
     
     print(f"Generating sound effect: {text}...")
     
-    result = client.text_to_sound_effects.convert(
-        text=text,
-        duration_seconds=duration_seconds,  # Optional
-        prompt_influence=0.3,
-    )
+    with span("elevenlabs.sound_effect", characters=len(text)) as s:
+        # The audio is streamed, so the whole body is read inside the retried call
+        sound_effect_bytes = call("elevenlabs", lambda: b"".join(client.text_to_sound_effects.convert(
+            text=text,
+            duration_seconds=duration_seconds,  # Optional
+            prompt_influence=0.3,
+            request_options=ELEVEN_LABS_REQUEST_OPTIONS,
+        )))
+        s.set("bytes", len(sound_effect_bytes))
     
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     with open(output_path, "wb") as f:
-        for chunk in result:
-            f.write(chunk)
+        f.write(sound_effect_bytes)
     
     print(f"Sound effect saved to {output_path}")
     return output_path
 
-def generate_podcast_audio(script, guest_voice_id, output_dir):
+def synthesize_segment(client, item, segment_path, previous_path=None, model_id=TTS_MODEL_ID, output_format=TTS_OUTPUT_FORMAT, sfx_library=None):
+    """
+    Make sure the audio of one script item exists on disk.
+    
+    Args:
+        client (ElevenLabs): ElevenLabs client instance
+        item (ScriptItem): The script line or sound effect
+        segment_path (str): Where the segment is cached
+        previous_path (str, optional): Cached segment of the same line from the last render
+        model_id (str, optional): Text-to-speech model. Defaults to TTS_MODEL_ID.
+        output_format (str, optional): Text-to-speech output format. Defaults to TTS_OUTPUT_FORMAT.
+        sfx_library (SoundEffectLibrary, optional): Where a new sound effect is looked for before it is generated
+    
+    Returns:
+        tuple: (item, segment_path)
+    """
+    cache_name = "cache.sfx" if item.is_sfx else "cache.segments"
+    if os.path.exists(segment_path):
+        print(f"Using existing {'sound effect' if item.is_sfx else 'speech segment'}: {segment_path}")
+        count(f"{cache_name}.hit")
+    elif previous_path and os.path.exists(previous_path):
+        print(f"Reusing unchanged speech segment: {previous_path}")
+        shutil.copyfile(previous_path, segment_path)
+        count(f"{cache_name}.hit")
+    elif item.is_sfx:
+        count(f"{cache_name}.miss")
+        if sfx_library:
+            sfx_library.provide(item.text, item.duration, segment_path, generate_sound_effect)
+        else:
+            generate_sound_effect(item.text, item.duration, segment_path)
+    else:
+        count(f"{cache_name}.miss")
+        count("elevenlabs.tts_characters", len(item.tts_text))
+        with span("elevenlabs.text_to_speech", characters=len(item.tts_text)) as s:
+            # Convert generator to bytes inside the retried call, so a dropped stream is requested again
+            speech_audio_bytes = call("elevenlabs", lambda: b"".join(client.text_to_speech.convert(
+                text=item.tts_text,
+                voice_id=item.voice_id,
+                model_id=model_id,
+                output_format=output_format,
+                request_options=ELEVEN_LABS_REQUEST_OPTIONS
+            )))
+            s.set("bytes", len(speech_audio_bytes))
+        with open(segment_path, "wb") as f:
+            f.write(speech_audio_bytes)
+    return item, segment_path
+
+def decode_segment(path):
+    """Decode a cached segment file."""
+    with span("ffmpeg.decode", bytes=os.path.getsize(path)):
+        return AudioSegment.from_file(path)
+
+def load_segment(item, path):
+    """
+    Decode a cached segment and apply its fade in/out.
+    
+    Args:
+        item (ScriptItem): The script line or sound effect
+        path (str): Path to the segment audio file
+    
+    Returns:
+        AudioSegment: The decoded segment with fades applied
+    """
+    return fade_segment(item, decode_segment(path))
+
+def fade_segment(item, segment):
+    """Apply the fade in/out of a script item to its decoded segment."""
+    if item.is_sfx:
+        # Calculate fade durations based on the SFX duration
+        duration = item.duration
+        # Use defined percentages of the duration for fade in and out, with minimums and maximums
+        fade_in_duration = max(min(int(duration * 1000 * SFX_FADE_IN_PERCENT), SFX_MAX_FADE_IN_MS), SFX_MIN_FADE_IN_MS)
+        fade_out_duration = max(min(int(duration * 1000 * SFX_FADE_OUT_PERCENT), SFX_MAX_FADE_OUT_MS), SFX_MIN_FADE_OUT_MS)
+        return segment.fade_in(fade_in_duration).fade_out(fade_out_duration)
+    
+    # Apply subtle fades for speech to sound more natural
+    return segment.fade_in(SPEECH_FADE_IN_MS).fade_out(SPEECH_FADE_OUT_MS)
+
+def pause_before(next_item):
+    """
+    Length in milliseconds of the natural pause before a segment.
+    
+    Args:
+        next_item (ScriptItem): The item played after the pause
+    
+    Returns:
+        int: The pause duration
+    """
+    rng = np.random.default_rng()
+    # Determine pause duration based on next segment type
+    if next_item.is_sfx:
+        # bumper pause: use normal distribution with defined parameters
+        pause_duration = int(rng.normal(BUMPER_PAUSE_MEAN_MS, BUMPER_PAUSE_STD_MS))
+        return max(BUMPER_PAUSE_MIN_MS, min(pause_duration, BUMPER_PAUSE_MAX_MS))
+    # Speech pause: log-normal distribution for more natural timing
+    dur = rng.lognormal(mean=SPEECH_PAUSE_LOGNORMAL_MEAN, sigma=SPEECH_PAUSE_LOGNORMAL_SIGMA) * 1000
+    return int(max(SPEECH_PAUSE_MIN_MS, min(dur, SPEECH_PAUSE_MAX_MS)))
+
+def mix_segments(items, decoded, timeline=None):
+    """
+    Join decoded segments in script order, with a natural pause between them.
+    
+    Args:
+        items (list): The ScriptItem of each segment
+        decoded (list): The AudioSegment of each item, fades applied
+        timeline (list, optional): Filled with the (item, start_ms, end_ms) of each segment in the mix
+    
+    Returns:
+        AudioSegment: The combined audio
+    """
+    with span("audio.concatenate", segments=len(decoded)):
+        combined = AudioSegment.empty()
+
+        for i, segment in enumerate(decoded):
+            start = len(combined)
+            combined += segment
+            if timeline is not None:
+                timeline.append((items[i], start, len(combined)))
+        
+            # Add pause after each segment except the last one
+            if i < len(items) - 1:
+                combined += AudioSegment.silent(duration=pause_before(items[i+1]))
+    return combined
+
+def encode_rendition(combined, name, path):
+    """
+    Encode the mix's PCM samples with one ffmpeg process, fed through its standard input.
+
+    Returns:
+        dict: The rendition's path, size in bytes and encoding time
+    """
+    rendition = AUDIO_RENDITIONS[name]
+    sample_format = "u8" if combined.sample_width == 1 else f"s{8 * combined.sample_width}le"
+    tmp_path = f"{path}.tmp"
+    command = [AudioSegment.converter, "-y", "-hide_banner", "-loglevel", "error",
+               "-f", sample_format, "-ar", str(combined.frame_rate), "-ac", str(combined.channels), "-i", "pipe:0",
+               *rendition["args"], "-f", rendition["format"], tmp_path]
+    start = time.perf_counter()
+    with span("ffmpeg.export", rendition=name, duration_seconds=round(combined.duration_seconds, 1)) as s:
+        completed = subprocess.run(command, input=combined.raw_data, capture_output=True)
+        if completed.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"Encoding the {name} rendition failed: {completed.stderr.decode(errors='replace')[-2000:]}")
+        os.replace(tmp_path, path)
+        s.set("bytes", os.path.getsize(path))
+    return {"path": path, "bytes": os.path.getsize(path), "seconds": round(time.perf_counter() - start, 3)}
+
+def export_mix(combined, path, renditions=None, primary=PRIMARY_RENDITION):
+    """
+    Encode the combined audio to MP3 and its other renditions in one pass.
+
+    The mix's true peak is limited first. The PCM mix is then made once and handed to one encoder per rendition, all
+    running at the same time on the shared encode pool. Renditions other
+    than the MP3 are written next to it, and the timing and size of each are
+    saved in renditions.json. Only a failure of the MP3 is fatal: the others
+    are reported and skipped (e.g. an ffmpeg build without libopus).
+
+    Args:
+        combined (AudioSegment): The final mix
+        path (str): Where the published MP3 goes
+        renditions (list, optional): Names from AUDIO_RENDITIONS. Defaults to ENABLED_RENDITIONS.
+        primary (str, optional): The rendition written to `path`. Defaults to the published MP3.
+
+    Returns:
+        str: `path`
+    """
+    combined = loudness.limit_mix(combined)
+    output_dir = os.path.dirname(path)
+    names = [primary] + [name for name in (ENABLED_RENDITIONS if renditions is None else renditions) if name != primary]
+    targets = {name: path if name == primary else os.path.join(output_dir, AUDIO_RENDITIONS[name]["filename"])
+               for name in names}
+    pool = get_pool("encode")
+    futures = {name: pool.submit(encode_rendition, combined, name, target) for name, target in targets.items()}
+    report = {primary: futures.pop(primary).result()}
+    for name, future in futures.items():
+        try:
+            report[name] = future.result()
+        except RuntimeError as e:
+            print(f"⚠️ {e}")
+            report[name] = {"path": None, "error": str(e)}
+
+    for name, result in report.items():
+        if result["path"]:
+            print(f"  {name:<14}{result['bytes'] / 1e6:>8.1f} MB{result['seconds']:>8.1f}s  {result['path']}")
+    with open(os.path.join(output_dir, "renditions.json"), 'w') as f:
+        json.dump({"duration_seconds": round(combined.duration_seconds, 3), "renditions": report}, f, indent=4)
+    return path
+
+def select_items(episode, sections=None, max_lines=None):
+    """
+    The script items to render, in script order.
+
+    Args:
+        episode (Episode): The validated podcast episode
+        sections (list, optional): Only these sections. Defaults to all of them.
+        max_lines (int, optional): Only the first lines (sound effects included) of those sections
+
+    Returns:
+        list: The ScriptItems
+    """
+    unknown = set(sections or []) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown sections {', '.join(sorted(unknown))}, expected some of {', '.join(SECTIONS)}")
+    items = [item for section in SECTIONS if not sections or section in sections for item in episode.sections[section]]
+    return items[:max_lines] if max_lines else items
+
+def render_settings(output_dir, draft=False):
+    """
+    Where speech segments are cached, and the TTS model and format, for a full or draft render.
+    
+    Creates the segment folders.
+    
+    Returns:
+        tuple: (speech_dir, model_id, output_format)
+    """
+    # Sound effects are the same in drafts, so both share the full quality ones
+    speech_dir = os.path.join(output_dir, DRAFT_DIR, DRAFT_TTS_MODEL_ID) if draft else os.path.join(output_dir, "audio")
+    os.makedirs(os.path.join(speech_dir, "segments"), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "audio/sfx"), exist_ok=True)
+    if draft:
+        return speech_dir, DRAFT_TTS_MODEL_ID, DRAFT_TTS_OUTPUT_FORMAT
+    return speech_dir, TTS_MODEL_ID, TTS_OUTPUT_FORMAT
+
+def cached_segment_path(item, output_dir, speech_dir):
+    """Path of an item's cached segment (sound effects always come from the full quality cache)."""
+    return os.path.join(os.path.join(output_dir, "audio") if item.is_sfx else speech_dir, item.segment_filename)
+
+def generate_podcast_audio(episode, guest_voice_id, output_dir, reusable=None, cancelled=None, draft=False, sections=None, max_lines=None):
     """
     Generate audio for a podcast script using ElevenLabs API
     
     Args:
-        script (dict): The podcast script dictionary
+        episode (Episode): The validated podcast episode
         guest_voice_id (str): Voice ID for the historical figure
         output_dir (str): Directory to save the audio files
+        reusable (dict, optional): {(section, index): previous_index} of lines unchanged since the last render
+        cancelled (threading.Event, optional): Once set, segments not yet requested are skipped
+            and CancelledError is raised. Segments already synthesized stay cached.
+        draft (bool, optional): Render a quick draft with DRAFT_TTS_MODEL_ID, in mono at
+            DRAFT_FRAME_RATE. Draft segments are cached in DRAFT_DIR, apart from the full
+            quality ones, and the mix goes to DRAFT_DIR/draft.mp3 without QA or other renditions.
+        sections (list, optional): Only render these sections
+        max_lines (int, optional): Only render the first lines of the (selected) script
     
     Returns:
         str: Path to the final combined audio file
     """
-    # Load environment variables
-    load_dotenv()
+    # Shared client, configured from .env on first use (fails early if the API key is missing)
+    client = get_elevenlabs()
     
-    # Get API key from environment variables
-    api_key = os.getenv("ELEVEN_LABS_API_KEY")
-    if not api_key:
-        raise ValueError("ELEVEN_LABS_API_KEY not found in environment variables")
+    # Resolve voice IDs for each speaker before requesting any audio
+    episode.resolve_voices(guest_voice_id)
+    items = select_items(episode, sections, max_lines)
     
-    # Initialize ElevenLabs client
-    client = ElevenLabs(api_key=api_key)
+    speech_dir, model_id, output_format = render_settings(output_dir, draft)
     
-    # Create output directory if it doesn't exist
-    os.makedirs(os.path.join(output_dir, "audio"), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "audio/segments"), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "audio/sfx"), exist_ok=True)
-    
-    # Define voice IDs for each speaker
-    # Voice IDs should be set via environment variables for your ElevenLabs account
-    narrator_voice_id = os.getenv("NARRATOR_VOICE_ID")
-    leo_voice_id = os.getenv("LEO_VOICE_ID")
+    # Pronunciations, numbers and markup: segments are cached by the text actually sent
+    formatted = ssml_formatting.format_episode(episode, model_id)
+    if formatted:
+        print(f"Formatted {formatted} lines for text-to-speech (pronunciations, numbers, pauses)")
     
-    if not narrator_voice_id:
-        raise ValueError("NARRATOR_VOICE_ID not found in environment variables. Set this to your ElevenLabs voice ID for the narrator.")
-    if not leo_voice_id:
-        raise ValueError("LEO_VOICE_ID not found in environment variables. Set this to your ElevenLabs voice ID for Leo.")
+    # Generate audio segments concurrently on the shared synthesis pool, keeping script order
+    pool = get_pool("synthesis")
+    futures = []
     
-    voice_ids = {
-        "Narrator": narrator_voice_id,
-        "Leo": leo_voice_id,
-        script["historical_figure"]: guest_voice_id
-    }
+    # New sound effects are looked for in the effects of every episode before they are generated
+    sfx_library = sound_effects.SoundEffectLibrary() if sound_effects.SFX_LIBRARY_ENABLED else None
     
-    # Generate audio segments
-    segment_paths = []
-    sfx_durations = {}  # Store SFX durations for fade calculations
+    def synthesize(item, segment_path, previous_path=None, sfx_library=sfx_library):
+        if cancelled is not None and cancelled.is_set():
+            raise CancelledError()
+        return synthesize_segment(client, item, segment_path, previous_path, model_id=model_id, output_format=output_format,
+                                  sfx_library=sfx_library)
     
     # Process each section of the script
-    sections = ["intro", "arrival_scene", "conversation", "outro"]
-    
-    for section in sections:
-        print(f"Generating audio for {section}...")
-        for i, item in enumerate(script[section]):
-            if item["speaker"] == "SFX":
-                # Generate sound effect
-                text_hash = hashlib.md5(f"sfx-{item['text']}".encode()).hexdigest()[:8]
-                sfx_path = os.path.join(output_dir, f"audio/sfx/{section}_sfx_{i}_{text_hash}.mp3")
-                
-                # Check if file already exists
-                if os.path.exists(sfx_path):
-                    print(f"Using existing sound effect: {sfx_path}")
-                else:
-                    duration = float(item.get("duration", DEFAULT_SFX_DURATION))
-                    generate_sound_effect(item["text"], duration, sfx_path)
-                    
-                    # Avoid rate limiting only if we generated a new sound effect
-                    time.sleep(0.5)
-                
-                segment_paths.append(sfx_path)
-                sfx_durations[sfx_path] = float(item.get("duration", DEFAULT_SFX_DURATION))  # Store the duration for later use
-            else:
-                # Generate speech
-                voice_id = voice_ids.get(item["speaker"], voice_ids["Narrator"])
-                
-                # Create hash from voice_id and text
-                content_hash = hashlib.md5(f"{voice_id}-{item['text']}".encode()).hexdigest()[:8]
-                speech_path = os.path.join(output_dir, f"audio/segments/{section}_{i}_{content_hash}.mp3")
-                
-                # Check if file already exists
-                if os.path.exists(speech_path):
-                    print(f"Using existing speech segment: {speech_path}")
-                else:
-                    speech_audio = client.text_to_speech.convert(
-                        text=item["text"],
-                        voice_id=voice_id,
-                        model_id="eleven_multilingual_v2",
-                        output_format="mp3_44100_128"
-                    )
-                    
-                    # Convert generator to bytes
-                    speech_audio_bytes = b"".join(list(speech_audio))
-                    with open(speech_path, "wb") as f:
-                        f.write(speech_audio_bytes)
-                    
-                    # Avoid rate limiting only if we generated a new speech segment
-                    time.sleep(0.5)
-                
-                segment_paths.append(speech_path)
-    
-    # Combine all audio segments
-    print("Combining all audio segments...")
-    combined = AudioSegment.empty()
-
-    for i, path in enumerate(segment_paths):
-        segment = AudioSegment.from_file(path)
-        
-        # Apply fade in/out effects
-        if "sfx" in path:
-            # Calculate fade durations based on the SFX duration
-            duration = sfx_durations.get(path)
-            # Use defined percentages of the duration for fade in and out, with minimums and maximums
-            fade_in_duration = max(min(int(duration * 1000 * SFX_FADE_IN_PERCENT), SFX_MAX_FADE_IN_MS), SFX_MIN_FADE_IN_MS)
-            fade_out_duration = max(min(int(duration * 1000 * SFX_FADE_OUT_PERCENT), SFX_MAX_FADE_OUT_MS), SFX_MIN_FADE_OUT_MS)
-            segment = segment.fade_in(fade_in_duration).fade_out(fade_out_duration)
-        else:
-            # Apply subtle fades for speech to sound more natural
-            segment = segment.fade_in(SPEECH_FADE_IN_MS).fade_out(SPEECH_FADE_OUT_MS)
+    missing = 0
+    for item in items:
+        segment_path = cached_segment_path(item, output_dir, speech_dir)
         
-        combined += segment
+        # Lines that only moved since the last render keep their old segment
+        previous_index = (reusable or {}).get((item.section, item.index))
+        previous_path = None
+        if previous_index is not None and not item.is_sfx:
+            previous_path = os.path.join(speech_dir, "segments", f"{item.section}_{previous_index}_{item.content_hash}.mp3")
+        if not os.path.exists(segment_path) and not (previous_path and os.path.exists(previous_path)):
+            missing += 1
         
-        # Add pause after each segment except the last one
-        if i < len(segment_paths) - 1:
-            rng = np.random.default_rng()
-            # Determine pause duration based on next segment type
-            if "sfx" in segment_paths[i+1]:
-                # bumper pause: use normal distribution with defined parameters
-                pause_duration = int(rng.normal(BUMPER_PAUSE_MEAN_MS, BUMPER_PAUSE_STD_MS))
-                pause_duration = max(BUMPER_PAUSE_MIN_MS, min(pause_duration, BUMPER_PAUSE_MAX_MS))
-            else:
-                # Speech pause: log-normal distribution for more natural timing
-                dur = rng.lognormal(mean=SPEECH_PAUSE_LOGNORMAL_MEAN, sigma=SPEECH_PAUSE_LOGNORMAL_SIGMA) * 1000
-                pause_duration = int(max(SPEECH_PAUSE_MIN_MS, min(dur, SPEECH_PAUSE_MAX_MS)))
-            
-            pause = AudioSegment.silent(duration=pause_duration)
-            combined += pause
-    
-    # Save the combined audio
+        futures.append(pool.submit(synthesize, item, segment_path, previous_path))
+    print(f"{'Drafting' if draft else 'Rendering'} {len(items)} lines: {missing} to synthesize"
+          f"{f' with {model_id}' if missing else ''}, {len(items) - missing} cached")
+    
+    try:
+        segments = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    if sfx_library:
+        sfx_library.report()
+    
+    # Decode and check the segments, requesting bad ones again, then apply fades and bring them
+    # to the target loudness, in parallel on the shared encode pool
+    if audio_qa.QA_ENABLED and not draft:
+        raw = audio_qa.check_segments(segments, lambda item, path: decode_segment(path),
+                                      lambda item, path: synthesize(item, path, sfx_library=None), os.path.join(output_dir, "audio_qa.json"))
+    else:
+        raw = list(get_pool("encode").map(lambda segment: decode_segment(segment[1]), segments))
+    print("Combining all audio segments...")
+    decoded = list(get_pool("encode").map(lambda segment, audio: loudness.level_segment(segment[0], fade_segment(segment[0], audio), segment[1]),
+                                          segments, raw))
+    timeline = []
+    combined = mix_segments([item for item, _ in segments], decoded, timeline)
+    combined = music.add_music_bed(combined, timeline, output_dir)
+    
+    if draft:
+        # Sound effects are at full rate: the whole draft is brought down once
+        combined_path = os.path.join(output_dir, DRAFT_DIR, "draft.mp3")
+        export_mix(combined.set_frame_rate(DRAFT_FRAME_RATE).set_channels(1), combined_path, renditions=[], primary="mp3_draft")
+        print(f"Draft audio saved to {combined_path}")
+        return combined_path
+    
+    # Save the combined audio and its other renditions
+    print("Encoding audio renditions...")
     combined_path = os.path.join(output_dir, f"audio.mp3")
-    combined.export(combined_path, format="mp3")
+    export_mix(combined, combined_path)
     
     print(f"Podcast audio generated and saved to {combined_path}")
     return combined_path
 
-def process_script_to_audio(script_json_path, guest_voice_id):
+def process_script_to_audio(episode, guest_voice_id, cancelled=None):
     """
-    Process a script JSON file to generate audio
+    Process a loaded episode script to generate audio
+    
+    After drafts, this is the finalize pass: only lines without a full quality
+    segment (new or changed since the last full render) are synthesized.
     
     Args:
-        script_json_path (str): Path to the script JSON file
+        episode (Episode): The validated podcast episode
         guest_voice_id (str): Voice ID for the historical figure
+        cancelled (threading.Event, optional): Set to stop the render early (see generate_podcast_audio)
         
     Returns:
         str: Path to the generated audio file
     """
-    # Load the script
-    with open(script_json_path, 'r', encoding='utf-8') as f:
-        script = json.load(f)
+    # Find lines unchanged since the last render from the script history
+    history = ScriptHistory.load(episode.output_dir)
+    reusable = history.reusable_lines(episode.to_dict())
     
-    # Create a specific output directory for this podcast
-    output_dir = f"output/{script['historical_figure'].replace(' ', '_')}"
+    # Generate the podcast audio in the episode's output directory
+    audio_path = generate_podcast_audio(episode, guest_voice_id, episode.output_dir, reusable=reusable, cancelled=cancelled)
     
-    # Generate the podcast audio
-    audio_path = generate_podcast_audio(script, guest_voice_id, output_dir)
+    # Remember which iteration the cached segments now correspond to
+    history.mark_rendered(history.record(episode.to_dict()))
+    history.save()
     
     return audio_path
 
+def render_draft(episode, guest_voice_id, sections=None, max_lines=None):
+    """
+    Render a quick draft of an episode, or of part of it (see generate_podcast_audio).
+    
+    Drafts do not count as renders in the script history, so the finalize
+    pass still knows which lines moved since the last full quality render.
+    
+    Returns:
+        str: Path to the draft audio file
+    """
+    return generate_podcast_audio(episode, guest_voice_id, episode.output_dir, draft=True, sections=sections, max_lines=max_lines)
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 2:
         script_path = sys.argv[1]
         guest_voice_id = sys.argv[2]
-        audio_path = process_script_to_audio(script_path, guest_voice_id)
+        audio_path = process_script_to_audio(load_episode(script_path), guest_voice_id)
         print(f"Generated audio saved to: {audio_path}")
     else:
         print("Usage: python audio.py <script_path> <guest_voice_id>")
\ No newline at end of file
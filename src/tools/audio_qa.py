@@ -0,0 +1,219 @@
+import os
+import json
+import numpy as np
+
+try:
+    from tools.episode_metadata import WORDS_PER_MINUTE
+    from tools.manifest import file_digest
+    from tools.workers import get_pool
+    from tools.tracing import span, count
+    from tools.loudness import to_float
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import WORDS_PER_MINUTE
+    from manifest import file_digest
+    from workers import get_pool
+    from tracing import span, count
+    from loudness import to_float
+
+# Set AUDIO_QA=0 to mix segments without checking them
+QA_ENABLED = os.getenv("AUDIO_QA", "1") != "0"
+# Times a failing segment is requested again before it is used as is
+QA_MAX_RETRIES = int(os.getenv("QA_MAX_RETRIES", "2"))
+# Segments requested again per render, whatever the number of failures (each costs TTS characters)
+QA_RETRY_BUDGET = int(os.getenv("QA_RETRY_BUDGET", "20"))
+
+# Thresholds
+SILENCE_DBFS = -50.0        # 10 ms frames quieter than this are silent
+SILENCE_FRAME_MS = 10
+MAX_SILENCE_SECONDS = 2.0   # longest pause allowed in a speech segment, including at its ends
+NEAR_SILENT_DBFS = -45.0    # whole segments quieter than this are empty
+CLIP_LEVEL = 0.999          # samples at or above this (absolute) are clipped
+MIN_CLIPPED_RUN = 3         # consecutive clipped samples that count as a clipped peak
+MAX_CLIPPED_RUNS = 5
+ABRUPT_END_MS = 30          # a speech segment still this loud in its last 30 ms was cut off
+ABRUPT_END_DBFS = -25.0
+# Speech length against the length expected from the word count, and SFX against their requested duration
+MIN_SPEECH_RATIO = 0.45
+MAX_SPEECH_RATIO = 2.5
+MIN_SPEECH_EXPECTED_SECONDS = 1.0
+MIN_SFX_RATIO = 0.8
+
+# Version of the checks stored in the per-segment analysis files
+QA_CACHE_VERSION = 1
+
+
+def _dbfs(value):
+    return float(20 * np.log10(max(value, 1e-10)))
+
+
+def _runs(mask):
+    """(start, length) of every run of True values in a boolean array."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return starts, stops - starts
+
+
+def expected_seconds(item):
+    """Length a segment should have: the requested SFX duration, or the line read at WORDS_PER_MINUTE."""
+    if item.is_sfx:
+        return item.duration
+    return max(item.word_count / WORDS_PER_MINUTE * 60, MIN_SPEECH_EXPECTED_SECONDS)
+
+
+def analyse(item, segment):
+    """
+    Measure a decoded segment and list what is wrong with it.
+
+    Args:
+        item (ScriptItem): The script line or sound effect
+        segment (AudioSegment): The decoded segment, before fades
+
+    Returns:
+        dict: Measurements, and "problems" (empty if the segment passes)
+    """
+    samples = to_float(segment)
+    rate = segment.frame_rate
+    duration = len(samples) / rate
+    flat = np.abs(samples).max(axis=1) if samples.shape[1] > 1 else np.abs(samples[:, 0])
+
+    frame = max(1, int(rate * SILENCE_FRAME_MS / 1000))
+    frames = len(flat) // frame
+    frame_rms = np.sqrt(np.mean(np.square(flat[:frames * frame].reshape(frames, frame), dtype=np.float64), axis=1)) if frames else np.zeros(0)
+    _, silent_lengths = _runs(frame_rms < 10 ** (SILENCE_DBFS / 20))
+    longest_silence = float(silent_lengths.max() * SILENCE_FRAME_MS / 1000) if len(silent_lengths) else 0.0
+
+    _, clipped_lengths = _runs(flat >= CLIP_LEVEL)
+    end = flat[-max(1, int(rate * ABRUPT_END_MS / 1000)):]
+    analysis = {
+        "duration_seconds": round(duration, 3),
+        "expected_seconds": round(expected_seconds(item), 3),
+        "rms_dbfs": round(_dbfs(np.sqrt(np.mean(np.square(flat, dtype=np.float64)))) if len(flat) else -200.0, 1),
+        "peak_dbfs": round(_dbfs(flat.max()) if len(flat) else -200.0, 1),
+        "clipped_runs": int((clipped_lengths >= MIN_CLIPPED_RUN).sum()),
+        "longest_silence_seconds": round(longest_silence, 2),
+        "end_dbfs": round(_dbfs(np.sqrt(np.mean(np.square(end, dtype=np.float64)))) if len(end) else -200.0, 1),
+    }
+
+    problems = []
+    if analysis["rms_dbfs"] < NEAR_SILENT_DBFS:
+        problems.append(f"near silent ({analysis['rms_dbfs']} dBFS RMS)")
+    if analysis["clipped_runs"] > MAX_CLIPPED_RUNS:
+        problems.append(f"clipped ({analysis['clipped_runs']} clipped peaks)")
+    ratio = duration / analysis["expected_seconds"]
+    if item.is_sfx:
+        if ratio < MIN_SFX_RATIO:
+            problems.append(f"too short ({duration:.1f}s of {item.duration:.1f}s)")
+    else:
+        if longest_silence > MAX_SILENCE_SECONDS:
+            problems.append(f"dead air ({longest_silence:.1f}s of silence)")
+        if ratio < MIN_SPEECH_RATIO:
+            problems.append(f"too short ({duration:.1f}s, about {analysis['expected_seconds']:.1f}s expected)")
+        elif ratio > MAX_SPEECH_RATIO:
+            problems.append(f"too long ({duration:.1f}s, about {analysis['expected_seconds']:.1f}s expected)")
+        if analysis["end_dbfs"] > ABRUPT_END_DBFS:
+            problems.append(f"cut off ({analysis['end_dbfs']} dBFS in the last {ABRUPT_END_MS} ms)")
+    analysis["problems"] = problems
+    return analysis
+
+
+def _cache_path(path):
+    return f"{path}.qa.json"
+
+
+def analyse_cached(item, segment, path, attempts=None):
+    """
+    `analyse`, with the result stored next to the segment file.
+
+    The analysis is reused as long as the file's digest is unchanged. It also
+    records how many times the segment was requested again, so a segment
+    that used up its retries is not requested again on every render.
+
+    Args:
+        attempts (int, optional): Retries made so far, when the segment was just requested again
+
+    Returns:
+        dict: The analysis, with "attempts"
+    """
+    digest = file_digest(path)
+    cache_path = _cache_path(path)
+    cached = None
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get("digest") == digest and cached.get("version") == QA_CACHE_VERSION and attempts is None:
+            count("cache.qa.hit")
+            return cached
+    count("cache.qa.miss")
+    analysis = analyse(item, segment)
+    analysis.update(digest=digest, version=QA_CACHE_VERSION,
+                    attempts=attempts if attempts is not None else (cached or {}).get("attempts", 0))
+    with open(cache_path, 'w') as f:
+        json.dump(analysis, f, indent=4)
+    return analysis
+
+
+def check_segments(segments, decode, resynthesize, report_path):
+    """
+    Check every segment before mixing, requesting failing ones again.
+
+    Segments are decoded and analysed in parallel on the encode pool. Those
+    with problems are deleted and requested again, in parallel on the
+    synthesis pool, then checked again; a segment is retried at most
+    QA_MAX_RETRIES times, and at most QA_RETRY_BUDGET retries are made in
+    all. Segments still failing after that are used as they are, and listed
+    in the report.
+
+    Args:
+        segments (list): (item, path) of every segment, in script order
+        decode (callable): Called with (item, path), returns the AudioSegment before fades
+        resynthesize (callable): Called with (item, path) once the file is deleted, writes it again
+        report_path (str): Where the QA report (JSON) is written
+
+    Returns:
+        list: The decoded AudioSegment of every segment, in order
+    """
+    def inspect(index, attempts=None):
+        item, path = segments[index]
+        segment = decode(item, path)
+        return segment, analyse_cached(item, segment, path, attempts)
+
+    with span("audio.qa", segments=len(segments)) as s:
+        results = list(get_pool("encode").map(inspect, range(len(segments))))
+        budget = QA_RETRY_BUDGET
+        retried = 0
+        while budget > 0:
+            failing = [i for i, (_, analysis) in enumerate(results)
+                       if analysis["problems"] and analysis["attempts"] < QA_MAX_RETRIES][:budget]
+            if not failing:
+                break
+            for i in failing:
+                item, path = segments[i]
+                print(f"🔁 QA: requesting {item} again: {', '.join(results[i][1]['problems'])}")
+                os.remove(path)
+            budget -= len(failing)
+            retried += len(failing)
+            count("audio.qa.retries", len(failing))
+            list(get_pool("synthesis").map(lambda i: resynthesize(*segments[i]), failing))
+            for i, result in zip(failing, get_pool("encode").map(lambda i: inspect(i, results[i][1]["attempts"] + 1), failing)):
+                results[i] = result
+
+        failed = [i for i, (_, analysis) in enumerate(results) if analysis["problems"]]
+        s.set("retries", retried)
+        s.set("failed", len(failed))
+
+    report = {
+        "segments": len(segments),
+        "retries": retried,
+        "failed": len(failed),
+        "results": [dict({key: value for key, value in analysis.items() if key not in ("digest", "version")},
+                         section=item.section, index=item.index, path=path)
+                    for (item, path), (_, analysis) in zip(segments, results)]
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print(f"🔍 QA: {len(segments) - len(failed)}/{len(segments)} segments passed, {retried} requested again")
+    for i in failed:
+        item, _ = segments[i]
+        print(f"⚠️ QA: {item} still has problems, used as is: {', '.join(results[i][1]['problems'])}")
+    return [segment for segment, _ in results]
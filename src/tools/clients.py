@@ -0,0 +1,141 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# Connection pool size per service: how many keep-alive connections are
+# kept open. Matches the most requests the rate limiters let through at
+# once, with headroom for stages of several episodes overlapping.
+# Each is (environment variable, default), read when the client is built so .env can set it.
+HTTP_POOL_SIZES = {
+    "openai": ("OPENAI_POOL_SIZE", 8),
+    "elevenlabs": ("ELEVEN_LABS_POOL_SIZE", 16),
+    "transistor": ("TRANSISTOR_FM_POOL_SIZE", 4),
+    # Downloads and uploads to URLs handed out by the services (e.g. Transistor.fm's S3 upload URL)
+    "http": ("HTTP_POOL_SIZE", 4),
+}
+
+# Request timeout in seconds for ElevenLabs (long episodes take a while to transcribe)
+ELEVEN_LABS_TIMEOUT = 240
+
+# Retries are done by tools.resilience, which also adapts concurrency; the SDKs' own are turned off
+ELEVEN_LABS_REQUEST_OPTIONS = {"max_retries": 0}
+
+TRANSISTOR_FM_DEFAULT_API_URL = "https://api.transistor.fm/v1"
+
+_clients = {}
+_config_loaded = False
+_lock = threading.Lock()
+
+
+def load_config():
+    """Load the .env file into the environment, once per process."""
+    global _config_loaded
+    with _lock:
+        if not _config_loaded:
+            load_dotenv()
+            _config_loaded = True
+
+
+def require_env(name):
+    """Value of a required environment variable, raising ValueError if it is not set."""
+    load_config()
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"{name} not found in environment variables")
+    return value
+
+
+def http_pool_size(service):
+    """Connection pool size of a service, from the environment (and .env) or HTTP_POOL_SIZES."""
+    load_config()
+    variable, default = HTTP_POOL_SIZES[service]
+    return int(os.getenv(variable, str(default)))
+
+
+def _get_or_create(name, factory):
+    with _lock:
+        client = _clients.get(name)
+    if client is None:
+        client = factory()
+        with _lock:
+            client = _clients.setdefault(name, client)
+    return client
+
+
+def get_openai():
+    """
+    Shared OpenAI client.
+
+    The client and its connection pool are created on first use and reused by
+    every tool, so requests after the first skip the TCP and TLS handshakes.
+    """
+    def create():
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+
+        size = http_pool_size("openai")
+        return OpenAI(
+            api_key=require_env("OPENAI_API_KEY"),
+            max_retries=0,
+            http_client=DefaultHttpxClient(limits=httpx.Limits(max_connections=size, max_keepalive_connections=size))
+        )
+
+    return _get_or_create("openai", create)
+
+
+def get_elevenlabs():
+    """Shared ElevenLabs client with a pooled keep-alive connection."""
+    def create():
+        import httpx
+        from elevenlabs.client import ElevenLabs
+
+        size = http_pool_size("elevenlabs")
+        http_client = httpx.Client(
+            timeout=ELEVEN_LABS_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size)
+        )
+        return ElevenLabs(
+            api_key=require_env("ELEVEN_LABS_API_KEY"),
+            base_url=os.getenv("ELEVEN_LABS_BASE_URL"),
+            httpx_client=http_client
+        )
+
+    return _get_or_create("elevenlabs", create)
+
+
+def _session(pool_size, headers=None):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers or {})
+    return session
+
+
+def get_transistor_session():
+    """Shared requests Session for the Transistor.fm API, with the API key header set."""
+    def create():
+        return _session(http_pool_size("transistor"), headers={
+            "x-api-key": require_env("TRANSISTOR_FM_API_KEY"),
+            "Content-Type": "application/json"
+        })
+
+    return _get_or_create("transistor", create)
+
+
+def transistor_api_url():
+    """Transistor.fm API root (TRANSISTOR_FM_API_URL can point it at a local stand-in server)."""
+    load_config()
+    return os.getenv("TRANSISTOR_FM_API_URL", TRANSISTOR_FM_DEFAULT_API_URL)
+
+
+def get_http_session():
+    """
+    Shared requests Session without credentials, for URLs handed out by the
+    services (audio downloads, pre-signed upload URLs).
+    """
+    return _get_or_create("http", lambda: _session(http_pool_size("http")))
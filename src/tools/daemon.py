@@ -0,0 +1,381 @@
+import os
+import json
+import time
+import socket
+import threading
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+try:
+    from tools.episode_metadata import load_episode
+    from tools.job_queue import JobQueue, JOB_KINDS, DEFAULT_QUEUE_PATH
+    from tools.clients import load_config, get_openai, get_elevenlabs, get_transistor_session
+    from tools.workers import get_pool, POOL_SIZES
+    from tools.tracing import tracer, count
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import load_episode
+    from job_queue import JobQueue, JOB_KINDS, DEFAULT_QUEUE_PATH
+    from clients import load_config, get_openai, get_elevenlabs, get_transistor_session
+    from workers import get_pool, POOL_SIZES
+    from tracing import tracer, count
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Address used by the CLI to reach the daemon ("http://host:port" or "unix:/path/to/socket")
+DEFAULT_ADDRESS = os.getenv("RENDER_DAEMON_ADDRESS", f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+
+# Jobs run at once. Each one submits its segments to the shared synthesis and
+# encode pools, so a few jobs are enough to keep the pools busy while others
+# wait on uploads, transcription or ffmpeg.
+DEFAULT_WORKERS = int(os.getenv("RENDER_DAEMON_WORKERS", "3"))
+
+# Seconds between checks for jobs added to the queue file by other processes,
+# and for cancellations of running jobs
+POLL_INTERVAL = 1.0
+
+
+class JobCancelled(Exception):
+    """Raised by a job that stopped because its cancellation was requested."""
+
+
+def run_render(payload, cancelled):
+    """Render the audio of an episode. Payload: script_path, guest_voice_id (optional)."""
+    from tools import audio
+    episode = load_episode(payload["script_path"])
+    guest_voice_id = payload.get("guest_voice_id") or episode.saved_guest_voice_id()
+    if not guest_voice_id:
+        raise ValueError(f"No voice_id.json in {episode.output_dir} and no guest_voice_id given")
+    return {"audio_path": audio.process_script_to_audio(episode, guest_voice_id, cancelled=cancelled)}
+
+
+def run_transcribe(payload, cancelled):
+    """Transcribe an episode's audio. Payload: script_path, audio_path and output (optional)."""
+    from tools import transcript
+    episode = load_episode(payload["script_path"])
+    audio_path = payload.get("audio_path") or f"{episode.output_dir}/audio.mp3"
+    return {"transcript_path": transcript.generate_vtt_from_audio(episode, audio_path, payload.get("output"))}
+
+
+def run_publish(payload, cancelled):
+    """
+    Upload and publish an episode. Payload: script_path, and optionally audio_path,
+    audio_url, transcript_path, image_path, status (defaults to draft) and published_at.
+    """
+    from tools import publication
+    episode = load_episode(payload["script_path"])
+    transcript_path = payload.get("transcript_path") or f"{episode.output_dir}/transcript.vtt"
+    status = payload.get("status", "draft")
+    result = publication.publish_episode(
+        episode=episode,
+        audio_path=payload.get("audio_path") or f"{episode.output_dir}/audio.mp3",
+        transcript_path=transcript_path if os.path.exists(transcript_path) else None,
+        image_path=payload.get("image_path"),
+        publish_status=status,
+        published_at=payload.get("published_at"),
+        audio_url=payload.get("audio_url")
+    )
+    return {"episode_id": result["data"]["id"], "status": status}
+
+
+JOB_HANDLERS = {
+    "render": run_render,
+    "transcribe": run_transcribe,
+    "publish": run_publish,
+}
+
+
+class RenderDaemon:
+    """
+    Long-running worker that processes jobs from a JobQueue.
+
+    Everything a run pays for once stays resident between jobs: the tool
+    modules and their dependencies, the pooled API clients, the shared
+    synthesis and encode pools, the rate limiters (with what they learned
+    about each service's limits) and the cache of file digests.
+
+    Args:
+        queue (JobQueue): The job queue
+        workers (int, optional): Jobs run at once
+        trace_dir (str, optional): Folder for the trace files, rotated whenever the daemon goes idle
+    """
+
+    def __init__(self, queue, workers=DEFAULT_WORKERS, trace_dir="output/traces"):
+        self.queue = queue
+        self.workers = workers
+        self.trace_dir = trace_dir
+        self.running = {}
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._jobs_since_rotation = 0
+
+    def warm_up(self):
+        """Import the tools and create the API clients and worker pools before the first job."""
+        load_config()
+        from tools import audio, transcript, publication  # noqa: F401 (loads pydub, numpy and the SDKs)
+        for name, factory in [("OpenAI", get_openai), ("ElevenLabs", get_elevenlabs), ("Transistor.fm", get_transistor_session)]:
+            try:
+                factory()
+            except ValueError as e:
+                print(f"⚠️  {name} client not created: {e}")
+        for pool in POOL_SIZES:
+            get_pool(pool)
+
+    def start(self):
+        self.warm_up()
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"🔁 Requeued {requeued} jobs interrupted by the last shutdown")
+        tracer.start(self.trace_dir, "daemon")
+        self._threads = [threading.Thread(target=self._work, name=f"job-{i}", daemon=True) for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._watch, name="job-watcher", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop taking jobs and wait for the running ones to finish."""
+        self._stopping.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join()
+        tracer.finish()
+
+    def notify(self):
+        """Wake up idle workers (a job was just submitted)."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        cancelled = threading.Event()
+        with self._lock:
+            self.running[job["id"]] = cancelled
+        print(f"▶️  Job {job['id']} ({job['kind']}, priority {job['priority']}) started")
+        start = time.perf_counter()
+        try:
+            if self.queue.cancel_requested(job["id"]):
+                raise JobCancelled()
+            result = JOB_HANDLERS[job["kind"]](job["payload"], cancelled)
+        except Exception as e:
+            if isinstance(e, JobCancelled) or cancelled.is_set():
+                self.queue.mark_cancelled(job["id"])
+                count("daemon.jobs.cancelled")
+                print(f"🛑 Job {job['id']} cancelled")
+            else:
+                self.queue.fail(job["id"], f"{type(e).__name__}: {e}")
+                count("daemon.jobs.failed")
+                print(f"❌ Job {job['id']} failed: {e}")
+        else:
+            self.queue.complete(job["id"], result)
+            count("daemon.jobs.done")
+            print(f"✅ Job {job['id']} finished in {time.perf_counter() - start:.1f}s: {result}")
+        finally:
+            with self._lock:
+                del self.running[job["id"]]
+                self._jobs_since_rotation += 1
+
+    def _watch(self):
+        """Pass cancellation requests on to running jobs, and rotate the trace files when idle."""
+        while not self._stopping.wait(POLL_INTERVAL):
+            with self._lock:
+                running = dict(self.running)
+                idle = not running and self._jobs_since_rotation > 0
+                if idle:
+                    self._jobs_since_rotation = 0
+            for job_id, cancelled in running.items():
+                if not cancelled.is_set() and self.queue.cancel_requested(job_id):
+                    cancelled.set()
+            if idle and not self.queue.counts().get("queued"):
+                # One set of trace files and one summary per busy period, so memory does not grow
+                tracer.finish()
+                tracer.start(self.trace_dir, "daemon")
+
+    def status(self):
+        with self._lock:
+            running = sorted(self.running)
+        return {"workers": self.workers, "running": running, "jobs": self.queue.counts()}
+
+
+def _handler_class(daemon):
+    queue = daemon.queue
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _job_id(self, parts):
+            try:
+                return int(parts[1])
+            except ValueError:
+                return None
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            parts = parsed.path.strip("/").split("/")
+            if parts == ["health"]:
+                return self._send(200, daemon.status())
+            if parts == ["jobs"]:
+                query = parse_qs(parsed.query)
+                status = query.get("status", [None])[0]
+                try:
+                    limit = int(query.get("limit", ["100"])[0])
+                    if limit < 1:
+                        raise ValueError
+                except ValueError:
+                    return self._send(400, {"error": "limit must be a positive integer"})
+                return self._send(200, {"jobs": queue.list(status=status, limit=limit)})
+            if len(parts) == 2 and parts[0] == "jobs":
+                job = queue.get(self._job_id(parts))
+                return self._send(200, job) if job else self._send(404, {"error": "No such job"})
+            self._send(404, {"error": f"No endpoint GET {parsed.path}"})
+
+        def do_POST(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if parts == ["jobs"]:
+                try:
+                    request = json.loads(body or b"{}")
+                    if not isinstance(request, dict):
+                        return self._send(400, {"error": "Expected a JSON object"})
+                    job_id = queue.submit(request.get("kind"), request.get("payload") or {}, request.get("priority", 0))
+                except (ValueError, TypeError) as e:
+                    return self._send(400, {"error": str(e)})
+                daemon.notify()
+                return self._send(201, queue.get(job_id))
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                job = queue.cancel(self._job_id(parts))
+                return self._send(200, job) if job else self._send(404, {"error": "No such job"})
+            self._send(404, {"error": f"No endpoint POST {self.path}"})
+
+        def do_DELETE(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "jobs":
+                job = queue.cancel(self._job_id(parts))
+                return self._send(200, job) if job else self._send(404, {"error": "No such job"})
+            self._send(404, {"error": f"No endpoint DELETE {self.path}"})
+
+    return Handler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+
+def serve(queue_path=DEFAULT_QUEUE_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, workers=DEFAULT_WORKERS):
+    """
+    Run the render daemon until interrupted.
+
+    Args:
+        queue_path (str, optional): SQLite queue file
+        host (str, optional): Interface the HTTP API listens on
+        port (int, optional): Port of the HTTP API
+        socket_path (str, optional): Listen on this Unix socket instead of TCP
+        workers (int, optional): Jobs run at once
+    """
+    daemon = RenderDaemon(JobQueue(queue_path), workers=workers).start()
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, _handler_class(daemon))
+        address = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), _handler_class(daemon))
+        server.daemon_threads = True
+        address = f"http://{host}:{server.server_address[1]}"
+    print(f"🎧 Render daemon listening on {address} ({workers} workers, queue {queue_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping: waiting for running jobs to finish...")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        daemon.stop()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+    """
+    Client for the render daemon's API.
+
+    Args:
+        address (str, optional): "http://host:port" or "unix:/path/to/socket".
+            Defaults to RENDER_DAEMON_ADDRESS or http://127.0.0.1:8765.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+
+    def _request(self, method, path, payload=None):
+        if self.address.startswith("unix:"):
+            connection = _UnixHTTPConnection(self.address[len("unix:"):])
+        else:
+            parsed = urlparse(self.address)
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port or DEFAULT_PORT, timeout=30)
+        try:
+            body = json.dumps(payload).encode() if payload is not None else None
+            connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"null")
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Render daemon answered {response.status}: {data.get('error') if data else ''}")
+        return data
+
+    def submit(self, kind, payload, priority=0):
+        """Queue a job; returns the job as stored by the daemon."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {', '.join(JOB_KINDS)}")
+        return self._request("POST", "/jobs", {"kind": kind, "payload": payload, "priority": priority})
+
+    def get(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def list(self, status=None, limit=100):
+        query = f"?limit={limit}" + (f"&status={status}" if status else "")
+        return self._request("GET", f"/jobs{query}")["jobs"]
+
+    def cancel(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def health(self):
+        return self._request("GET", "/health")
@@ -1,11 +1,22 @@
 import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
 import pyperclip
 
+try:
+    from tools.episode_metadata import validate_script
+    from tools.script_history import ScriptHistory
+    from tools.clients import get_openai
+    from tools.resilience import call
+    from tools.tracing import span, record_openai_usage
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import validate_script
+    from script_history import ScriptHistory
+    from clients import get_openai
+    from resilience import call
+    from tracing import span, record_openai_usage
 
-def generate_podcast_script(historical_figure, background_research=None, script_path=None, previous_episodes_character_names=[]):
+
+def generate_podcast_script(historical_figure, background_research=None, script_path=None, previous_episodes_character_names=[], interactive=True):
     """
     Generate a podcast script for the Time Traveler Podcast by sending a request to ChatGPT.
     
@@ -13,18 +24,12 @@ def generate_podcast_script(historical_figure, background_research=None, script_
         historical_figure (str): The name of the historical figure to interview
         background_research (str, optional): Background research about the historical figure
         script_path (str, optional): Path to an existing script file to use instead of generating a new one
+        interactive (bool, optional): Copy prompts to the clipboard and ask for feedback. Defaults to True.
     Returns:
         str: Path to the saved podcast script file
     """
-    # Load environment variables
-    load_dotenv()
-    
-    # Get API key from environment variables
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    
-    client = OpenAI(api_key=api_key)
+    # Shared client, configured from .env on first use
+    client = get_openai()
     
     # Construct the system prompt
     with open('src/prompts/script_generation.hbr', 'r', encoding='utf-8') as file:
@@ -42,17 +47,20 @@ def generate_podcast_script(historical_figure, background_research=None, script_
     ]
 
     # Copy the prompt to clipboard
-    pyperclip.copy(f"{system_prompt}\n\n{user_prompt}")
-    print("\nSystem prompt and user prompt copied to clipboard! 📋")
+    if interactive:
+        pyperclip.copy(f"{system_prompt}\n\n{user_prompt}")
+        print("\nSystem prompt and user prompt copied to clipboard! 📋")
     
     # Make the initial API call
     try:
         print(f"Generating initial podcast script with {os.getenv('OPENAI_MODEL')}...")
         if not script_path:
-            response = client.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL"),
-                messages=messages
-            )
+            with span("openai.chat", purpose="script"):
+                response = call("openai", lambda: client.chat.completions.create(
+                    model=os.getenv("OPENAI_MODEL"),
+                    messages=messages
+                ))
+            record_openai_usage(response)
             
             # Extract and parse the response
             script_json = response.choices[0].message.content
@@ -72,16 +80,15 @@ def generate_podcast_script(historical_figure, background_research=None, script_
         messages.append({"role": "assistant", "content": script_json})
         
         # Save initial script
-        iteration = 1
         character_name = script.get("historical_figure", "Unknown")
-        save_script_iteration(script, character_name, iteration)
+        iteration = save_script_iteration(script, character_name)
         
         # Estimate script length
         estimated_length = estimate_script_length(script)
         print(f"\nEstimated script length: {estimated_length:.1f} minutes")
         
-        # Feedback loop
-        while True:
+        # Feedback loop (skipped when running unattended)
+        while interactive:
             # Display script preview
             print("\nScript preview:")
             print(f"Title: {script.get('title', 'No title')}")
@@ -117,10 +124,12 @@ def generate_podcast_script(historical_figure, background_research=None, script_
             messages.append({"role": "user", "content": f"Please improve the podcast script based on this feedback: {user_feedback}"})
             
             # Get improved script
-            improved_response = client.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL"),
-                messages=messages
-            )
+            with span("openai.chat", purpose="script_feedback"):
+                improved_response = call("openai", lambda: client.chat.completions.create(
+                    model=os.getenv("OPENAI_MODEL"),
+                    messages=messages
+                ))
+            record_openai_usage(improved_response)
             
             improved_script_json = improved_response.choices[0].message.content
             
@@ -131,14 +140,21 @@ def generate_podcast_script(historical_figure, background_research=None, script_
             script = improved_script
             messages.append({"role": "assistant", "content": improved_script_json})
             
-            # Save this iteration
-            iteration += 1
-            save_script_iteration(script, character_name, iteration)
+            # Save this iteration and show what changed
+            previous_iteration = iteration
+            iteration = save_script_iteration(script, character_name)
+            if iteration != previous_iteration:
+                history = ScriptHistory.load(f"output/{character_name.replace(' ', '_')}")
+                print(f"\nChanges since iteration {previous_iteration}:")
+                print(history.diff(previous_iteration, iteration))
             
             # Estimate script length
             estimated_length = estimate_script_length(script)
             print(f"\nEstimated script length: {estimated_length:.1f} minutes")
         
+        # Catch schema problems now rather than midway through audio generation
+        validate_script(script)
+        
         # Save the final script and return the path
         output_file = save_script_to_file(script)
         return output_file
@@ -178,26 +194,26 @@ def estimate_script_length(script):
     
     return speech_time_minutes + sfx_time_minutes
 
-def save_script_iteration(script, character_name, iteration):
+def save_script_iteration(script, character_name):
     """
-    Save a specific iteration of the script during the feedback process
+    Record an iteration of the script during the feedback process
+    
+    Only the changes against the previous iteration are stored, in the
+    episode's delta-compressed script history.
     
     Args:
         script (dict): The podcast script to save
         character_name (str): Name of the historical figure
-        iteration (int): The iteration number
-    """
-    # Create output directory if it doesn't exist
-    os.makedirs(f"output/{character_name.replace(' ', '_')}/script_iterations", exist_ok=True)
     
-    # Create filename with character name and iteration number
-    output_file = f"output/{character_name.replace(' ', '_')}/script_iterations/script_iteration_{iteration}.json"
-    
-    # Write the script to the file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(script, f, indent=2, ensure_ascii=False)
+    Returns:
+        int: The iteration number of the saved script
+    """
+    history = ScriptHistory.load(f"output/{character_name.replace(' ', '_')}")
+    iteration = history.record(script)
+    history.save()
     
-    print(f"Iteration {iteration} for {character_name} saved to {output_file}")
+    print(f"Iteration {iteration} for {character_name} saved to {history.path}")
+    return iteration
     
 def save_script_to_file(script, output_file=None):
     """
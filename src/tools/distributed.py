@@ -0,0 +1,395 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import uuid
+import threading
+from pydub import AudioSegment
+
+try:
+    from tools.episode_metadata import SECTIONS, ScriptItem
+    from tools.clients import get_elevenlabs
+    from tools.workers import get_pool, POOL_SIZES
+    from tools.tracing import span, count
+    from tools import audio, loudness, ssml_formatting, music
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import SECTIONS, ScriptItem
+    from clients import get_elevenlabs
+    from workers import get_pool, POOL_SIZES
+    from tracing import span, count
+    import audio
+    import loudness
+    import ssml_formatting
+    import music
+
+# Seconds a claimed task stays leased without a heartbeat before another worker may take it over
+LEASE_SECONDS = float(os.getenv("DISTRIBUTED_LEASE_SECONDS", "60"))
+# Attempts per task before the coordinator gives up on the render
+MAX_TASK_ATTEMPTS = 3
+# Seconds between checks of the shared directory
+POLL_INTERVAL = 0.5
+
+SYNTHESIZE = "synthesize"
+DECODE = "decode"
+
+
+def synthesis_key(item):
+    """Content address of a segment's audio: everything the synthesized bytes depend on."""
+    if item.is_sfx:
+        request = {"sfx": item.text, "duration": item.duration}
+    else:
+        request = {"text": item.tts_text, "voice_id": item.voice_id, "model": audio.TTS_MODEL_ID, "format": audio.TTS_OUTPUT_FORMAT}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def decoded_key(item):
+    """Content address of a segment decoded to PCM with its fades applied."""
+    fades = [audio.SPEECH_FADE_IN_MS, audio.SPEECH_FADE_OUT_MS, audio.SFX_FADE_IN_PERCENT, audio.SFX_FADE_OUT_PERCENT,
+             audio.SFX_MIN_FADE_IN_MS, audio.SFX_MAX_FADE_IN_MS, audio.SFX_MIN_FADE_OUT_MS, audio.SFX_MAX_FADE_OUT_MS]
+    return hashlib.sha256(json.dumps([synthesis_key(item), fades]).encode()).hexdigest()
+
+
+class SharedStore:
+    """
+    Task queue and content-addressed store in a directory shared by every node.
+
+    Layout:
+        store/<ab>/<key>.mp3           synthesized segments
+        store/<ab>/<key>.wav           decoded segments, fades applied
+        tasks/pending/<task>.json      tasks waiting for a worker
+        tasks/claimed/<task>.json      leased tasks; the file's mtime is the last heartbeat
+        tasks/failed/<task>.json       tasks that failed MAX_TASK_ATTEMPTS times
+
+    A task is claimed by renaming it from pending/ to claimed/, which only
+    one worker can do. Files are written to a temporary name and renamed into
+    place, so a reader never sees a partial file. Any node may reclaim tasks
+    whose lease expired (their worker crashed or lost the share).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        for folder in ("store", "tasks/pending", "tasks/claimed", "tasks/failed"):
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    def object_path(self, key, extension):
+        return os.path.join(self.root, "store", key[:2], f"{key}.{extension}")
+
+    def has_object(self, key, extension):
+        return os.path.exists(self.object_path(key, extension))
+
+    def write_object(self, key, extension, write):
+        """Store an object; `write` is called with the temporary path to write it to."""
+        self._write_atomic(self.object_path(key, extension), write)
+
+    def task_path(self, state, task_id):
+        return os.path.join(self.root, "tasks", state, f"{task_id}.json")
+
+    def _write_atomic(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def write_task(self, state, task):
+        def write(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(task, f)
+        self._write_atomic(self.task_path(state, task["id"]), write)
+
+    def publish(self, kind, key, payload):
+        """Queue a task unless its output exists or the same task is already queued or leased."""
+        task_id = f"{kind}-{key}"
+        if any(os.path.exists(self.task_path(state, task_id)) for state in ("pending", "claimed")):
+            return False
+        # A new render gets a fresh set of attempts
+        if os.path.exists(self.task_path("failed", task_id)):
+            os.remove(self.task_path("failed", task_id))
+        self.write_task("pending", {"id": task_id, "kind": kind, "key": key, "payload": payload, "attempts": 0})
+        count(f"distributed.tasks.published.{kind}")
+        return True
+
+    def claim(self, worker_id):
+        """
+        Lease the next pending task, decodes first (they finish segments already paid for).
+
+        Returns:
+            dict: The task, or None if nothing is pending
+        """
+        names = sorted(os.listdir(os.path.join(self.root, "tasks", "pending")), key=lambda name: not name.startswith(DECODE))
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            task_id = name[:-len(".json")]
+            claimed_path = self.task_path("claimed", task_id)
+            try:
+                # Touched first so the lease starts now: the rename keeps the file's modification time
+                os.utime(self.task_path("pending", task_id))
+                os.rename(self.task_path("pending", task_id), claimed_path)
+                with open(claimed_path, 'r', encoding='utf-8') as f:
+                    task = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # Claimed by another worker first, or reclaimed in between
+            # The lease records its owner (and a token, as threads of a worker share its ID),
+            # so a reclaimed task is only released by its new owner
+            task["worker"] = worker_id
+            task["lease"] = uuid.uuid4().hex
+            self.write_task("claimed", task)
+            count("distributed.tasks.claimed")
+            return task
+        return None
+
+    def heartbeat(self, task_id):
+        """Extend a lease. Returns False if the task was reclaimed in the meantime."""
+        try:
+            os.utime(self.task_path("claimed", task_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def owns(self, task):
+        """Whether the task's lease is still the one it was claimed with (not expired and reclaimed)."""
+        try:
+            with open(self.task_path("claimed", task["id"]), 'r', encoding='utf-8') as f:
+                lease = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        return lease.get("worker") == task["worker"] and lease.get("lease") == task["lease"]
+
+    def complete(self, task):
+        """
+        Release the lease of a finished task, unless it was reclaimed in the meantime.
+
+        Returns:
+            bool: False if the lease had expired: the task is pending again or leased by another worker
+        """
+        if not self.owns(task):
+            return False
+        try:
+            os.remove(self.task_path("claimed", task["id"]))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def fail(self, task, error):
+        """Put a failed task back in the queue, or in failed/ once it has no attempts left."""
+        if not self.complete(task):
+            # Reclaimed after its lease expired: whoever has it now decides how it ends
+            print(f"⚠️ Task {task['id']} failed after its lease expired, not recorded: {error}")
+            return
+        retry = dict(task, attempts=task["attempts"] + 1, error=error)
+        retry.pop("worker")
+        retry.pop("lease")
+        self.write_task("pending" if retry["attempts"] < MAX_TASK_ATTEMPTS else "failed", retry)
+
+    def failed_task(self, task_id):
+        path = self.task_path("failed", task_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def reclaim_expired(self):
+        """Move tasks whose lease expired back to pending. Returns how many were reclaimed."""
+        reclaimed = 0
+        folder = os.path.join(self.root, "tasks", "claimed")
+        for name in os.listdir(folder):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                if time.time() - os.path.getmtime(path) > LEASE_SECONDS:
+                    os.rename(path, os.path.join(self.root, "tasks", "pending", name))
+                    reclaimed += 1
+            except FileNotFoundError:
+                pass
+        if reclaimed:
+            count("distributed.tasks.reclaimed", reclaimed)
+            print(f"🔁 Reclaimed {reclaimed} tasks with expired leases")
+        return reclaimed
+
+
+def item_payload(item):
+    return {"section": item.section, "index": item.index, "data": item.to_dict(), "voice_id": item.voice_id, "tts_text": item.tts_text}
+
+
+def item_from_payload(payload):
+    item = ScriptItem(payload["section"], payload["index"], payload["data"])
+    if not item.is_sfx:
+        item.set_tts_text(payload.get("tts_text", item.text))
+        item.resolve_voice(payload["voice_id"])
+    return item
+
+
+def run_task(store, task):
+    """Synthesize or decode one segment into the store."""
+    item = item_from_payload(task["payload"])
+    if task["kind"] == SYNTHESIZE:
+        path = store.object_path(task["key"], "mp3")
+        if not os.path.exists(path):
+            store.write_object(task["key"], "mp3", lambda tmp_path: audio.synthesize_segment(get_elevenlabs(), item, tmp_path))
+        # The decoded part is what the coordinator waits for
+        store.publish(DECODE, decoded_key(item), task["payload"])
+    else:
+        path = store.object_path(task["key"], "wav")
+        if not os.path.exists(path):
+            source = store.object_path(synthesis_key(item), "mp3")
+            decoded = audio.load_segment(item, source)
+            store.write_object(task["key"], "wav", lambda tmp_path: decoded.export(tmp_path, format="wav"))
+
+
+class Worker:
+    """
+    Processes tasks from a SharedStore until stopped.
+
+    Args:
+        store (SharedStore): The shared directory
+        threads (int, optional): Tasks processed at once by this node
+        exit_when_idle (bool, optional): Stop once no task is pending or leased
+    """
+
+    def __init__(self, store, threads=POOL_SIZES["synthesis"], exit_when_idle=False):
+        self.store = store
+        self.threads = threads
+        self.exit_when_idle = exit_when_idle
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.held = set()
+        self.done = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _idle(self):
+        return not any(os.listdir(os.path.join(self.store.root, "tasks", state)) for state in ("pending", "claimed"))
+
+    def _work(self):
+        while not self._stopping.is_set():
+            task = self.store.claim(self.worker_id)
+            if task is None:
+                if self.exit_when_idle and self._idle():
+                    return
+                self._stopping.wait(POLL_INTERVAL)
+                continue
+            with self._lock:
+                self.held.add(task["id"])
+            error = None
+            try:
+                with span(f"distributed.{task['kind']}"):
+                    run_task(self.store, task)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            # No more heartbeats once the lease is about to be released
+            with self._lock:
+                self.held.discard(task["id"])
+            if error:
+                print(f"❌ Task {task['id'][:20]}... failed: {error}")
+                self.store.fail(task, error)
+            else:
+                self.store.complete(task)
+                with self._lock:
+                    self.done += 1
+
+    def _heartbeat(self):
+        while not self._stopping.wait(LEASE_SECONDS / 3):
+            with self._lock:
+                held = list(self.held)
+            for task_id in held:
+                if not self.store.heartbeat(task_id) and task_id in self.held:
+                    print(f"⚠️  Lease lost for task {task_id[:20]}... (it will be redone elsewhere)")
+            self.store.reclaim_expired()
+
+    def run(self):
+        """Process tasks until interrupted (or idle, with exit_when_idle)."""
+        print(f"🛠️  Worker {self.worker_id} processing tasks from {self.store.root} with {self.threads} threads")
+        heartbeat = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._work, name=f"task-{i}", daemon=True) for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping: finishing the tasks in progress...")
+        finally:
+            self._stopping.set()
+            for thread in threads:
+                thread.join()
+        print(f"✅ Worker {self.worker_id} processed {self.done} tasks")
+        return self.done
+
+
+def render_distributed(episode, guest_voice_id, shared_dir, output_dir=None, timeout=None):
+    """
+    Render an episode's audio with the segments made by worker nodes.
+
+    Publishes a synthesis task for every segment not in the shared store yet,
+    waits for the workers to synthesize and decode all of them (reclaiming
+    tasks whose lease expired), then mixes and encodes the episode locally.
+
+    Unlike audio.generate_podcast_audio, it does not run audio QA (the parts
+    arrive decoded, with their fades, and a retry would need the workers) and
+    workers do not use the sound effect library.
+
+    Args:
+        episode (Episode): The validated podcast episode
+        guest_voice_id (str): Voice ID for the historical figure
+        shared_dir (str): Directory shared with the workers
+        output_dir (str, optional): Where audio.mp3 is written. Defaults to the episode folder.
+        timeout (float, optional): Seconds to wait for the workers before giving up
+
+    Returns:
+        str: Path to the final combined audio file
+    """
+    store = SharedStore(shared_dir)
+    output_dir = output_dir or episode.output_dir
+    episode.resolve_voices(guest_voice_id)
+    ssml_formatting.format_episode(episode, audio.TTS_MODEL_ID)
+    items = [item for section in SECTIONS for item in episode.sections[section]]
+    parts = [decoded_key(item) for item in items]
+
+    published = 0
+    for item, part in zip(items, parts):
+        if store.has_object(part, "wav"):
+            count("cache.store.hit")
+            continue
+        count("cache.store.miss")
+        if store.has_object(synthesis_key(item), "mp3"):
+            published += store.publish(DECODE, part, item_payload(item))
+        else:
+            published += store.publish(SYNTHESIZE, synthesis_key(item), item_payload(item))
+    print(f"📤 Published {published} tasks for {len(items)} segments to {shared_dir}")
+
+    start = time.monotonic()
+    last_reported = None
+    with span("distributed.wait", segments=len(items)):
+        while True:
+            missing = [(item, part) for item, part in zip(items, parts) if not store.has_object(part, "wav")]
+            if not missing:
+                break
+            for item, part in missing:
+                failed = store.failed_task(f"{SYNTHESIZE}-{synthesis_key(item)}") or store.failed_task(f"{DECODE}-{part}")
+                if failed:
+                    raise RuntimeError(f"Segment {item} failed on the workers: {failed.get('error')}")
+            if len(missing) != last_reported:
+                print(f"⏳ {len(items) - len(missing)}/{len(items)} segments ready")
+                last_reported = len(missing)
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"{len(missing)} segments still missing after {timeout:.0f}s")
+            store.reclaim_expired()
+            time.sleep(POLL_INTERVAL)
+
+    # The parts are already decoded: reading them back is cheap, no ffmpeg involved
+    print("Combining all audio segments...")
+
+    def level(item, part):
+        path = store.object_path(part, "wav")
+        return loudness.level_segment(item, AudioSegment.from_wav(path), path)
+
+    decoded = list(get_pool("encode").map(level, items, parts))
+    timeline = []
+    combined = music.add_music_bed(audio.mix_segments(items, decoded, timeline), timeline, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    combined_path = audio.export_mix(combined, os.path.join(output_dir, "audio.mp3"))
+    print(f"Podcast audio generated and saved to {combined_path}")
+    return combined_path
@@ -0,0 +1,236 @@
+import os
+import json
+import hashlib
+
+try:
+    from tools.clients import load_config
+    from tools.voice_library import library_voice_id
+except ImportError:  # Running this tool directly as a script
+    from clients import load_config
+    from voice_library import library_voice_id
+
+# Script sections in the order they are played
+SECTIONS = ["intro", "arrival_scene", "conversation", "outro"]
+
+# Speaker name used by the script for sound effects
+SFX_SPEAKER = "SFX"
+
+# Default SFX duration if not specified
+DEFAULT_SFX_DURATION = 5.0
+
+# Average speaking rate (words per minute)
+WORDS_PER_MINUTE = 150
+
+
+class ScriptValidationError(ValueError):
+    """Raised when a podcast script does not match the expected schema."""
+
+
+def content_hash(text):
+    """Short hash used to key cached audio segments on disk."""
+    return hashlib.md5(text.encode()).hexdigest()[:8]
+
+
+class ScriptItem:
+    """
+    A single line of the podcast script (speech or sound effect).
+
+    Word counts and cache hashes are computed once when the item is created
+    or when its voice is resolved, so later stages never re-derive them.
+    """
+    __slots__ = ("section", "index", "speaker", "text", "tts_text", "duration", "is_sfx",
+                 "word_count", "voice_id", "content_hash", "data")
+
+    def __init__(self, section, index, data):
+        self.section = section
+        self.index = index
+        self.data = data
+        self.speaker = data["speaker"]
+        self.text = data["text"]
+        # What is sent to text-to-speech, once formatted (see ssml_formatting)
+        self.tts_text = self.text
+        self.is_sfx = self.speaker == SFX_SPEAKER
+        self.duration = float(data.get("duration", DEFAULT_SFX_DURATION)) if self.is_sfx else None
+        self.word_count = 0 if self.is_sfx else len(self.text.split())
+        self.voice_id = None
+        self.content_hash = content_hash(f"sfx-{self.text}") if self.is_sfx else None
+
+    def resolve_voice(self, voice_id):
+        """Attach the ElevenLabs voice for this line and compute its segment hash."""
+        self.voice_id = voice_id
+        self.content_hash = content_hash(f"{voice_id}-{self.tts_text}")
+
+    def set_tts_text(self, tts_text):
+        """Set the text sent to text-to-speech, which the segment hash follows."""
+        self.tts_text = tts_text
+        if self.voice_id:
+            self.content_hash = content_hash(f"{self.voice_id}-{tts_text}")
+
+    @property
+    def segment_filename(self):
+        """File name of the cached audio for this item, relative to the audio folder."""
+        if self.is_sfx:
+            return f"sfx/{self.section}_sfx_{self.index}_{self.content_hash}.mp3"
+        return f"segments/{self.section}_{self.index}_{self.content_hash}.mp3"
+
+    def to_dict(self):
+        return self.data
+
+    def __repr__(self):
+        return f"ScriptItem({self.section}[{self.index}], {self.speaker!r}, {self.text[:40]!r})"
+
+
+class Episode:
+    """
+    Validated, in-memory representation of a podcast script.
+
+    Loaded once from `script.json` and handed from stage to stage so the
+    script is never re-read or re-parsed along the pipeline.
+    """
+    __slots__ = ("title", "description", "historical_figure", "time_period", "location",
+                 "sections", "items", "script_path", "data")
+
+    def __init__(self, data, script_path=None):
+        validate_script(data, script_path)
+        self.data = data
+        self.script_path = script_path
+        self.title = data["title"]
+        self.description = data["description"]
+        self.historical_figure = data["historical_figure"]
+        self.time_period = data.get("time_period", "")
+        self.location = data.get("location", "")
+        self.sections = {
+            section: [ScriptItem(section, i, item) for i, item in enumerate(data[section])]
+            for section in SECTIONS
+        }
+        self.items = [item for section in SECTIONS for item in self.sections[section]]
+
+    @property
+    def output_dir(self):
+        return f"output/{self.historical_figure.replace(' ', '_')}"
+
+    def saved_guest_voice_id(self):
+        """Guest voice ID saved by voice design in the episode folder, or from the voice library, or None."""
+        path = f"{self.output_dir}/voice_id.json"
+        if not os.path.exists(path):
+            return library_voice_id(self.historical_figure)
+        with open(path, 'r') as file:
+            return json.load(file)["voice_id"]
+
+    @property
+    def speech_items(self):
+        return [item for item in self.items if not item.is_sfx]
+
+    @property
+    def sfx_items(self):
+        return [item for item in self.items if item.is_sfx]
+
+    @property
+    def word_count(self):
+        return sum(item.word_count for item in self.items)
+
+    def estimated_minutes(self):
+        """Estimated length of the episode in minutes (speech + SFX)."""
+        sfx_seconds = sum(item.duration for item in self.items if item.is_sfx)
+        return self.word_count / WORDS_PER_MINUTE + sfx_seconds / 60
+
+    def section_dicts(self, section):
+        """Raw script entries of a section, as stored in `script.json`."""
+        return self.data[section]
+
+    def resolve_voices(self, guest_voice_id, narrator_voice_id=None, leo_voice_id=None):
+        """
+        Resolve the ElevenLabs voice ID of every speech item.
+
+        Unknown speakers fall back to the narrator voice. Missing voice IDs are
+        reported here, before any audio is requested from ElevenLabs.
+
+        Args:
+            guest_voice_id (str): Voice ID for the historical figure
+            narrator_voice_id (str, optional): Defaults to NARRATOR_VOICE_ID
+            leo_voice_id (str, optional): Defaults to LEO_VOICE_ID
+
+        Returns:
+            Episode: self, for chaining
+        """
+        load_config()
+        # Hosts designed with `voice Narrator` or `voice Leo` come from the voice library
+        narrator_voice_id = narrator_voice_id or os.getenv("NARRATOR_VOICE_ID") or library_voice_id("Narrator")
+        leo_voice_id = leo_voice_id or os.getenv("LEO_VOICE_ID") or library_voice_id("Leo")
+
+        if not narrator_voice_id:
+            raise ValueError("NARRATOR_VOICE_ID not found in environment variables. Set this to your ElevenLabs voice ID for the narrator.")
+        if not leo_voice_id:
+            raise ValueError("LEO_VOICE_ID not found in environment variables. Set this to your ElevenLabs voice ID for Leo.")
+        if not guest_voice_id:
+            raise ValueError(f"No voice ID provided for {self.historical_figure}.")
+
+        voice_ids = {
+            "Narrator": narrator_voice_id,
+            "Leo": leo_voice_id,
+            self.historical_figure: guest_voice_id
+        }
+        for item in self.items:
+            if not item.is_sfx:
+                item.resolve_voice(voice_ids.get(item.speaker, narrator_voice_id))
+        return self
+
+    def to_dict(self):
+        return self.data
+
+
+def validate_script(data, script_path=None):
+    """
+    Check that a script dictionary has every field the pipeline relies on.
+
+    Args:
+        data (dict): The podcast script dictionary
+        script_path (str, optional): Path of the script, used in error messages
+
+    Raises:
+        ScriptValidationError: If the script is malformed
+    """
+    source = script_path or "script"
+    if not isinstance(data, dict):
+        raise ScriptValidationError(f"{source}: expected a JSON object, got {type(data).__name__}")
+
+    for field in ["title", "description", "historical_figure"]:
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise ScriptValidationError(f"{source}: missing or empty '{field}'")
+
+    for section in SECTIONS:
+        items = data.get(section)
+        if not isinstance(items, list):
+            raise ScriptValidationError(f"{source}: section '{section}' must be a list of script items")
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise ScriptValidationError(f"{source}: {section}[{i}] must be an object")
+            if not isinstance(item.get("speaker"), str) or not item["speaker"].strip():
+                raise ScriptValidationError(f"{source}: {section}[{i}] has no speaker")
+            if not isinstance(item.get("text"), str) or not item["text"].strip():
+                raise ScriptValidationError(f"{source}: {section}[{i}] has no text")
+            if item["speaker"] == SFX_SPEAKER and "duration" in item:
+                try:
+                    duration = float(item["duration"])
+                except (TypeError, ValueError):
+                    raise ScriptValidationError(f"{source}: {section}[{i}] has a non-numeric duration: {item['duration']!r}")
+                if duration <= 0:
+                    raise ScriptValidationError(f"{source}: {section}[{i}] has a non-positive duration: {duration}")
+
+
+def load_episode(script_path):
+    """
+    Load and validate a script JSON file.
+
+    Args:
+        script_path (str): Path to the script JSON file
+
+    Returns:
+        Episode: The validated episode
+    """
+    with open(script_path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ScriptValidationError(f"{script_path}: invalid JSON ({e})")
+    return Episode(data, script_path=script_path)
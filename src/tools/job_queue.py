@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Default location of the render daemon's queue
+DEFAULT_QUEUE_PATH = "output/jobs.sqlite3"
+
+# Kinds of work the daemon knows how to do
+JOB_KINDS = ("render", "transcribe", "publish")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (status, priority DESC, id);
+"""
+
+
+class JobQueue:
+    """
+    Persistent job queue in a SQLite file.
+
+    Jobs are claimed highest priority first, then oldest first. The file can
+    be shared by several processes: producers may insert jobs while the
+    daemon claims them, and claims are made in an immediate transaction so a
+    job is never handed out twice.
+
+    Args:
+        path (str, optional): SQLite file. Defaults to DEFAULT_QUEUE_PATH.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _as_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def submit(self, kind, payload, priority=0):
+        """
+        Add a job to the queue.
+
+        Args:
+            kind (str): One of JOB_KINDS
+            payload (dict): The job's arguments
+            priority (int, optional): Higher runs first. Defaults to 0.
+
+        Returns:
+            int: The job ID
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {', '.join(JOB_KINDS)}")
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (kind, payload, priority, status, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), int(priority), QUEUED, time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """Mark the next queued job as running and return it, or None if the queue is empty."""
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"]))
+        return self.get(row["id"])
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def complete(self, job_id, result):
+        self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, FAILED, error=error)
+
+    def mark_cancelled(self, job_id):
+        """Record that a running job stopped after its cancellation was requested."""
+        self._finish(job_id, CANCELLED)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        A queued job is cancelled right away. A running job is flagged, and
+        stops at its next cancellation point (see `cancel_requested`).
+
+        Returns:
+            dict: The job after the request, or None if there is no such job
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == QUEUED:
+                db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (CANCELLED, time.time(), job_id))
+            elif row["status"] == RUNNING:
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id):
+        row = self._connection().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def get(self, job_id):
+        return self._as_dict(self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status=None, limit=100):
+        """Most recent jobs first, optionally only those with `status`."""
+        if status:
+            rows = self._connection().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)).fetchall()
+        else:
+            rows = self._connection().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    def counts(self):
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def requeue_interrupted(self):
+        """
+        Put jobs left running by a daemon that stopped back in the queue.
+
+        Jobs whose cancellation was requested are marked cancelled instead.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1",
+                       (CANCELLED, time.time(), RUNNING))
+            return db.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)).rowcount
@@ -0,0 +1,308 @@
+import os
+import json
+import numpy as np
+
+try:
+    from tools.manifest import file_digest
+    from tools.tracing import span, count
+except ImportError:  # Running this tool directly as a script
+    from manifest import file_digest
+    from tracing import span, count
+
+# Loudness every speech segment is brought to (Apple Podcasts and Spotify recommend -16 LUFS for speech)
+TARGET_LUFS = float(os.getenv("LOUDNESS_TARGET_LUFS", "-16"))
+# Sound effects sit a little under the voices
+SFX_TARGET_OFFSET_DB = -4.0
+# Largest correction applied to a segment, either way (quiet breaths should not be blown up)
+MAX_GAIN_DB = 15.0
+
+# No sample, nor any peak between samples, goes above this
+TRUE_PEAK_CEILING_DBTP = -1.0
+# The limiter starts reducing the gain this long before a peak, and releases over the same time
+LIMITER_LOOKAHEAD_MS = 10
+# Only samples within this much of the ceiling can have an inter-sample peak above it
+TRUE_PEAK_MARGIN_DB = 3.0
+
+# ITU-R BS.1770-4 measurement
+BLOCK_SECONDS = 0.4
+STEP_SECONDS = 0.1  # 75% block overlap
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_DB = -10.0
+# K-weighting: high shelf (head effects) followed by a high pass (RLB), as (gain dB, Q, frequency)
+SHELF_FILTER = (3.999843853973347, 0.7071752369554196, 1681.974450955533)
+HIGH_PASS_FILTER = (0.0, 0.5003270373238773, 38.13547087602444)
+# 100 ms steps transformed at once (bounds memory on hour long mixes)
+FRAMES_PER_CHUNK = 600
+
+# Interpolation filter for the true peak: 4x oversampling with a Hann windowed sinc
+OVERSAMPLING = 4
+INTERPOLATION_TAPS = 16
+
+# Version of the measurement stored in the per-segment loudness files
+LOUDNESS_CACHE_VERSION = 1
+
+
+def to_float(segment):
+    """Samples of an AudioSegment as float32 in [-1, 1], shaped (samples, channels)."""
+    if segment.sample_width not in (2, 4):
+        segment = segment.set_sample_width(2)
+    dtype = np.int16 if segment.sample_width == 2 else np.int32
+    samples = np.frombuffer(segment.raw_data, dtype=dtype).reshape(-1, segment.channels)
+    return samples.astype(np.float32) / float(np.iinfo(dtype).max + 1)
+
+
+def from_float(segment, samples):
+    """A copy of `segment` holding `samples` (clipped to full scale, 16-bit)."""
+    data = np.clip(np.round(samples * 32768.0), -32768, 32767).astype(np.int16)
+    return segment._spawn(data.tobytes(), overrides={"sample_width": 2})
+
+
+def _k_filters(rate):
+    """(b, a) coefficients of the two K-weighting biquads at `rate` (they match BS.1770's at 48 kHz)."""
+    gain_db, q, center = SHELF_FILTER
+    k = np.tan(np.pi * center / rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0],
+             [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    _, q, center = HIGH_PASS_FILTER
+    k = np.tan(np.pi * center / rate)
+    a0 = 1 + k / q + k * k
+    high_pass = ([1.0, -2.0, 1.0], [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    return shelf, high_pass
+
+
+def _biquad_power(frequencies, rate, b, a):
+    """Squared magnitude response of a biquad at `frequencies`."""
+    z = np.exp(-2j * np.pi * frequencies / rate)
+    return np.abs((b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)) ** 2
+
+
+def _k_weights(frame_length, rate):
+    """
+    Per-bin weights turning the squared rfft of a frame into its K-weighted mean square.
+
+    The filter only changes how much power each frequency carries (its phase
+    does not matter for loudness), so it is applied as weights on the
+    spectrum instead of sample by sample.
+    """
+    frequencies = np.fft.rfftfreq(frame_length, 1 / rate)
+    weights = np.prod([_biquad_power(frequencies, rate, b, a) for b, a in _k_filters(rate)], axis=0)
+    # Parseval for a real FFT: bins other than DC and Nyquist stand for two
+    weights[1:(frame_length + 1) // 2] *= 2
+    return weights / frame_length ** 2
+
+
+def step_powers(samples, rate):
+    """
+    K-weighted mean square of every 100 ms step of the signal.
+
+    Returns:
+        numpy.ndarray: Shape (steps, channels)
+    """
+    frame_length = int(round(STEP_SECONDS * rate))
+    steps = len(samples) // frame_length
+    weights = _k_weights(frame_length, rate)[:, None]
+    powers = np.empty((steps, samples.shape[1]))
+    for start in range(0, steps, FRAMES_PER_CHUNK):
+        stop = min(start + FRAMES_PER_CHUNK, steps)
+        frames = samples[start * frame_length:stop * frame_length].reshape(stop - start, frame_length, -1)
+        spectrum = np.fft.rfft(frames, axis=1)
+        powers[start:stop] = np.einsum("sfc,fc->sc", spectrum.real ** 2 + spectrum.imag ** 2, weights)
+    return powers
+
+
+def integrated_loudness(samples, rate):
+    """
+    Integrated loudness (ITU-R BS.1770-4) of float samples, in LUFS.
+
+    Gating blocks of 400 ms overlap by 75%; blocks under -70 LUFS, then those
+    more than 10 LU under the loudness of the rest, are left out.
+
+    Returns:
+        float: The loudness, or -inf for silence or audio shorter than a block
+    """
+    powers = step_powers(samples, rate)
+    steps_per_block = int(round(BLOCK_SECONDS / STEP_SECONDS))
+    if len(powers) < steps_per_block:
+        return float("-inf")
+    # Blocks are the mean of consecutive steps; channels are summed (all weighted 1.0, no surround)
+    cumulative = np.concatenate([np.zeros(1), np.cumsum(powers.sum(axis=1))])
+    blocks = (cumulative[steps_per_block:] - cumulative[:-steps_per_block]) / steps_per_block
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[block_loudness > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_DB
+    gated = blocks[(block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def _interpolation_taps():
+    """(taps, phases) filter giving the samples at 1/4, 2/4 and 3/4 of the way to the next one."""
+    offsets = np.arange(-INTERPOLATION_TAPS // 2 + 1, INTERPOLATION_TAPS // 2 + 1)
+    phases = np.arange(1, OVERSAMPLING) / OVERSAMPLING
+    window = np.hanning(INTERPOLATION_TAPS + 2)[1:-1]
+    return np.sinc(phases[None, :] - offsets[:, None]) * window[:, None]
+
+
+def true_peaks(samples, indices):
+    """
+    Absolute true peak (over every channel) from each of `indices` to the next sample.
+
+    Returns:
+        numpy.ndarray: One peak per index
+    """
+    half = INTERPOLATION_TAPS // 2
+    positions = indices[:, None] + np.arange(-half + 1, half + 1)[None, :]
+    inside = (positions >= 0) & (positions < len(samples))
+    # (indices, taps, channels), zeros past either end
+    windows = samples[np.clip(positions, 0, len(samples) - 1)] * inside[:, :, None]
+    between = np.abs(np.einsum("itc,tp->ipc", windows, _interpolation_taps())).max(axis=(1, 2))
+    return np.maximum(np.abs(samples[indices]).max(axis=1), between)
+
+
+def _sliding_min(values, width):
+    """Minimum over the `width` (odd) values centered on each one (van Herk / Gil-Werman), repeating the edge values past the ends."""
+    half = width // 2
+    padded = np.pad(values, (half, half + (-(len(values) + 2 * half)) % width), mode="edge")
+    blocks = padded.reshape(-1, width)
+    prefix = np.minimum.accumulate(blocks, axis=1).ravel()
+    suffix = np.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    starts = np.arange(len(values))
+    return np.minimum(suffix[starts], prefix[starts + width - 1])
+
+
+def _moving_average(values, width):
+    """Mean over the `width` (odd) values centered on each one, repeating the edge values past the ends."""
+    half = width // 2
+    cumulative = np.concatenate([np.zeros(1), np.cumsum(np.pad(values.astype(np.float64), half, mode="edge"))])
+    return (cumulative[width:] - cumulative[:-width]) / width
+
+
+def limit_true_peak(samples, rate, ceiling_db=TRUE_PEAK_CEILING_DBTP):
+    """
+    Look-ahead limiter keeping the true peak under `ceiling_db`.
+
+    The gain each over needs is held over the look-ahead on both sides, then
+    smoothed over the same width, so the gain is already down when the peak
+    arrives and comes back up without clicks. Channels share one gain. Only
+    the surroundings of samples near the ceiling are processed, so clean
+    audio costs one comparison per sample.
+
+    Args:
+        samples (numpy.ndarray): Float samples, shaped (samples, channels). Changed in place.
+        rate (int): Sample rate
+
+    Returns:
+        tuple: (limited samples, number of samples over the ceiling)
+    """
+    ceiling = 10 ** (ceiling_db / 20)
+    # Searched on the flat (interleaved) samples: reducing over the channel axis first is several times slower
+    threshold = np.float32(ceiling * 10 ** (-TRUE_PEAK_MARGIN_DB / 20))
+    flat = samples.reshape(-1)
+    loud = np.flatnonzero((flat > threshold) | (flat < -threshold)) // samples.shape[1]
+    # A peak between two samples is found from the first one
+    candidates = np.unique(np.concatenate([loud, np.maximum(loud - 1, 0)]))
+    if not len(candidates):
+        return samples, 0
+    peaks = true_peaks(samples, candidates)
+    over = peaks > ceiling
+    overs, needed = candidates[over], ceiling / peaks[over]
+    if not len(overs):
+        return samples, 0
+
+    lookahead = max(1, int(rate * LIMITER_LOOKAHEAD_MS / 1000))
+    width = 2 * lookahead + 1
+    reach = 2 * lookahead + 1  # how far a peak's gain reduction extends, holding then smoothing
+    # Overs closer than the limiter's reach share one region
+    breaks = np.flatnonzero(np.diff(overs) > 2 * reach) + 1
+    for region_overs, region_needed in zip(np.split(overs, breaks), np.split(needed, breaks)):
+        start, stop = max(0, region_overs[0] - reach), min(len(samples), region_overs[-1] + reach + 1)
+        required = np.ones(stop - start)
+        np.minimum.at(required, region_overs - start, region_needed)
+        gain = _moving_average(_sliding_min(required, width), width)
+        samples[start:stop] *= gain[:, None].astype(np.float32)
+    return samples, len(overs)
+
+
+def _cache_path(path):
+    return f"{path}.loudness.json"
+
+
+def measure_segment(segment, path):
+    """
+    Integrated loudness of a decoded segment, cached next to its file.
+
+    The measurement is stored with the digest of the segment file, so it is
+    made once per segment, like the synthesis itself.
+
+    Args:
+        segment (AudioSegment): The decoded segment (fades applied)
+        path (str): The segment's file
+
+    Returns:
+        float: The loudness in LUFS (-inf if too short or silent to measure)
+    """
+    digest = file_digest(path)
+    cache_path = _cache_path(path)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get("digest") == digest and cached.get("version") == LOUDNESS_CACHE_VERSION:
+            count("cache.loudness.hit")
+            return cached["lufs"] if cached["lufs"] is not None else float("-inf")
+    count("cache.loudness.miss")
+    lufs = integrated_loudness(to_float(segment), segment.frame_rate)
+    with open(cache_path, 'w') as f:
+        json.dump({"lufs": lufs if np.isfinite(lufs) else None, "digest": digest, "version": LOUDNESS_CACHE_VERSION}, f)
+    return lufs
+
+
+def level_segment(item, segment, path):
+    """
+    Bring a segment to the target loudness.
+
+    The gain is worked out in floating point and any peak it pushes over the
+    ceiling is limited, so boosting a quiet segment never clips.
+
+    Args:
+        item (ScriptItem): The script line or sound effect
+        segment (AudioSegment): The decoded segment (fades applied)
+        path (str): The segment's file, next to which the measurement is cached
+
+    Returns:
+        AudioSegment: The levelled segment
+    """
+    lufs = measure_segment(segment, path)
+    if not np.isfinite(lufs):
+        return segment
+    target = TARGET_LUFS + (SFX_TARGET_OFFSET_DB if item.is_sfx else 0.0)
+    gain_db = float(np.clip(target - lufs, -MAX_GAIN_DB, MAX_GAIN_DB))
+    if abs(gain_db) < 0.1:
+        return segment
+    samples, _ = limit_true_peak(to_float(segment) * np.float32(10 ** (gain_db / 20)), segment.frame_rate)
+    return from_float(segment, samples)
+
+
+def limit_mix(combined):
+    """Apply the true-peak limiter to the final mix before it is encoded."""
+    with span("audio.limit", duration_seconds=round(combined.duration_seconds, 1)) as s:
+        samples, overs = limit_true_peak(to_float(combined), combined.frame_rate)
+        s.set("overs", overs)
+    return from_float(combined, samples) if overs else combined
+
+
+if __name__ == "__main__":
+    import sys
+    from pydub import AudioSegment
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            segment = AudioSegment.from_file(path)
+            samples = to_float(segment)
+            print(f"{path}: {integrated_loudness(samples, segment.frame_rate):.1f} LUFS, "
+                  f"sample peak {20 * np.log10(max(np.abs(samples).max(), 1e-9)):.1f} dBFS")
+    else:
+        print("Usage: python loudness.py <audio_file> [...]")
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import threading
+
+try:
+    from tools.episode_metadata import Episode, load_episode
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import Episode, load_episode
+
+# Folder (inside the episode folder) where stage manifests are written
+MANIFEST_DIRNAME = "manifests"
+
+# Digests of files already hashed in this process, keyed by (path, size, mtime)
+_file_digests = {}
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    """
+    MD5 digest of a file's contents.
+
+    Files are only read again if their size or modification time changed.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        if key in _file_digests:
+            return _file_digests[key]
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    digest = md5.hexdigest()
+    with _file_digests_lock:
+        _file_digests[key] = digest
+    return digest
+
+
+def fingerprint(value):
+    """
+    Stable digest of a stage input.
+
+    Paths to existing files are hashed by content, episodes by their script
+    and anything else by its JSON representation.
+    """
+    if isinstance(value, Episode):
+        value = value.to_dict()
+    elif isinstance(value, str) and os.path.isfile(value):
+        return f"file:{file_digest(value)}"
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(encoded.encode()).hexdigest()
+
+
+def encode_outputs(outputs):
+    """Make stage outputs JSON-serializable (episodes are stored as their script path)."""
+    encoded = {}
+    for name, value in outputs.items():
+        if isinstance(value, Episode):
+            value = {"episode_script_path": value.script_path}
+        encoded[name] = value
+    return encoded
+
+
+def decode_outputs(encoded):
+    outputs = {}
+    for name, value in encoded.items():
+        if isinstance(value, dict) and "episode_script_path" in value:
+            value = load_episode(value["episode_script_path"])
+        outputs[name] = value
+    return outputs
+
+
+def _output_files(outputs):
+    files = []
+    for value in outputs.values():
+        if isinstance(value, Episode):
+            value = value.script_path
+        if isinstance(value, str) and os.path.isfile(value):
+            files.append(value)
+    return files
+
+
+class ManifestStore:
+    """
+    Make-style record of what each stage was built from.
+
+    After a stage runs, a manifest with the digest of each of its inputs and
+    the artifacts it produced is written to `<episode folder>/manifests/`.
+    A later run whose inputs have the same digests, and whose output files
+    still exist, reuses those artifacts instead of running the stage again.
+    """
+
+    def __init__(self, folder):
+        self.folder = os.path.join(folder, MANIFEST_DIRNAME)
+
+    def path(self, stage_name):
+        return os.path.join(self.folder, f"{stage_name}.json")
+
+    def input_digests(self, inputs):
+        return {name: fingerprint(value) for name, value in sorted(inputs.items())}
+
+    def load_if_current(self, stage_name, inputs):
+        """
+        Return the recorded outputs of a stage if they are up to date, else None.
+
+        Args:
+            stage_name (str): The stage name
+            inputs (dict): The stage's current inputs, including model names and prompt templates
+        """
+        path = self.path(stage_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest["inputs"] != self.input_digests(inputs):
+            return None
+        if not all(os.path.exists(file) for file in manifest.get("output_files", [])):
+            return None
+        try:
+            return decode_outputs(manifest["outputs"])
+        except (OSError, ValueError):
+            return None
+
+    def record(self, stage_name, inputs, outputs):
+        """Write the manifest of a stage that just produced `outputs` from `inputs`."""
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.path(stage_name), 'w', encoding='utf-8') as f:
+            json.dump({
+                "stage": stage_name,
+                "inputs": self.input_digests(inputs),
+                "outputs": encode_outputs(outputs),
+                "output_files": _output_files(outputs)
+            }, f, indent=2, ensure_ascii=False)
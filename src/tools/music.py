@@ -1,37 +1,57 @@
 import os
-import json
 import pyperclip
-from openai import OpenAI
-from dotenv import load_dotenv
+import numpy as np
+from pydub import AudioSegment
 
-def generate_music_prompt(script_json_path):
+try:
+    from tools.episode_metadata import load_episode
+    from tools.clients import get_openai
+    from tools.resilience import call
+    from tools.tracing import span, record_openai_usage
+    from tools import loudness
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import load_episode
+    from clients import get_openai
+    from resilience import call
+    from tracing import span, record_openai_usage
+    import loudness
+
+# Music bed: the track made from the music prompt, saved in the episode folder, is laid under these sections
+MUSIC_FILE_NAMES = ("music.mp3", "music.wav", "music.m4a")
+MUSIC_SECTIONS = [section.strip() for section in os.getenv("MUSIC_SECTIONS", "intro").split(",") if section.strip()]
+# Loudness of the bed where nobody speaks, and how far it goes down under speech
+MUSIC_BED_OFFSET_DB = float(os.getenv("MUSIC_BED_OFFSET_DB", "-12"))
+MUSIC_DUCK_DB = float(os.getenv("MUSIC_DUCK_DB", "-12"))
+MUSIC_FADE_IN_MS = 1000
+MUSIC_FADE_OUT_MS = 2500
+MUSIC_LOOP_CROSSFADE_MS = 1500
+
+# Sidechain: the speech envelope is measured on 10 ms frames. The mix is rendered offline, so the
+# bed can go down before speech starts (look-ahead), and it stays down through short gaps (hold)
+DUCK_FRAME_MS = 10
+DUCK_THRESHOLD_DBFS = -45.0
+DUCK_LOOKAHEAD_MS = 250
+DUCK_HOLD_MS = 400
+DUCK_RAMP_MS = 200
+
+def generate_music_prompt(episode, interactive=True):
     """
     Generate a music prompt for Suno.com based on the podcast script
     and copy it to the clipboard.
     
     Args:
-        script_json_path (str): Path to the script JSON file
+        episode (Episode): The podcast episode
+        interactive (bool, optional): Copy the prompts to the clipboard. Defaults to True.
         
     Returns:
         str: The generated music prompt
     """
-    # Load environment variables
-    load_dotenv()
-    
-    # Get API key from environment variables
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    
-    client = OpenAI(api_key=api_key)
-    
-    # Load the script
-    with open(script_json_path, 'r', encoding='utf-8') as f:
-        script = json.load(f)
+    # Shared client, configured from .env on first use
+    client = get_openai()
     
-    historical_figure = script['historical_figure']
-    time_period = script.get('time_period', '')
-    intro_text = ' '.join([item['text'] for item in script['intro'] if item['speaker'] != 'SFX'])
+    historical_figure = episode.historical_figure
+    time_period = episode.time_period
+    intro_text = ' '.join([item.text for item in episode.sections['intro'] if not item.is_sfx])
     
     # Create system prompt
     system_prompt = """
@@ -61,35 +81,192 @@ def generate_music_prompt(script_json_path):
     """
     
     # Copy the prompt to clipboard for manual review if needed
-    pyperclip.copy(f"{system_prompt}\n\n{user_prompt}")
-    print("\nSystem prompt and user prompt copied to clipboard! 📋")
+    if interactive:
+        pyperclip.copy(f"{system_prompt}\n\n{user_prompt}")
+        print("\nSystem prompt and user prompt copied to clipboard! 📋")
     
     # Generate the music prompt
-    response = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL", "gpt-5.2"),
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    )
+    with span("openai.chat", purpose="music_prompt"):
+        response = call("openai", lambda: client.chat.completions.create(
+            model=os.getenv("OPENAI_MODEL", "gpt-5.2"),
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        ))
+    record_openai_usage(response)
     
     # Extract and copy to clipboard
     music_prompt = response.choices[0].message.content.strip()
-    pyperclip.copy(music_prompt)
+    if interactive:
+        pyperclip.copy(music_prompt)
     
     # Save to file
-    output_dir = f"output/{historical_figure.replace(' ', '_')}"
+    output_dir = episode.output_dir
     os.makedirs(output_dir, exist_ok=True)
     output_path = f"{output_dir}/music_prompt.txt"
     
     with open(output_path, 'w', encoding='utf-8') as file:
         file.write(music_prompt)
     
-    print(f"Music prompt for {historical_figure} generated and copied to clipboard!")
+    print(f"Music prompt for {historical_figure} generated!")
     print(f"Saved to {output_path}")
     
     return music_prompt
 
+def find_music(output_dir):
+    """The episode's music track (one of MUSIC_FILE_NAMES in its folder), or None."""
+    for name in MUSIC_FILE_NAMES:
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def section_span(timeline, section, total_ms):
+    """
+    Where a section is in the mix.
+
+    The span runs to the start of the segment after the section, so a bed
+    laid under it fades out through the pause that follows.
+
+    Args:
+        timeline (list): (item, start_ms, end_ms) of each segment, from audio.mix_segments
+        section (str): The section name
+        total_ms (int): Length of the mix
+
+    Returns:
+        tuple: (start_ms, end_ms), or None if the section is not in the mix
+    """
+    positions = [i for i, (item, _, _) in enumerate(timeline) if item.section == section]
+    if not positions:
+        return None
+    end = timeline[positions[-1] + 1][1] if positions[-1] + 1 < len(timeline) else total_ms
+    return timeline[positions[0]][1], end
+
+
+def fit_to_length(samples, length, crossfade):
+    """
+    Trim a track, or loop it with equal-power crossfades, to `length` samples.
+
+    Every loop point is the same, so the crossfade is worked out once and
+    written over all of them at once.
+
+    Args:
+        samples (numpy.ndarray): Float samples, shaped (samples, channels)
+        length (int): Number of samples wanted
+        crossfade (int): Crossfade at each loop point, in samples
+
+    Returns:
+        numpy.ndarray: The fitted samples
+    """
+    if len(samples) >= length:
+        return samples[:length]
+    if not len(samples):
+        return np.zeros((length, samples.shape[1]), dtype=np.float32)
+    crossfade = min(crossfade, len(samples) // 4)
+    period = len(samples) - crossfade
+    copies = -(-(length - crossfade) // period)
+    looped = np.concatenate([np.tile(samples[:period], (copies, 1)), samples[period:]])
+    if crossfade:
+        ramp = np.linspace(0.0, 1.0, crossfade, dtype=np.float32)[:, None]
+        seam = samples[period:] * np.sqrt(1 - ramp) + samples[:crossfade] * np.sqrt(ramp)
+        looped[:copies * period].reshape(copies, period, -1)[1:, :crossfade] = seam
+    return looped[:length]
+
+
+def duck_gains(speech, rate):
+    """
+    Gain of the bed at each sample, from the envelope of the speech over it.
+
+    Frames louder than DUCK_THRESHOLD_DBFS are speech. The speech mask is
+    widened by the look-ahead and the hold, the target gain (0 or
+    MUSIC_DUCK_DB) is smoothed into DUCK_RAMP_MS ramps, and the frame gains
+    are interpolated to the samples.
+
+    Args:
+        speech (numpy.ndarray): Float samples of the mix under the bed, shaped (samples, channels)
+        rate (int): Sample rate
+
+    Returns:
+        numpy.ndarray: Linear gains, shaped (samples, 1)
+    """
+    frame = max(1, rate * DUCK_FRAME_MS // 1000)
+    frames = -(-len(speech) // frame)
+    power = np.mean(np.square(speech, dtype=np.float32), axis=1)
+    power = np.pad(power, (0, frames * frame - len(power))).reshape(frames, frame).mean(axis=1)
+    active = 10 * np.log10(power + 1e-12) > DUCK_THRESHOLD_DBFS
+    # A frame is ducked when there is speech up to the look-ahead after it or the hold before it
+    before, after = DUCK_HOLD_MS // DUCK_FRAME_MS, DUCK_LOOKAHEAD_MS // DUCK_FRAME_MS
+    counts = np.concatenate([np.zeros(1), np.cumsum(np.pad(active, (before, after)))])
+    ducked = counts[before + after + 1:] > counts[:frames]
+    # Centered moving average: every ramp ends before the speech that caused it
+    width = max(1, DUCK_RAMP_MS // DUCK_FRAME_MS) | 1
+    target = np.pad(np.where(ducked, MUSIC_DUCK_DB, 0.0), width // 2, mode="edge")
+    cumulative = np.concatenate([np.zeros(1), np.cumsum(target)])
+    gains_db = (cumulative[width:] - cumulative[:-width]) / width
+    centers = np.arange(frames) * frame + frame / 2
+    return np.interp(np.arange(len(speech)), centers, 10 ** (gains_db / 20)).astype(np.float32)[:, None]
+
+
+def add_music_bed(combined, timeline, output_dir, music_path=None, sections=None):
+    """
+    Lay the episode's music under sections of the mix, ducked under speech.
+
+    The track is brought to MUSIC_BED_OFFSET_DB under the speech loudness
+    target, looped or trimmed to each section, faded in and out, and lowered
+    by MUSIC_DUCK_DB wherever someone speaks over it. All of it is NumPy on
+    the section's samples: the rest of the mix is left as it is.
+
+    Args:
+        combined (AudioSegment): The mix
+        timeline (list): (item, start_ms, end_ms) of each segment, from audio.mix_segments
+        output_dir (str): The episode folder, where the track is looked for
+        music_path (str, optional): The track. Defaults to find_music(output_dir).
+        sections (list, optional): Sections to lay it under. Defaults to MUSIC_SECTIONS.
+
+    Returns:
+        AudioSegment: The mix with the music bed, or `combined` if there is no track
+    """
+    music_path = music_path or find_music(output_dir)
+    spans = [span_ms for span_ms in (section_span(timeline, section, len(combined)) for section in sections or MUSIC_SECTIONS) if span_ms]
+    if not music_path or not spans:
+        return combined
+    with span("audio.music_bed", sections=len(spans)) as s:
+        track = AudioSegment.from_file(music_path)
+        lufs = loudness.measure_segment(track, music_path)
+        track = track.set_frame_rate(combined.frame_rate).set_channels(combined.channels)
+        bed = loudness.to_float(track)
+        if not len(bed):
+            print(f"⚠️ {music_path} has no audio, no music bed")
+            return combined
+        if np.isfinite(lufs):
+            bed *= np.float32(10 ** ((loudness.TARGET_LUFS + MUSIC_BED_OFFSET_DB - lufs) / 20))
+
+        rate = combined.frame_rate
+        frame_bytes = combined.frame_width
+        data = combined.raw_data
+        chunks, position = [], 0
+        for start_ms, end_ms in sorted(spans):
+            start, end = max(position, start_ms * rate // 1000), min(int(combined.frame_count()), end_ms * rate // 1000)
+            if end <= start:
+                continue
+            speech = loudness.to_float(combined.get_sample_slice(start, end))
+            music = fit_to_length(bed, end - start, rate * MUSIC_LOOP_CROSSFADE_MS // 1000) * duck_gains(speech, rate)
+            fade_in, fade_out = min(len(music), rate * MUSIC_FADE_IN_MS // 1000), min(len(music), rate * MUSIC_FADE_OUT_MS // 1000)
+            music[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=np.float32)[:, None]
+            music[len(music) - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)[:, None]
+            mixed = loudness.from_float(combined, speech + music)
+            if mixed.sample_width != combined.sample_width:
+                mixed = mixed.set_sample_width(combined.sample_width)
+            chunks += [data[position * frame_bytes:start * frame_bytes], mixed.raw_data]
+            position = end
+        chunks.append(data[position * frame_bytes:])
+        s.set("seconds", round(sum(end - start for start, end in spans) / 1000, 1))
+    print(f"🎵 Music bed from {music_path} under {', '.join(MUSIC_SECTIONS if sections is None else sections)}")
+    return combined._spawn(b"".join(chunks))
+
+
 if __name__ == "__main__":
     import sys
     
@@ -97,7 +274,7 @@ if __name__ == "__main__":
         print("Usage: python music.py <script_path>")
         sys.exit(1)
     
-    generate_music_prompt(script_json_path=sys.argv[1])
+    generate_music_prompt(episode=load_episode(sys.argv[1]))
 
 
 
@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    from tools.tracing import span
+except ImportError:  # Running a tool directly as a script
+    from tracing import span
+
+# Default number of stages allowed to use each external service at once
+DEFAULT_RESOURCE_LIMITS = {
+    "openai": 2,
+    "elevenlabs": 2,
+    "transistor": 1,
+}
+
+
+class Stage:
+    """
+    A step of the episode pipeline.
+
+    `func` is called with one keyword argument per declared input and must
+    return a dict with every declared output (or a single value when the
+    stage has exactly one output).
+
+    Args:
+        name (str): Unique stage name
+        func (callable): The work to do
+        inputs (list): Names of the artifacts the stage needs
+        outputs (list): Names of the artifacts the stage produces
+        resource (str, optional): External service the stage uses, for concurrency limits
+        extra_inputs (dict, optional): Other things the result depends on (model names,
+            prompt template paths), recorded in the stage manifest
+        existing (callable, optional): Called with the stage inputs when the stage has no
+            manifest yet; returns outputs found on disk from an earlier run, or None
+        manifest (bool, optional): Record a manifest for this stage. Cheap stages whose
+            outputs are not files can opt out. Defaults to True.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), resource=None, extra_inputs=None, existing=None, manifest=True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.resource = resource
+        self.extra_inputs = extra_inputs or {}
+        self.existing = existing
+        self.manifest = manifest
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+class PipelineError(RuntimeError):
+    """Raised when a stage fails or the stage graph cannot be completed."""
+
+
+class Pipeline:
+    """
+    Runs stages as soon as their inputs are available, in parallel.
+
+    Stages whose outputs are already present in the context are skipped, and
+    so are stages whose manifest shows their inputs have not changed since
+    they last ran (unless listed in `force`). At most
+    `resource_limits[resource]` stages using the same external service run
+    at once, and at most `max_workers` stages run overall.
+    """
+
+    def __init__(self, stages, resource_limits=None, max_workers=4, manifests=None, force=(), listener=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.listener = listener
+        self.resource_limits = dict(DEFAULT_RESOURCE_LIMITS, **(resource_limits or {}))
+        self.max_workers = max_workers
+        self.manifests = manifests
+        self.force = set(force)
+        unknown = self.force - set(self.stages)
+        if unknown:
+            raise PipelineError(f"Unknown stages to force: {sorted(unknown)}")
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._check_graph()
+
+    def _check_graph(self):
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise PipelineError(f"'{output}' is produced by both '{producers[output]}' and '{stage.name}'")
+                producers[output] = stage.name
+        self.producers = producers
+
+    def _manifest_inputs(self, stage, kwargs):
+        return dict(kwargs, **{f"extra:{name}": value for name, value in stage.extra_inputs.items()})
+
+    def _reuse_outputs(self, stage, context):
+        """Outputs of an up-to-date earlier run of `stage`, or None if it must run."""
+        if not self.manifests or not stage.manifest or stage.name in self.force:
+            return None
+        kwargs = {name: context[name] for name in stage.inputs}
+        inputs = self._manifest_inputs(stage, kwargs)
+        outputs = self.manifests.load_if_current(stage.name, inputs)
+        if outputs is not None:
+            print(f"⏭️  Skipping stage {stage.name}: up to date")
+            self._notify(stage, "skipped")
+            return outputs
+        if stage.existing and not os.path.exists(self.manifests.path(stage.name)):
+            outputs = stage.existing(**kwargs)
+            if outputs is not None:
+                if len(stage.outputs) == 1 and not (isinstance(outputs, dict) and stage.outputs[0] in outputs):
+                    outputs = {stage.outputs[0]: outputs}
+                print(f"⏭️  Skipping stage {stage.name}: using existing output from an earlier run")
+                self._notify(stage, "skipped")
+                self.manifests.record(stage.name, inputs, outputs)
+                return outputs
+        return None
+
+    def _notify(self, stage, event):
+        if self.listener:
+            self.listener(self, stage.name, event)
+
+    def _run_stage(self, stage, context):
+        kwargs = {name: context[name] for name in stage.inputs}
+        print(f"▶️  Starting stage: {stage.name}")
+        self._notify(stage, "started")
+        start = time.perf_counter()
+        with span(f"stage.{stage.name}"):
+            result = stage.func(**kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.timings[stage.name] = (start, elapsed)
+        print(f"✅ Stage {stage.name} finished in {elapsed:.1f}s")
+        if len(stage.outputs) == 1 and not (isinstance(result, dict) and stage.outputs[0] in result):
+            result = {stage.outputs[0]: result}
+        missing = [output for output in stage.outputs if output not in (result or {})]
+        if missing:
+            raise PipelineError(f"Stage '{stage.name}' did not produce {missing}")
+        if self.manifests and stage.manifest:
+            self.manifests.record(stage.name, self._manifest_inputs(stage, kwargs), result)
+        self._notify(stage, "finished")
+        return result
+
+    def run(self, context):
+        """
+        Run every stage whose outputs are not already in `context`.
+
+        Args:
+            context (dict): Initial artifacts (e.g. character name, paths given on the command line)
+
+        Returns:
+            dict: The context with every produced artifact added
+        """
+        context = dict(context)
+        pending = [stage for stage in self.stages.values()
+                   if not all(output in context for output in stage.outputs)]
+        for stage in self.stages.values():
+            if stage not in pending:
+                print(f"⏭️  Skipping stage {stage.name}: outputs already available")
+                self._notify(stage, "skipped")
+
+        running = {}
+        resource_usage = {}
+        wall_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            while pending or running:
+                # Submit every ready stage allowed by the resource limits
+                for stage in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if not all(name in context for name in stage.inputs):
+                        continue
+                    reused = self._reuse_outputs(stage, context)
+                    if reused is not None:
+                        pending.remove(stage)
+                        context.update(reused)
+                        continue
+                    if stage.resource and resource_usage.get(stage.resource, 0) >= self.resource_limits.get(stage.resource, 1):
+                        continue
+                    pending.remove(stage)
+                    resource_usage[stage.resource] = resource_usage.get(stage.resource, 0) + 1
+                    running[executor.submit(self._run_stage, stage, context)] = stage
+
+                if not running:
+                    if not pending:
+                        break
+                    if any(all(name in context for name in stage.inputs) for stage in pending):
+                        continue
+                    blocked = {stage.name: [name for name in stage.inputs if name not in context] for stage in pending}
+                    raise PipelineError(f"Stages cannot run, missing inputs: {blocked}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    resource_usage[stage.resource] -= 1
+                    try:
+                        context.update(future.result())
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        raise PipelineError(f"Stage '{stage.name}' failed: {e}") from e
+
+        self.wall_time = time.perf_counter() - wall_start
+        self.print_summary()
+        return context
+
+    def critical_path(self):
+        """
+        Longest chain of dependent stages that ran, by duration.
+
+        Returns:
+            tuple: (list of stage names, total seconds)
+        """
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                stage = self.stages[name]
+                chains = [longest(self.producers[i]) for i in stage.inputs
+                          if i in self.producers and self.producers[i] in self.timings]
+                path, duration = max(chains, key=lambda chain: chain[1], default=([], 0.0))
+                best[name] = (path + [name], duration + self.timings[name][1])
+            return best[name]
+
+        return max((longest(name) for name in self.timings), key=lambda chain: chain[1], default=([], 0.0))
+
+    def print_summary(self):
+        if not self.timings:
+            return
+        path, duration = self.critical_path()
+        total = sum(elapsed for _, elapsed in self.timings.values())
+        print(f"\n⏱️  Pipeline finished in {self.wall_time:.1f}s (stages took {total:.1f}s in total)")
+        print(f"⏱️  Critical path ({duration:.1f}s): {' → '.join(path)}")
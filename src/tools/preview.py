@@ -0,0 +1,219 @@
+import os
+import queue
+import shlex
+import struct
+import threading
+import subprocess
+import time
+from concurrent.futures import Future
+from pydub import AudioSegment
+
+try:
+    from tools.clients import get_elevenlabs
+    from tools.workers import get_pool
+    from tools.tracing import span, count
+    from tools import audio, loudness, ssml_formatting, sound_effects
+except ImportError:  # Running this tool directly as a script
+    from clients import get_elevenlabs
+    from workers import get_pool
+    from tracing import span, count
+    import audio
+    import loudness
+    import ssml_formatting
+    import sound_effects
+
+# Command playing raw PCM from its standard input ({rate} and {channels} are filled in).
+# Empty to only write the preview file.
+PREVIEW_PLAYER = os.getenv("PREVIEW_PLAYER", "ffplay -nodisp -autoexit -loglevel error -f s16le -ar {rate} -ac {channels} -i -")
+PREVIEW_CHANNELS = 1
+PREVIEW_SAMPLE_WIDTH = 2
+
+
+class GrowingWav:
+    """
+    A WAV file that can be played while it is being written.
+
+    The header announces the largest possible size until `close` writes the
+    real one, so players read on as long as data keeps arriving.
+    """
+
+    def __init__(self, path, frame_rate, channels=PREVIEW_CHANNELS, sample_width=PREVIEW_SAMPLE_WIDTH):
+        self.path = path
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.data_bytes = 0
+        self.file = open(path, 'wb')
+        self._write_header(0xFFFFFFFF - 36)
+        self.file.flush()
+
+    def _write_header(self, data_bytes):
+        block_align = self.channels * self.sample_width
+        self.file.write(b"RIFF" + struct.pack("<I", min(36 + data_bytes, 0xFFFFFFFF)) + b"WAVE")
+        self.file.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, self.channels, self.frame_rate,
+                                               self.frame_rate * block_align, block_align, 8 * self.sample_width))
+        self.file.write(b"data" + struct.pack("<I", data_bytes))
+
+    @property
+    def seconds(self):
+        return self.data_bytes / (self.frame_rate * self.channels * self.sample_width)
+
+    def append(self, data):
+        self.file.write(data)
+        self.file.flush()
+        self.data_bytes += len(data)
+
+    def close(self):
+        self.file.seek(0)
+        self._write_header(self.data_bytes)
+        self.file.close()
+
+
+class Player:
+    """
+    Local playback of PCM fed as it is rendered.
+
+    Writes go through a queue to a feeding thread, because the player only
+    reads as fast as it plays and rendering must not wait for it.
+    """
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+        self.chunks = queue.Queue()
+        self.thread = threading.Thread(target=self._feed, name="preview-player", daemon=True)
+        self.thread.start()
+
+    def _feed(self):
+        while (chunk := self.chunks.get()) is not None:
+            try:
+                self.process.stdin.write(chunk)
+                self.process.stdin.flush()
+            except BrokenPipeError:  # The player was closed: keep rendering the file
+                break
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def play(self, data):
+        self.chunks.put(data)
+
+    def finish(self):
+        """Wait for the player to play everything it was given."""
+        self.chunks.put(None)
+        self.thread.join()
+        self.process.wait()
+
+
+def start_player(frame_rate):
+    """Start PREVIEW_PLAYER, or return None if it is not set or not installed."""
+    if not PREVIEW_PLAYER:
+        return None
+    command = PREVIEW_PLAYER.format(rate=frame_rate, channels=PREVIEW_CHANNELS)
+    try:
+        return Player(command)
+    except FileNotFoundError:
+        print(f"⚠️ Preview player not found ({command.split()[0]}), set PREVIEW_PLAYER to play along; writing the file only")
+        return None
+
+
+def _then(future, func):
+    """
+    A future of func(future), submitted to the encode pool once `future` is done.
+
+    Nothing waits on `future` from an encode worker, so the encode pool is
+    never filled with jobs blocked on synthesis (which may itself need it).
+    """
+    chained = Future()
+
+    def relay(done):
+        try:
+            chained.set_result(done.result())
+        except BaseException as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(lambda done: get_pool("encode").submit(func, done).add_done_callback(relay))
+    return chained
+
+
+def preview_episode(episode, guest_voice_id, draft=False, sections=None, max_lines=None, play=True):
+    """
+    Render an episode while playing it, starting with the first lines.
+
+    Segments are requested in script order on the synthesis pool, as for a
+    full render, but each one is decoded, levelled and appended to a growing
+    WAV file (and to the player) as soon as it and every line before it are
+    ready, instead of after the whole script. The time to first audio, and
+    the times playback caught up with the render, are reported.
+
+    Args:
+        episode (Episode): The validated podcast episode
+        guest_voice_id (str): Voice ID for the historical figure
+        draft (bool, optional): Use the draft model and cache (see audio.generate_podcast_audio)
+        sections (list, optional): Only preview these sections
+        max_lines (int, optional): Only preview the first lines
+        play (bool, optional): Play the audio as it is written. Defaults to True.
+
+    Returns:
+        str: Path to the preview WAV file
+    """
+    start = time.perf_counter()
+    client = get_elevenlabs()
+    episode.resolve_voices(guest_voice_id)
+    items = audio.select_items(episode, sections, max_lines)
+    speech_dir, model_id, output_format = audio.render_settings(episode.output_dir, draft)
+    ssml_formatting.format_episode(episode, model_id)
+    frame_rate = audio.DRAFT_FRAME_RATE if draft else 44100
+
+    sfx_library = sound_effects.SoundEffectLibrary() if sound_effects.SFX_LIBRARY_ENABLED else None
+
+    # Submitted in script order, so the pool works on the first lines first
+    futures = [get_pool("synthesis").submit(audio.synthesize_segment, client, item, audio.cached_segment_path(item, episode.output_dir, speech_dir),
+                                            model_id=model_id, output_format=output_format, sfx_library=sfx_library)
+               for item in items]
+
+    def prepare(future):
+        item, path = future.result()
+        segment = loudness.level_segment(item, audio.fade_segment(item, audio.decode_segment(path)), path)
+        return segment.set_frame_rate(frame_rate).set_channels(PREVIEW_CHANNELS).set_sample_width(PREVIEW_SAMPLE_WIDTH)
+
+    output_path = os.path.join(episode.output_dir, audio.DRAFT_DIR if draft else "", "preview.wav")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    output = GrowingWav(output_path, frame_rate)
+    player = start_player(frame_rate) if play else None
+    played_from = None
+    time_to_first_audio = 0.0
+    stalls = 0
+    try:
+        with span("audio.preview", segments=len(items), draft=draft) as s:
+            # Each segment is decoded on the encode pool as soon as it is synthesized; they are appended strictly in order
+            prepared = [_then(future, prepare) for future in futures]
+            for i, (item, ready) in enumerate(zip(items, prepared)):
+                segment = ready.result()
+                data = segment.raw_data
+                if i < len(items) - 1:
+                    data += AudioSegment.silent(duration=audio.pause_before(items[i + 1]), frame_rate=frame_rate).raw_data
+                now = time.perf_counter()
+                if played_from is None:
+                    played_from = now
+                    time_to_first_audio = now - start
+                    s.set("time_to_first_audio", round(time_to_first_audio, 3))
+                    print(f"▶️ First audio after {time_to_first_audio:.1f}s: {output_path}")
+                elif now - played_from > output.seconds:
+                    # Playback reached the end of what was written before this line was ready
+                    stalls += 1
+                output.append(data)
+                if player:
+                    player.play(data)
+                print(f"   {i + 1}/{len(items)} lines ready, {output.seconds:.0f}s of audio")
+            s.set("stalls", stalls)
+            if sfx_library:
+                sfx_library.report()
+            count("preview.stalls", stalls)
+    finally:
+        output.close()
+        if player:
+            player.finish()
+    print(f"Preview complete: {output.seconds:.0f}s of audio in {time.perf_counter() - start:.1f}s, "
+          f"first audio after {time_to_first_audio:.1f}s, playback caught up with the render {stalls} times")
+    return output_path
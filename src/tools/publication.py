@@ -1,35 +1,316 @@
-import requests
 import os
 import json
-from dotenv import load_dotenv
+import glob
+import time
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-load_dotenv()
+try:
+    from tools.episode_metadata import load_episode
+    from tools.clients import get_transistor_session, get_http_session, transistor_api_url
+    from tools.resilience import call
+    from tools.tracing import span, count
+    from tools.artwork import prepare_artwork, choose_cover
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import load_episode
+    from clients import get_transistor_session, get_http_session, transistor_api_url
+    from resilience import call
+    from tracing import span, count
+    from artwork import prepare_artwork, choose_cover
 
-headers = {
-    "x-api-key": os.getenv("TRANSISTOR_FM_API_KEY"),
-    "Content-Type": "application/json"
-}
+PUBLISHED_AT_FORMAT = "%Y-%m-%d %H:%M:%S EDT"
+
+# Episodes uploaded and published at once by publish_season (API calls are also rate limited)
+SEASON_WORKERS = int(os.getenv("SEASON_WORKERS", "4"))
+
+# Ranged uploads are sent in chunks of this size
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_MB", "8")) * 1024 * 1024
+# Bytes read from the file at a time while streaming it
+UPLOAD_READ_SIZE = 256 * 1024
+# Seconds an upload URL is reused for by a later attempt (pre-signed URLs expire)
+UPLOAD_URL_MAX_AGE = 30 * 60
+# Seconds between upload progress lines
+PROGRESS_INTERVAL = 2.0
+
+def _checked(response):
+    """Raise for HTTP errors, so that resilience.call can retry the request."""
+    response.raise_for_status()
+    return response
 
 def authorize_upload(filename):
     print(f"Authorizing upload for file: {filename}")
-    url = "https://api.transistor.fm/v1/episodes/authorize_upload"
+    url = f"{transistor_api_url()}/episodes/authorize_upload"
     params = {"filename": filename}
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
+    with span("transistor.authorize_upload"):
+        response = call("transistor", lambda: _checked(get_transistor_session().get(url, params=params)))
     print("Upload authorization successful")
     return response.json()
 
-def upload_audio(upload_url, filepath):
-    print(f"Starting upload of audio file: {filepath}")
+class UploadProgress:
+    """Prints how much of an upload was sent, and how fast, at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, total, already_sent=0):
+        self.total = total
+        self.sent = already_sent
+        self.resumed_from = already_sent
+        self.start = time.perf_counter()
+        self._last_report = 0.0
+
+    @property
+    def throughput(self):
+        """Bytes per second sent by this run (bytes sent before a resume are not counted)."""
+        elapsed = time.perf_counter() - self.start
+        return (self.sent - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+    def reset(self, sent):
+        """Go back to `sent` bytes after a retry restarted the upload."""
+        self.sent = sent
+
+    def advance(self, size):
+        self.sent += size
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL or self.sent >= self.total:
+            self._last_report = now
+            print(f"⬆️  {self.sent / 1e6:.1f}/{self.total / 1e6:.1f} MB ({self.sent / max(self.total, 1):.0%}), "
+                  f"{self.throughput / 1e6:.2f} MB/s")
+
+
+class _ProgressReader:
+    """
+    File-like view of `length` bytes of a file from `offset`, reporting reads to an UploadProgress.
+
+    Reads return at most UPLOAD_READ_SIZE bytes, so the file is streamed rather than loaded.
+
+    It has a length, so requests sends it with a Content-Length (pre-signed
+    storage URLs reject chunked transfer encoding).
+    """
+
+    def __init__(self, file, offset, length, progress):
+        self.file = file
+        self.remaining = length
+        self.length = length
+        self.progress = progress
+        file.seek(offset)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(min(size, UPLOAD_READ_SIZE))
+        self.remaining -= len(data)
+        self.progress.advance(len(data))
+        return data
+
+
+def _file_identity(filepath):
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _content_type(filepath):
+    return mimetypes.guess_type(filepath)[0] or "audio/mpeg"
+
+
+def _upload_state_path(filepath):
+    return f"{os.path.splitext(filepath)[0]}.upload.json"
+
+
+def load_upload_state(filepath):
+    """
+    Upload state saved by an earlier attempt to upload this file, or None.
+
+    The state is dropped if the file changed since, or if its upload URL is
+    too old to still be accepted and the upload was not finished.
+    """
+    path = _upload_state_path(filepath)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get("file") != _file_identity(filepath):
+        return None
+    if not state.get("completed") and time.time() - state.get("authorized_at", 0) > UPLOAD_URL_MAX_AGE:
+        return None
+    return state
+
+
+def save_upload_state(filepath, state):
+    with open(_upload_state_path(filepath), 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4)
+
+
+def _ranged_put(upload_url, total, start=None, body=None, content_type="audio/mpeg"):
+    """
+    PUT part of a file with a Content-Range header, or ask how much the server has (no body).
+
+    The status request ("bytes */total") sends no data, so a server that
+    ignores ranges never gets part of the file as the whole object.
+
+    Returns:
+        int: Bytes the server has received so far, or None if it ignored the range
+            (ranged uploads not supported) or, for a status request, did not answer 308
+    """
+    content_range = f"bytes {start}-{start + len(body) - 1}/{total}" if body is not None else f"bytes */{total}"
+    response = _checked(get_http_session().put(upload_url, data=body if body is not None else b"", headers={
+        "Content-Type": content_type,
+        "Content-Range": content_range
+    }, allow_redirects=False))
+    if response.status_code == 308:  # Resume Incomplete
+        received = response.headers.get("Range")
+        return int(received.rsplit("-", 1)[1]) + 1 if received else 0
+    if body is None or start + len(body) < total:
+        return None
+    return total
+
+
+def _upload_in_chunks(upload_url, filepath, state, progress):
+    """
+    Send the file in UPLOAD_CHUNK_SIZE ranged PUTs, from where the server says it stopped.
+
+    Returns:
+        bool: False if the server does not support ranged uploads
+    """
+    total = state["file"]["size"]
     with open(filepath, 'rb') as file:
-        response = requests.put(upload_url, data=file, headers={"Content-Type": "audio/mpeg"})
-        response.raise_for_status()
-        print("Audio file uploaded successfully.")
+        while state["bytes_sent"] < total:
+            start = state["bytes_sent"]
+            length = min(UPLOAD_CHUNK_SIZE, total - start)
+
+            def put_chunk():
+                # A retry sends the whole chunk again: ranged PUTs of the same bytes are idempotent
+                file.seek(start)
+                return _ranged_put(upload_url, total, start, file.read(length), _content_type(filepath))
+
+            received = call("transistor", put_chunk)
+            if received is None:
+                return False
+            progress.advance(received - start)
+            state["bytes_sent"] = received
+            state["protocol"] = "ranged"
+            save_upload_state(filepath, state)
+    return True
+
+
+def _upload_whole(upload_url, filepath, progress):
+    total = os.path.getsize(filepath)
+
+    def put():
+        # Pre-signed storage URL: sent without the Transistor.fm API key
+        progress.reset(0)
+        with open(filepath, 'rb') as file:
+            return _checked(get_http_session().put(upload_url, data=_ProgressReader(file, 0, total, progress),
+                                                   headers={"Content-Type": _content_type(filepath)}))
+
+    call("transistor", put)
+
+
+def upload_audio(upload_url, filepath, state=None):
+    """
+    Upload a file (audio or artwork) to a pre-signed upload URL.
+
+    The file is sent in ranged chunks when the URL accepts them, so an
+    interrupted upload resumes from the last chunk the server received (the
+    progress is saved next to the file). Otherwise it is streamed in a single
+    PUT, retried as a whole.
+
+    Args:
+        upload_url (str): Upload URL from authorize_upload
+        filepath (str): Path to the file
+        state (dict, optional): Saved upload state (see load_upload_state)
+    """
+    print(f"Starting upload of file: {filepath}")
+    state = state or {"upload_url": upload_url, "authorized_at": time.time(), "file": _file_identity(filepath)}
+    state.setdefault("bytes_sent", 0)
+    total = state["file"]["size"]
+
+    with span("transistor.upload_audio", bytes=total) as s:
+        status = lambda: _ranged_put(upload_url, total, content_type=_content_type(filepath))
+        if state.get("protocol") == "ranged" and state["bytes_sent"]:
+            # Ask the server where it got to: the last chunk may have arrived without us hearing back.
+            # It accepted ranges before, so any answer but 308 means it has the whole file.
+            received = call("transistor", status)
+            state["bytes_sent"] = total if received is None else received
+            print(f"Resuming upload at {state['bytes_sent'] / 1e6:.1f} MB")
+        elif not state.get("protocol"):
+            # Probe with a status request before sending any data; no 308 means no ranged uploads
+            received = call("transistor", status)
+            state["protocol"] = "whole" if received is None else "ranged"
+            state["bytes_sent"] = received or 0
+        progress = UploadProgress(total, already_sent=state["bytes_sent"])
+        chunked = state.get("protocol") != "whole" and _upload_in_chunks(upload_url, filepath, state, progress)
+        if not chunked:
+            state["protocol"] = "whole"
+            save_upload_state(filepath, state)
+            progress = UploadProgress(total)
+            _upload_whole(upload_url, filepath, progress)
+        s.set("protocol", state["protocol"])
+        s.set("resumed_from", progress.resumed_from)
+
+    state["bytes_sent"] = total
+    state["completed"] = True
+    save_upload_state(filepath, state)
+    count("transistor.upload_bytes", total - progress.resumed_from)
+    print(f"File uploaded successfully ({total / 1e6:.1f} MB, {progress.throughput / 1e6:.2f} MB/s).")
+
+def upload_episode_audio(audio_path):
+    """
+    Authorize and upload an episode's audio file to Transistor.fm.
+    
+    The authorization and progress are saved next to the file, so calling
+    this again after a failure (of the upload or of a later publication step)
+    resumes the upload, or reuses the finished one, instead of starting over.
+    Artwork goes through the same storage (see upload_episode_artwork).
+    
+    Args:
+        audio_path (str): Path to the audio file
+    
+    Returns:
+        str: The URL of the uploaded file, to reference when creating the episode
+    """
+    state = load_upload_state(audio_path)
+    if state and state.get("completed"):
+        print(f"File already uploaded: {state['audio_url']}")
+        return state["audio_url"]
+
+    if state:
+        print("Reusing the upload authorization of an earlier attempt")
+    else:
+        authorization = authorize_upload(os.path.basename(audio_path))
+        state = {
+            "upload_url": authorization["data"]["attributes"]["upload_url"],
+            "audio_url": authorization["data"]["attributes"]["audio_url"],
+            "authorized_at": time.time(),
+            "file": _file_identity(audio_path),
+            "bytes_sent": 0
+        }
+        save_upload_state(audio_path, state)
+
+    upload_audio(state["upload_url"], audio_path, state)
+    return state["audio_url"]
+
+def upload_episode_artwork(image_path):
+    """
+    Make the artwork variants of an image and upload the smallest compliant cover.
+    
+    Variants and uploads are both cached, so an image shared by several
+    episodes is resized and uploaded once.
+    
+    Args:
+        image_path (str): Source image
+    
+    Returns:
+        str: The image URL to reference when creating the episode
+    """
+    cover = choose_cover(prepare_artwork(image_path))
+    print(f"Uploading cover {cover} ({os.path.getsize(cover) / 1024:.0f} KB)")
+    return upload_episode_audio(cover)
 
 def create_episode(title, audio_url, description, transcript_text, image_url=None, keywords=None):
     print(f"Creating episode: '{title}'")
-    url = "https://api.transistor.fm/v1/episodes"
+    url = f"{transistor_api_url()}/episodes"
     episode_data = {
         "episode": {
             "show_id": os.getenv("TRANSISTOR_FM_SHOW_ID"),
@@ -48,8 +329,40 @@ def create_episode(title, audio_url, description, transcript_text, image_url=Non
 
     print(f"Creating episode with data: {episode_data}")
 
-    response = requests.post(url, headers=headers, json=episode_data)
-    response.raise_for_status()
+    # A second POST would create a duplicate episode (Transistor.fm has no idempotency keys):
+    # it is only retried after a 429, which guarantees the first one was not processed
+    with span("transistor.create_episode"):
+        response = call("transistor", lambda: _checked(get_transistor_session().post(url, json=episode_data)),
+                        idempotent=False)
+    return response.json()
+
+def update_episode(episode_id, title, audio_url, description, transcript_text, image_url=None, keywords=None):
+    """
+    Update an existing episode's details (PATCH, so repeating it is harmless).
+    
+    Args:
+        episode_id (str): The ID of the episode to update
+        title, audio_url, description, transcript_text, image_url, keywords: As for create_episode
+    
+    Returns:
+        dict: The updated episode data
+    """
+    print(f"Updating episode {episode_id}: '{title}'")
+    url = f"{transistor_api_url()}/episodes/{episode_id}"
+    episode_data = {
+        "episode": {
+            "title": title,
+            "audio_url": audio_url,
+            "description": description,
+            "transcript_text": transcript_text,
+            "keywords": keywords
+        }
+    }
+    if image_url:
+        episode_data["episode"]["image_url"] = image_url
+
+    with span("transistor.update_episode"):
+        response = call("transistor", lambda: _checked(get_transistor_session().patch(url, json=episode_data)))
     return response.json()
 
 def publish_episode_status(episode_id, status="published", published_at=None):
@@ -65,7 +378,7 @@ def publish_episode_status(episode_id, status="published", published_at=None):
         dict: The updated episode data
     """
     print(f"Updating episode {episode_id} status to: {status}")
-    url = f"https://api.transistor.fm/v1/episodes/{episode_id}/publish"
+    url = f"{transistor_api_url()}/episodes/{episode_id}/publish"
     
     episode_data = {
         "episode": {
@@ -80,66 +393,128 @@ def publish_episode_status(episode_id, status="published", published_at=None):
 
     print(f"Updating episode {episode_id} status to: {episode_data}")
     
-    response = requests.patch(url, headers=headers, json=episode_data)
-    response.raise_for_status()
+    with span("transistor.publish_status"):
+        response = call("transistor", lambda: _checked(get_transistor_session().patch(url, json=episode_data)))
     print(f"Episode status updated to {status}")
     return response.json()
 
+def next_tuesday_1am(after=None):
+    """
+    The first Tuesday at 1:00 AM strictly after `after` (defaults to now).
+    
+    Returns:
+        datetime: The slot
+    """
+    after = after or datetime.now()
+    days_until_tuesday = (1 - after.weekday()) % 7  # 1 is Tuesday
+    if days_until_tuesday == 0 and after.hour >= 1:
+        days_until_tuesday = 7  # If it's already Tuesday after 1am, get next Tuesday
+    
+    next_tuesday = after + timedelta(days=days_until_tuesday)
+    return next_tuesday.replace(hour=1, minute=0, second=0, microsecond=0)
+
 def get_next_tuesday_1am():
     """
     Returns the next Tuesday at 1:00 AM as a formatted string in EDT.
     Format: "YYYY-MM-DD HH:MM:SS EDT"
     """
-    now = datetime.now()
-    days_until_tuesday = (1 - now.weekday()) % 7  # 1 is Tuesday
-    if days_until_tuesday == 0 and now.hour >= 1:
-        days_until_tuesday = 7  # If it's already Tuesday after 1am, get next Tuesday
+    return next_tuesday_1am().strftime(PUBLISHED_AT_FORMAT)
+
+def parse_published_at(published_at):
+    """Read a "YYYY-MM-DD HH:MM:SS EDT" date back (the time zone name is dropped)."""
+    return datetime.strptime(published_at.rsplit(" ", 1)[0], PUBLISHED_AT_FORMAT.rsplit(" ", 1)[0])
+
+def weekly_tuesday_slots(count, start=None, taken=()):
+    """
+    Consecutive weekly Tuesday 1:00 AM slots.
     
-    next_tuesday = now + timedelta(days=days_until_tuesday)
-    next_tuesday = next_tuesday.replace(hour=1, minute=0, second=0, microsecond=0)
+    Args:
+        count (int): Number of slots
+        start (datetime, optional): Slots start at the first Tuesday 1:00 AM from this date. Defaults to now.
+        taken (iterable, optional): Slots (datetimes) already used by other episodes, skipped
     
-    return next_tuesday.strftime("%Y-%m-%d %H:%M:%S EDT")
+    Returns:
+        list: `count` datetimes, one week apart except around taken slots
+    """
+    taken = set(taken)
+    slot = next_tuesday_1am((start or datetime.now()) - timedelta(microseconds=1))
+    slots = []
+    while len(slots) < count:
+        if slot not in taken:
+            slots.append(slot)
+        slot += timedelta(weeks=1)
+    return slots
+
+def load_publishing_details(episode):
+    """The publishing_details.json of an episode, or None if it was never published."""
+    path = os.path.join(episode.output_dir, "publishing_details.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def scheduled_slots(output_root="output"):
+    """
+    Publication dates of every episode with saved publishing details, scheduled or published.
+
+    Returns:
+        list: The datetimes, so a new season does not take a slot already used
+    """
+    slots = []
+    for path in glob.glob(os.path.join(output_root, "*", "publishing_details.json")):
+        try:
+            with open(path, 'r') as f:
+                details = json.load(f)
+            if details.get("status") in ("scheduled", "published") and details.get("published_at"):
+                slots.append(parse_published_at(details["published_at"]))
+        except (OSError, ValueError):
+            continue
+    return slots
 
 # Main flow
 # published_at format is YYYY-MM-DD HH:MM:SS EDT
-def publish_episode(script_path, audio_path, transcript_path=None, image_path=None, publish_status="draft", published_at=None):
-    # Load the script to extract title and description
-    with open(script_path, 'r', encoding='utf-8') as file:
-        script = json.load(file)
-    
-    print(f"Beginning publication process for episode: '{script['title']}'")
-    filename = os.path.basename(audio_path)
-    authorization = authorize_upload(filename)
-
-    upload_url = authorization["data"]["attributes"]["upload_url"]
-    audio_url = authorization["data"]["attributes"]["audio_url"]
-
-    upload_audio(upload_url, audio_path)
-
-    with open(transcript_path, 'r', encoding='utf-8') as f:
-        transcript_text = f.read()
-    
-    # Handle image upload if provided
-    image_url = None
-    if image_path:
-        print(f"Image path provided: {image_path}")
-        # Note: You would need to implement image upload functionality
-        # This could involve uploading to S3 or another service and getting a URL
-        pass
-
-    print("Creating episode in Transistor.fm...")
-    episode = create_episode(
-        title=script["title"],
-        audio_url=audio_url,
-        description=script["description"],
-        transcript_text=transcript_text,
-        image_url=image_url
-    )
+# audio_url can be passed when the audio was already uploaded with upload_episode_audio
+def publish_episode(episode, audio_path, transcript_path=None, image_path=None, publish_status="draft", published_at=None, audio_url=None):
+    print(f"Beginning publication process for episode: '{episode.title}'")
+    # The artwork is resized and uploaded while the audio uploads
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        image_future = executor.submit(upload_episode_artwork, image_path) if image_path else None
+        if not audio_url:
+            audio_url = upload_episode_audio(audio_path)
+        image_url = image_future.result() if image_future else None
+
+    transcript_text = None
+    if transcript_path:
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            transcript_text = f.read()
 
-    print("Episode created:", json.dumps(episode, indent=2))
+    # An episode published before is updated rather than created again
+    details = load_publishing_details(episode)
+    episode_id = (details or {}).get("episode_id")
+    if episode_id:
+        print(f"Episode already exists in Transistor.fm ({episode_id}), updating it...")
+        created = update_episode(
+            episode_id,
+            title=episode.title,
+            audio_url=audio_url,
+            description=episode.description,
+            transcript_text=transcript_text,
+            image_url=image_url
+        )
+    else:
+        print("Creating episode in Transistor.fm...")
+        created = create_episode(
+            title=episode.title,
+            audio_url=audio_url,
+            description=episode.description,
+            transcript_text=transcript_text,
+            image_url=image_url
+        )
+
+    print("Episode saved:", json.dumps(created, indent=2))
     
     # Publish the episode if requested
-    episode_id = episode["data"]["id"]
+    episode_id = created["data"]["id"]
     if publish_status == "published":
         print(f"Publishing episode {episode_id}...")
         publish_result = publish_episode_status(episode_id, "published")
@@ -153,17 +528,98 @@ def publish_episode(script_path, audio_path, transcript_path=None, image_path=No
         print("Episode scheduled:", json.dumps(publish_result, indent=2))
 
     # Save the publication details to a file
-    output_dir = f"output/{script['historical_figure'].replace(' ', '_')}"
+    output_dir = episode.output_dir
     details_path = os.path.join(output_dir, "publishing_details.json")
     os.makedirs(output_dir, exist_ok=True)
     with open(details_path, 'w') as f:
         json.dump({
             "episode_id": episode_id,
-            "published_at": published_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S EDT")
+            "audio_url": audio_url,
+            "status": publish_status,
+            "published_at": published_at or datetime.now().strftime(PUBLISHED_AT_FORMAT)
         }, f, indent=4)
     
     print(f"Publishing details saved to {details_path}")
-    return episode
+    return created
+
+def find_ready_episodes(output_root="output"):
+    """
+    Episodes in `output_root` with a script and rendered audio, oldest render first.
+    
+    Returns:
+        list: The loaded episodes
+    """
+    ready = []
+    for folder in os.listdir(output_root):
+        script_path = os.path.join(output_root, folder, "script.json")
+        audio_path = os.path.join(output_root, folder, "audio.mp3")
+        if os.path.exists(script_path) and os.path.exists(audio_path):
+            ready.append((os.path.getmtime(audio_path), load_episode(script_path)))
+    return [episode for _, episode in sorted(ready, key=lambda entry: entry[0])]
+
+def publish_season(episodes, publish_status="scheduled", start=None, max_workers=SEASON_WORKERS):
+    """
+    Publish several episodes at once, one per week.
+    
+    Can be run again safely: episodes with a recorded Transistor.fm ID are
+    updated instead of created, scheduled episodes keep their slot, uploads
+    already done are reused, and published episodes are left alone. New
+    episodes get the free weekly Tuesday 1:00 AM slots from `start`, in order.
+    
+    Args:
+        episodes (list): Episodes to publish, in broadcast order
+        publish_status (str, optional): "scheduled" (default) or "draft"
+        start (datetime, optional): First possible slot. Defaults to now.
+        max_workers (int, optional): Episodes uploaded and published at once
+    
+    Returns:
+        list: One dict per episode with its title, episode_id, status, published_at and action
+    """
+    plan = []
+    # Slots used by any episode, including ones outside this season or scheduled by an earlier run
+    taken = scheduled_slots()
+    for episode in episodes:
+        details = load_publishing_details(episode) or {}
+        status = details.get("status")
+        if details.get("episode_id") and status in (None, "published"):
+            # Details saved before statuses were recorded could belong to a live episode
+            print(f"⏭️  {episode.title}: already published ({details['episode_id']}), left alone")
+            continue
+        if status == "scheduled" and details.get("published_at"):
+            taken.append(parse_published_at(details["published_at"]))
+        plan.append((episode, details))
+
+    # Episodes scheduled by an earlier run keep their slot, the others fill the free slots in order
+    unscheduled = [episode for episode, details in plan if details.get("status") != "scheduled"]
+    slots = dict(zip(unscheduled, weekly_tuesday_slots(len(unscheduled), start, taken))) if publish_status == "scheduled" else {}
+
+    def publish(entry):
+        episode, details = entry
+        published_at = details.get("published_at") if details.get("status") == "scheduled" else None
+        if episode in slots:
+            published_at = slots[episode].strftime(PUBLISHED_AT_FORMAT)
+        transcript_path = os.path.join(episode.output_dir, "transcript.vtt")
+        # No audio_url: the upload state next to audio.mp3 decides whether an earlier upload still matches the file
+        result = publish_episode(
+            episode=episode,
+            audio_path=os.path.join(episode.output_dir, "audio.mp3"),
+            transcript_path=transcript_path if os.path.exists(transcript_path) else None,
+            publish_status=publish_status,
+            published_at=published_at if publish_status == "scheduled" else None
+        )
+        return {
+            "title": episode.title,
+            "episode_id": result["data"]["id"],
+            "status": publish_status,
+            "published_at": published_at,
+            "action": "updated" if details.get("episode_id") else "created"
+        }
+
+    print(f"Publishing {len(plan)} episodes with {max_workers} workers...")
+    with span("transistor.publish_season", episodes=len(plan)):
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="season") as executor:
+            results = list(executor.map(publish, plan))
+    return sorted(results, key=lambda result: result["published_at"] or "")
 
 if __name__ == "__main__":
     import sys
@@ -182,7 +638,7 @@ if __name__ == "__main__":
     published_at = sys.argv[6] if len(sys.argv) > 6 else None
     
     result = publish_episode(
-        script_path=script_path,
+        episode=load_episode(script_path),
         audio_path=audio_path,
         transcript_path=transcript_path,
         image_path=image_path,
@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import random
+import itertools
+import threading
+import email.utils
+
+try:
+    from tools.workers import rate_limit
+    from tools.tracing import count
+except ImportError:  # Running a tool directly as a script
+    from workers import rate_limit
+    from tracing import count
+
+# Attempts per call, including the first one
+MAX_ATTEMPTS = int(os.getenv("API_MAX_ATTEMPTS", "6"))
+# Exponential backoff: a random delay up to BASE * 2^attempt, capped at MAX (seconds)
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 60.0
+# HTTP statuses worth retrying (timeouts, rate limits and server errors)
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+RATE_LIMITED_STATUS = 429
+
+# Consecutive failed attempts that open a service's circuit, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("API_BREAKER_FAILURES", "8"))
+BREAKER_RESET_SECONDS = float(os.getenv("API_BREAKER_RESET_SECONDS", "30"))
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_transport_errors = None
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service that keeps failing.
+
+    After `failure_threshold` consecutive failed attempts the circuit opens
+    and calls fail immediately with CircuitOpenError. Once `reset_timeout`
+    has passed a single trial call is let through: if it succeeds the
+    circuit closes again, otherwise it stays open for another period.
+    Rate-limit answers (429) do not count as failures.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None  # Token of the trial call running, if any
+        self._trials = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """
+        Raise CircuitOpenError unless a call may be made now.
+
+        Returns:
+            int: A token if the call is the half-open trial (to give to release_trial), else None
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return None
+            if state == "half_open" and self._trial is None:
+                self._trial = next(self._trials)
+                return self._trial
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"{self.name} is failing, not calling it again for {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    count(f"circuit.{self.name}.opened")
+                    print(f"⚡ Circuit opened for {self.name} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = None
+
+    def release_trial(self, token):
+        """Free the trial slot if the trial `token` ended without a result (e.g. interrupted)."""
+        with self._lock:
+            if token is not None and self._trial == token:
+                self._trial = None
+
+
+def circuit_breaker(service):
+    """Process-wide CircuitBreaker for an external service."""
+    with _breakers_lock:
+        if service not in _breakers:
+            _breakers[service] = CircuitBreaker(service)
+        return _breakers[service]
+
+
+def _duration_seconds(value):
+    """Parse durations like '1s', '6m0s', '250ms' or '1.5' (as sent in rate-limit reset headers)."""
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+def retry_after_seconds(headers):
+    """
+    Seconds the service asked us to wait, from Retry-After (seconds or HTTP date),
+    retry-after-ms or a rate-limit reset header, or None.
+    """
+    if not headers:
+        return None
+    headers = {name.lower(): value for name, value in dict(headers).items()}
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        value = headers["retry-after"]
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(value) if value else None
+            if date is not None:
+                return max(0.0, date.timestamp() - time.time())
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset"):
+        if name in headers:
+            return _duration_seconds(headers[name])
+    return None
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (zero-based) retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _is_transport_error(error):
+    """Whether `error` is a network failure (connection reset, timeout...) rather than an HTTP answer."""
+    global _transport_errors
+    if _transport_errors is None:
+        types = [ConnectionError, TimeoutError]
+        try:
+            import requests
+            types += [requests.exceptions.ConnectionError, requests.exceptions.Timeout]
+        except ImportError:
+            pass
+        try:
+            import httpx
+            types.append(httpx.TransportError)
+        except ImportError:
+            pass
+        try:
+            import openai
+            types.append(openai.APIConnectionError)
+        except ImportError:
+            pass
+        _transport_errors = tuple(types)
+    return isinstance(error, _transport_errors)
+
+
+def _status_and_headers(error):
+    """HTTP status and response headers carried by an SDK or requests exception."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+    return status, headers
+
+
+def _observe_rate_limit_headers(limiter, headers):
+    """
+    Hold the service back until its window resets when a response says no requests are left.
+
+    Only results with a `.headers` mapping (requests responses) reach this.
+    """
+    headers = {name.lower(): value for name, value in dict(headers or {}).items()}
+    remaining = headers.get("x-ratelimit-remaining-requests", headers.get("x-ratelimit-remaining"))
+    if remaining is None:
+        return
+    try:
+        exhausted = int(float(remaining)) <= 0
+    except ValueError:
+        return
+    if exhausted:
+        limiter.record_throttle()
+        limiter.pause(retry_after_seconds(headers) or 1.0)
+
+
+def call(service, request, idempotent=True, max_attempts=MAX_ATTEMPTS):
+    """
+    Call an external service with rate limiting, retries and circuit breaking.
+
+    `request` is called with no arguments and must perform the whole request
+    (including reading a streamed body and raising on HTTP errors), so that a
+    retry repeats all of it. Rate limits (429) and transient failures (5xx,
+    timeouts, dropped connections) are retried with jittered exponential
+    backoff, waiting as long as Retry-After asks. Rate limits also lower the
+    service's concurrency (see RateLimiter). Requests that are not idempotent
+    are only retried after a 429, which guarantees the service did nothing.
+
+    Rate-limit headers of successful responses (x-ratelimit-remaining) are only
+    seen when the result exposes `.headers`, as requests responses do. SDK
+    calls return parsed objects, so they are only slowed down by 429s.
+
+    Args:
+        service (str): "openai", "elevenlabs" or "transistor"
+        request (callable): Performs the request and returns its result
+        idempotent (bool, optional): Whether repeating the request is harmless. Defaults to True.
+        max_attempts (int, optional): Attempts before giving up
+
+    Returns:
+        The value returned by `request`
+    """
+    limiter = rate_limit(service)
+    breaker = circuit_breaker(service)
+    for attempt in range(max_attempts):
+        trial = breaker.allow()
+        try:
+            with limiter:
+                result = request()
+        except Exception as e:
+            status, headers = _status_and_headers(e)
+            throttled = status == RATE_LIMITED_STATUS
+            if not (status in RETRYABLE_STATUSES or (status is None and _is_transport_error(e))):
+                if status is not None:
+                    # The service answered: a client error is not a sign that it is down
+                    breaker.record_success()
+                # Anything else (a bug in `request`, a parsing error) says nothing about the service
+                raise
+            if throttled:
+                limiter.record_throttle()
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            if attempt == max_attempts - 1 or not (idempotent or throttled):
+                raise
+
+            delay = retry_after_seconds(headers)
+            if delay is not None:
+                # Everyone waits, not just this request
+                limiter.pause(min(delay, BACKOFF_MAX_SECONDS))
+            else:
+                delay = backoff_delay(attempt)
+                time.sleep(delay)
+            count(f"retries.{service}")
+            print(f"🔁 {service} {'rate limited' if throttled else f'failed ({status or type(e).__name__})'}, "
+                  f"retrying in {delay:.1f}s (attempt {attempt + 2}/{max_attempts})")
+            continue
+        else:
+            breaker.record_success()
+            limiter.record_success()
+            _observe_rate_limit_headers(limiter, getattr(result, "headers", None))
+            return result
+        finally:
+            # A trial that recorded no result (KeyboardInterrupt, a cancelled worker) must not keep the circuit half-open
+            breaker.release_trial(trial)
@@ -0,0 +1,273 @@
+import os
+import re
+import json
+import glob
+import copy
+from difflib import SequenceMatcher
+
+# File holding the base script and the deltas of every later iteration
+HISTORY_FILENAME = "history.json"
+
+
+def _item_key(item):
+    """Hashable, order-independent key for a script item."""
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def _is_item_list(value):
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+
+def _diff_items(old_items, new_items):
+    """
+    Structural delta between two lists of script items.
+
+    Unchanged runs are stored as ["=", start, end] ranges into the old list and
+    new or modified items as ["+", [items...]], so a feedback round that edits a
+    couple of lines costs a couple of lines of storage.
+    """
+    matcher = SequenceMatcher(None, [_item_key(i) for i in old_items], [_item_key(i) for i in new_items], autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", new_items[j1:j2]])
+    return ops
+
+
+def _apply_item_delta(old_items, ops):
+    # Items are copied, so versions rebuilt from the same history never share (and mutate) an item
+    items = []
+    for op in ops:
+        if op[0] == "=":
+            items.extend(copy.deepcopy(old_items[op[1]:op[2]]))
+        else:
+            items.extend(copy.deepcopy(op[1]))
+    return items
+
+
+def compute_delta(old_script, new_script):
+    """
+    Compute the delta that turns `old_script` into `new_script`.
+
+    Args:
+        old_script (dict): The previous iteration
+        new_script (dict): The new iteration
+
+    Returns:
+        dict: Delta with changed fields, structural section changes and removed keys
+    """
+    delta = {}
+    for key, value in new_script.items():
+        old_value = old_script.get(key)
+        if old_value == value:
+            continue
+        if _is_item_list(value) and _is_item_list(old_value):
+            delta.setdefault("sections", {})[key] = _diff_items(old_value, value)
+        else:
+            delta.setdefault("fields", {})[key] = value
+    removed = [key for key in old_script if key not in new_script]
+    if removed:
+        delta["removed"] = removed
+    return delta
+
+
+def apply_delta(script, delta):
+    """Return a new script with `delta` applied to `script` (sharing nothing with either)."""
+    sections = delta.get("sections", {})
+    result = {}
+    for key, value in script.items():
+        result[key] = _apply_item_delta(value, sections[key]) if key in sections else copy.deepcopy(value)
+    result.update(copy.deepcopy(delta.get("fields", {})))
+    for key in delta.get("removed", []):
+        result.pop(key, None)
+    return result
+
+
+def line_changes(old_script, new_script, sections=None):
+    """
+    Line-level changes between two scripts, section by section.
+
+    Args:
+        old_script (dict): The older script
+        new_script (dict): The newer script
+        sections (list, optional): Sections to compare. Defaults to every list-of-items section.
+
+    Returns:
+        list: (tag, section, old_range, new_range) tuples, where tag is one of
+              'equal', 'replace', 'delete' or 'insert'
+    """
+    if sections is None:
+        sections = [key for key, value in new_script.items() if _is_item_list(value)]
+    changes = []
+    for section in sections:
+        old_items = old_script.get(section) if _is_item_list(old_script.get(section)) else []
+        new_items = new_script.get(section) if _is_item_list(new_script.get(section)) else []
+        matcher = SequenceMatcher(None, [_item_key(i) for i in old_items], [_item_key(i) for i in new_items], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            changes.append((tag, section, (i1, i2), (j1, j2)))
+    return changes
+
+
+def format_diff(old_script, new_script):
+    """
+    Human-readable line diff between two scripts.
+
+    Returns:
+        str: One line per added (+) or removed (-) script line
+    """
+    output = []
+    for tag, section, (i1, i2), (j1, j2) in line_changes(old_script, new_script):
+        if tag == "equal":
+            continue
+        for i in range(i1, i2):
+            item = old_script[section][i]
+            output.append(f"- {section}[{i}] {item.get('speaker')}: {item.get('text')}")
+        for j in range(j1, j2):
+            item = new_script[section][j]
+            output.append(f"+ {section}[{j}] {item.get('speaker')}: {item.get('text')}")
+    return "\n".join(output)
+
+
+class ScriptHistory:
+    """
+    Delta-compressed store of every script iteration of an episode.
+
+    Iteration 1 is stored in full; each later iteration is stored as a delta
+    against the one before it. The history also remembers which iteration was
+    last rendered to audio so the audio cache can tell which lines are unchanged.
+    """
+
+    def __init__(self, folder, base=None, deltas=None, rendered_iteration=None):
+        self.folder = folder
+        self.base = base
+        self.deltas = deltas or []
+        self.rendered_iteration = rendered_iteration
+        self._cache = {}
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, "script_iterations", HISTORY_FILENAME)
+
+    @property
+    def latest_iteration(self):
+        return 0 if self.base is None else len(self.deltas) + 1
+
+    @classmethod
+    def load(cls, folder):
+        """
+        Load the history of an episode folder.
+
+        Folders written before the history existed only have full
+        `*script_iteration_N.json` copies; those are imported in order.
+
+        Args:
+            folder (str): The episode output folder (e.g. output/Ada_Lovelace)
+
+        Returns:
+            ScriptHistory: The loaded history (empty if the episode has none)
+        """
+        history = cls(folder)
+        if os.path.exists(history.path):
+            with open(history.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            history.base = data["base"]
+            history.deltas = data["deltas"]
+            history.rendered_iteration = data.get("rendered_iteration")
+            return history
+
+        def iteration_number(path):
+            return int(re.search(r"_(\d+)\.json$", path).group(1))
+
+        legacy_files = glob.glob(os.path.join(folder, "script_iterations", "*script_iteration_*.json"))
+        for path in sorted(legacy_files, key=iteration_number):
+            with open(path, 'r', encoding='utf-8') as f:
+                history.record(json.load(f))
+        return history
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "base": self.base,
+                "deltas": self.deltas,
+                "rendered_iteration": self.rendered_iteration
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, iteration):
+        """
+        Reconstruct a given iteration.
+
+        Args:
+            iteration (int): Iteration number, starting at 1
+
+        Returns:
+            dict: The script as it was at that iteration (a copy the caller may modify)
+        """
+        return copy.deepcopy(self._reconstruct(iteration))
+
+    def _reconstruct(self, iteration):
+        # Iteration 1 is the base itself, and cached versions are reused: they never leave the history uncopied
+        if not 1 <= iteration <= self.latest_iteration:
+            raise IndexError(f"Iteration {iteration} not found (history has {self.latest_iteration})")
+        if iteration not in self._cache:
+            script = self.base if iteration == 1 else apply_delta(self._reconstruct(iteration - 1), self.deltas[iteration - 2])
+            self._cache[iteration] = script
+        return self._cache[iteration]
+
+    def latest(self):
+        return self.get(self.latest_iteration) if self.base is not None else None
+
+    def record(self, script):
+        """
+        Add a script as a new iteration, unless it is identical to the latest one.
+
+        Returns:
+            int: The iteration number of `script`
+        """
+        # The delta would otherwise hold the caller's items, which they may go on editing
+        script = copy.deepcopy(script)
+        if self.base is None:
+            self.base = script
+            self._cache = {}
+            return 1
+        latest = self._reconstruct(self.latest_iteration)
+        if latest == script:
+            return self.latest_iteration
+        self.deltas.append(compute_delta(latest, script))
+        self._cache[self.latest_iteration] = script
+        return self.latest_iteration
+
+    def diff(self, old_iteration, new_iteration):
+        """Human-readable line diff between two iterations."""
+        return format_diff(self._reconstruct(old_iteration), self._reconstruct(new_iteration))
+
+    def mark_rendered(self, iteration):
+        """Remember that `iteration` is the script the cached audio segments were made from."""
+        self.rendered_iteration = iteration
+
+    def reusable_lines(self, script, since_iteration=None):
+        """
+        Map lines of `script` to identical lines of a previous iteration.
+
+        Lines that merely moved (because something was inserted or removed
+        before them) keep the same text and voice, so their existing audio
+        segment can be reused as-is.
+
+        Args:
+            script (dict): The script about to be rendered
+            since_iteration (int, optional): Iteration to compare with. Defaults to the last rendered one.
+
+        Returns:
+            dict: {(section, new_index): old_index} for every unchanged line
+        """
+        since_iteration = since_iteration or self.rendered_iteration
+        if not since_iteration or since_iteration > self.latest_iteration:
+            return {}
+        reusable = {}
+        for tag, section, (i1, i2), (j1, j2) in line_changes(self._reconstruct(since_iteration), script):
+            if tag == "equal":
+                for offset in range(i2 - i1):
+                    reusable[(section, j1 + offset)] = i1 + offset
+        return reusable
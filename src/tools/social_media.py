@@ -1,39 +1,38 @@
 import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
 
-def generate_social_media_posts(script_path, background_research=None, output_path=None):
+try:
+    from tools.episode_metadata import load_episode
+    from tools.clients import get_openai
+    from tools.resilience import call
+    from tools.tracing import span, record_openai_usage
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import load_episode
+    from clients import get_openai
+    from resilience import call
+    from tracing import span, record_openai_usage
+
+def generate_social_media_posts(episode, background_research=None, output_path=None, interactive=True):
     """
     Generate social media posts for LinkedIn and X (Twitter) using ChatGPT based on podcast script.
     
     Args:
-        script_path (str): Path to the podcast script JSON file
+        episode (Episode): The podcast episode
         background_research (str, optional): Background research about the historical figure
         output_path (str, optional): Path to save the generated social media posts
+        interactive (bool, optional): Ask for feedback on the generated posts. Defaults to True.
         
     Returns:
         dict: Generated social media posts for different platforms
         str: Path to the saved social media posts file
     """
-    # Load environment variables
-    load_dotenv()
-    
-    # Get API key from environment variables
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    
-    client = OpenAI(api_key=api_key)
-    
-    # Load the podcast script
-    with open(script_path, 'r', encoding='utf-8') as file:
-        script_data = json.load(file)
+    # Shared client, configured from .env on first use
+    client = get_openai()
     
-    historical_figure = script_data.get('historical_figure', script_data.get('title'))
+    historical_figure = episode.historical_figure
     
     # Extract full script content
-    script_content = json.dumps(script_data, ensure_ascii=False)
+    script_content = json.dumps(episode.to_dict(), ensure_ascii=False)
     
     # Construct the system prompt
     system_prompt = """
@@ -84,10 +83,12 @@ def generate_social_media_posts(script_path, background_research=None, output_pa
     ]
     
     # Call ChatGPT API to generate social media posts
-    response = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL"),  # or another appropriate model
-        messages=messages
-    )
+    with span("openai.chat", purpose="social_media"):
+        response = call("openai", lambda: client.chat.completions.create(
+            model=os.getenv("OPENAI_MODEL"),  # or another appropriate model
+            messages=messages
+        ))
+    record_openai_usage(response)
     
     # Extract the generated content
     generated_content = response.choices[0].message.content
@@ -105,8 +106,8 @@ def generate_social_media_posts(script_path, background_research=None, output_pa
     # Save to file
     save_path = save_social_media_posts(posts, historical_figure, output_path)
     
-    # Feedback loop
-    while True:
+    # Feedback loop (skipped when running unattended)
+    while interactive:
         print("\nGenerated LinkedIn Post:")
         print(posts["linkedin"])
         print("\nGenerated X (Twitter) Post:")
@@ -121,10 +122,12 @@ def generate_social_media_posts(script_path, background_research=None, output_pa
         
         # Get improved posts based on feedback
         print("\nGenerating improved posts based on your feedback...")
-        response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL"),
-            messages=messages
-        )
+        with span("openai.chat", purpose="social_media_feedback"):
+            response = call("openai", lambda: client.chat.completions.create(
+                model=os.getenv("OPENAI_MODEL"),
+                messages=messages
+            ))
+        record_openai_usage(response)
         
         # Extract the updated content
         generated_content = response.choices[0].message.content
@@ -186,7 +189,7 @@ if __name__ == "__main__":
     output_path = sys.argv[3] if len(sys.argv) > 3 else None
     
     posts, save_path = generate_social_media_posts(
-        script_path=script_path,
+        episode=load_episode(script_path),
         background_research=background_research,
         output_path=output_path
     )
@@ -0,0 +1,298 @@
+import os
+import re
+import glob
+import json
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pydub import AudioSegment
+
+try:
+    from tools.episode_metadata import SFX_SPEAKER, SECTIONS, DEFAULT_SFX_DURATION, content_hash
+    from tools.manifest import file_digest
+    from tools.workers import POOL_SIZES
+    from tools.tracing import span, count
+    from tools.loudness import to_float
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import SFX_SPEAKER, SECTIONS, DEFAULT_SFX_DURATION, content_hash
+    from manifest import file_digest
+    from workers import POOL_SIZES
+    from tracing import span, count
+    from loudness import to_float
+
+# Index of every generated sound effect, shared by all episodes
+SFX_LIBRARY_PATH = "output/sfx_library.json"
+SFX_LIBRARY_GLOB = "output/*/audio/sfx/*.mp3"
+# Set SFX_LIBRARY=0 to always generate new sound effects
+SFX_LIBRARY_ENABLED = os.getenv("SFX_LIBRARY", "1") != "0"
+
+# Matching: share of description tokens in common (Jaccard), and how far the durations may differ
+MIN_SIMILARITY = float(os.getenv("SFX_LIBRARY_SIMILARITY", "0.6"))
+DURATION_TOLERANCE = 0.2       # reused as is within 20% of the requested duration
+MAX_LOOPS = 4                  # a steady effect is looped up to this many times
+LOOP_CROSSFADE_MS = 250
+# Steady (loopable) effects: ambiences whose 100 ms levels vary less than this
+MAX_LOOP_VARIATION_DB = 6.0
+SFX_EXPORT_BITRATE = "128k"
+
+# Words that do not tell sound effects apart
+STOPWORDS = {"a", "an", "the", "of", "in", "on", "at", "with", "and", "or", "to", "from", "by", "for", "into",
+             "sound", "sounds", "effect", "effects", "noise", "audio", "background", "some", "is", "are"}
+
+# Version of the features stored in the index
+LIBRARY_VERSION = 1
+
+
+def description_tokens(text):
+    """Normalized tokens of a description: lowercase words, stopwords dropped, crudely stemmed."""
+    tokens = set()
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        tokens.add(word)
+    return tokens
+
+
+def similarity(tokens, other):
+    """Jaccard similarity of two token sets."""
+    if not tokens or not other:
+        return 0.0
+    return len(tokens & other) / len(tokens | other)
+
+
+def audio_features(segment):
+    """
+    Duration, level and steadiness of a decoded effect.
+
+    Returns:
+        dict: duration_seconds, rms_dbfs, and variation_db (spread of the 100 ms levels of its non-silent part)
+    """
+    samples = to_float(segment)
+    mono = np.abs(samples).max(axis=1) if samples.shape[1] > 1 else np.abs(samples[:, 0])
+    frame = max(1, segment.frame_rate // 10)
+    frames = len(mono) // frame
+    levels = 10 * np.log10(np.mean(np.square(mono[:frames * frame].reshape(frames, frame), dtype=np.float64), axis=1) + 1e-12) if frames else np.zeros(0)
+    audible = levels[levels > -50.0]
+    rms = float(10 * np.log10(np.mean(np.square(mono, dtype=np.float64)) + 1e-12)) if len(mono) else -120.0
+    return {
+        "duration_seconds": round(len(samples) / segment.frame_rate, 3),
+        "rms_dbfs": round(rms, 1),
+        "variation_db": round(float(np.std(audible)), 1) if len(audible) > 1 else 0.0,
+    }
+
+
+def _effect_hash(path):
+    """Content hash in an effect's file name (<section>_sfx_<index>_<hash>.mp3)."""
+    return os.path.splitext(os.path.basename(path))[0].rsplit("_", 1)[-1]
+
+
+def _script_effects():
+    """{content hash: (description, duration)} of the sound effects of every episode script."""
+    effects = {}
+    for script_path in glob.glob("output/*/script.json"):
+        try:
+            with open(script_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for section in SECTIONS:
+            for entry in data.get(section) or []:
+                if isinstance(entry, dict) and entry.get("speaker") == SFX_SPEAKER and isinstance(entry.get("text"), str):
+                    effects[content_hash(f"sfx-{entry['text']}")] = (entry["text"], float(entry.get("duration", DEFAULT_SFX_DURATION)))
+    return effects
+
+
+class SoundEffectLibrary:
+    """
+    Every sound effect generated so far, across episodes, and the requests it can answer.
+
+    The index is only refreshed when a new effect is requested, so renders
+    that find all their effects in their own cache never scan the library.
+    Each render gets its own instance, which counts how requests were served.
+    """
+
+    def __init__(self, path=SFX_LIBRARY_PATH):
+        self.path = path
+        self.effects = None
+        self.tokens = {}
+        self.index = {}
+        self.lock = threading.Lock()
+        self.stats = {"reuse": 0, "trim": 0, "loop": 0, "generated": 0}
+
+    def _load(self):
+        self.effects = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            if saved.get("version") == LIBRARY_VERSION:
+                self.effects = saved["effects"]
+
+    def save(self):
+        if self.effects is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": LIBRARY_VERSION, "effects": self.effects}, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def _describe(self, path, description, duration):
+        """Index entry of an effect file, decoding it for its features."""
+        features = audio_features(AudioSegment.from_file(path))
+        return dict(features, description=description, requested_seconds=duration, digest=file_digest(path))
+
+    def refresh(self):
+        """Add effects generated since the index was saved, and drop deleted ones."""
+        with span("sfx_library.refresh") as s:
+            if self.effects is None:
+                self._load()
+            paths = set(glob.glob(SFX_LIBRARY_GLOB))
+            for path in set(self.effects) - paths:
+                del self.effects[path]
+            new = [path for path in paths if path not in self.effects or self.effects[path]["digest"] != file_digest(path)]
+            if new:
+                described = _script_effects()
+                # Effects whose script is gone cannot be described, so they are left out
+                known = [path for path in new if _effect_hash(path) in described]
+                # Refreshes run on synthesis threads, while encode workers may be waiting on synthesis
+                # (previews): decoding on the shared encode pool could deadlock, so it gets its own threads
+                with ThreadPoolExecutor(max_workers=POOL_SIZES["encode"], thread_name_prefix="sfx-library") as executor:
+                    for path, entry in zip(known, executor.map(lambda path: self._describe(path, *described[_effect_hash(path)]), known)):
+                        self.effects[path] = entry
+                self.save()
+            s.set("effects", len(self.effects))
+            s.set("indexed", len(new))
+            self._build_index()
+
+    def _build_index(self):
+        # Inverted index: only effects sharing a token with a request are compared with it
+        self.tokens = {}
+        self.index = {}
+        for path, entry in self.effects.items():
+            self._index_effect(path, entry["description"])
+
+    def _index_effect(self, path, description):
+        self.tokens[path] = description_tokens(description)
+        for token in self.tokens[path]:
+            self.index.setdefault(token, []).append(path)
+
+    def match(self, description, duration):
+        """
+        The best library effect for a request, and how to fit it.
+
+        Args:
+            description (str): The requested sound effect
+            duration (float): Requested duration in seconds
+
+        Returns:
+            tuple: (path, action) with action "reuse", "trim" or "loop", or None if nothing fits
+        """
+        tokens = description_tokens(description)
+        with self.lock:
+            if self.effects is None:
+                self.refresh()
+            candidates = [(path, self.effects[path], self.tokens[path])
+                          for path in {path for token in tokens for path in self.index.get(token, [])}]
+        best = None
+        for path, entry, effect_tokens in candidates:
+            if not os.path.exists(path):
+                continue
+            score = similarity(tokens, effect_tokens)
+            if score < MIN_SIMILARITY:
+                continue
+            length = entry["duration_seconds"]
+            if abs(length - duration) <= DURATION_TOLERANCE * duration:
+                action = "reuse"
+            elif length > duration:
+                action = "trim"
+            elif entry["variation_db"] <= MAX_LOOP_VARIATION_DB and duration <= MAX_LOOPS * length:
+                action = "loop"
+            else:
+                continue
+            # Most similar first, then the effect needing the least change
+            rank = (score, action == "reuse", -abs(length - duration))
+            if best is None or rank > best[0]:
+                best = (rank, path, action)
+        return (best[1], best[2]) if best else None
+
+    def fit(self, path, action, duration, output_path):
+        """Write a library effect to output_path, trimmed or looped to the requested duration."""
+        with span(f"sfx_library.{action}"):
+            if action == "reuse":
+                shutil.copyfile(path, output_path)
+                return output_path
+            effect = AudioSegment.from_file(path)
+            target_ms = int(duration * 1000)
+            if action == "loop":
+                looped = effect
+                while len(looped) < target_ms:
+                    looped = looped.append(effect, crossfade=min(LOOP_CROSSFADE_MS, len(effect) // 4))
+                effect = looped
+            effect[:target_ms].export(output_path, format="mp3", bitrate=SFX_EXPORT_BITRATE)
+        return output_path
+
+    def provide(self, description, duration, output_path, generate):
+        """
+        Write a sound effect from the library if one fits, or else generate it.
+
+        Args:
+            description (str): The requested sound effect
+            duration (float): Requested duration in seconds
+            output_path (str): Where the effect is written
+            generate (callable): Called with (description, duration, output_path) when nothing fits
+
+        Returns:
+            str: output_path
+        """
+        found = self.match(description, duration)
+        if found:
+            path, action = found
+            print(f"Sound effect from the library ({action}): {description} <- {path}")
+            self.fit(path, action, duration, output_path)
+            count(f"sfx_library.{action}")
+            count("cache.sfx_library.hit")
+        else:
+            generate(description, duration, output_path)
+            action = "generated"
+            count("cache.sfx_library.miss")
+        # The new effect can answer the next requests of this render (a copy has the features of its source)
+        if action == "reuse":
+            entry = dict(self.effects[path], description=description, requested_seconds=duration, digest=file_digest(output_path))
+        else:
+            entry = self._describe(output_path, description, duration) if os.path.exists(output_path) else None
+        with self.lock:
+            self.stats[action] += 1
+            if entry and self.effects is not None:
+                self.effects[output_path] = entry
+                self._index_effect(output_path, description)
+        return output_path
+
+    def report(self):
+        """Print how this render's new sound effects were served, and save the index."""
+        requested = sum(self.stats.values())
+        if not requested:
+            return
+        reused = requested - self.stats["generated"]
+        print(f"🔊 SFX library: {reused}/{requested} new sound effects from the library "
+              f"({self.stats['reuse']} reused, {self.stats['trim']} trimmed, {self.stats['loop']} looped), "
+              f"{self.stats['generated']} generated")
+        with self.lock:
+            self.save()
+
+
+if __name__ == "__main__":
+    import sys
+    library = SoundEffectLibrary()
+    library.refresh()
+    if len(sys.argv) > 1:
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SFX_DURATION
+        print(library.match(sys.argv[1], duration) or "No match, it would be generated")
+    else:
+        for path, entry in sorted(library.effects.items()):
+            print(f"{entry['duration_seconds']:>6.1f}s  {entry['description'][:60]:<60}  {path}")
+        print(f"{len(library.effects)} sound effects. Usage: python sound_effects.py [\"description\" [duration]]")
@@ -0,0 +1,494 @@
+import os
+import re
+import json
+import threading
+from collections import deque
+
+try:
+    from tools.manifest import file_digest
+    from tools.tracing import span, count
+except ImportError:  # Running this tool directly as a script
+    from manifest import file_digest
+    from tracing import span, count
+
+# Pronunciations shared by every episode, and the per-episode file (in the episode folder) that extends them.
+# Each maps a word or phrase to a respelling read instead ("Tal-ee-rahn"), or to
+# {"ipa": "...", "alias": "...", "case_sensitive": true}; see format_line.
+GLOBAL_LEXICON_PATH = os.getenv("PRONUNCIATION_LEXICON", "pronunciations.json")
+EPISODE_LEXICON_FILE = "pronunciations.json"
+
+# Models that read <phoneme> tags; the others get an entry's alias, or the word as written
+PHONEME_MODELS = ("eleven_flash_v2", "eleven_turbo_v2", "eleven_monolingual_v1")
+
+# How *emphasized* words are marked: "caps" (what ElevenLabs models stress), "ssml" (<emphasis>) or "none"
+EMPHASIS_STYLE = os.getenv("EMPHASIS_STYLE", "caps")
+# Script markers: "[pause]", or "[pause 1.5s]"; ElevenLabs breaks are at most 3 seconds
+DEFAULT_BREAK_SECONDS = 0.75
+MAX_BREAK_SECONDS = 3.0
+
+ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+        "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+SCALES = [(10 ** 12, "trillion"), (10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand")]
+ORDINAL_WORDS = {"one": "first", "two": "second", "three": "third", "five": "fifth", "eight": "eighth",
+                 "nine": "ninth", "twelve": "twelfth"}
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+CURRENCIES = {"$": ("dollar", "dollars"), "£": ("pound", "pounds"), "€": ("euro", "euros")}
+ROMAN_VALUES = {"I": 1, "V": 5, "X": 10, "L": 50}
+# Highest Roman numeral read as a regnal number ("Louis XIV"), and words followed by numbered parts instead
+MAX_REGNAL_NUMBER = 30
+NON_REGNAL_WORDS = {"War", "Act", "Part", "Chapter", "Volume", "Book", "Phase", "Vatican", "Apollo", "Type", "Class", "Mark"}
+
+
+def number_words(n):
+    """English words for a whole number ("one hundred twenty-three")."""
+    if n < 0:
+        return "minus " + number_words(-n)
+    if n < 20:
+        return ONES[n]
+    if n < 100:
+        return TENS[n // 10] + (f"-{ONES[n % 10]}" if n % 10 else "")
+    if n < 1000:
+        return f"{ONES[n // 100]} hundred" + (f" {number_words(n % 100)}" if n % 100 else "")
+    for scale, name in SCALES:
+        if n >= scale:
+            return f"{number_words(n // scale)} {name}" + (f" {number_words(n % scale)}" if n % scale else "")
+
+
+def ordinal_words(n):
+    """English words for an ordinal ("twenty-first")."""
+    words = number_words(n)
+    head, sep, last = words.rpartition("-" if "-" in words.split(" ")[-1] else " ")
+    if last in ORDINAL_WORDS:
+        last = ORDINAL_WORDS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return head + sep + last
+
+
+def year_words(n):
+    """A year as it is read aloud ("eighteen oh five", "fifteen hundred", "two thousand nine")."""
+    if n < 100 or 2000 <= n < 2010 or n % 1000 == 0:
+        return number_words(n)
+    century, rest = divmod(n, 100)
+    if rest == 0:
+        return f"{number_words(century)} hundred"
+    return f"{number_words(century)} {number_words(rest) if rest >= 10 else 'oh ' + ONES[rest]}"
+
+
+def decade_words(n):
+    """A decade ("nineteen twenties", "eighteen hundreds")."""
+    words = year_words(n)
+    if words.endswith("hundred"):
+        return words + "s"
+    if words.endswith("y"):
+        return words[:-1] + "ies"
+    return words + "s"
+
+
+def roman_value(numeral):
+    """Value of a Roman numeral up to 89, or None if it is not a well-formed one."""
+    total = 0
+    for i, letter in enumerate(numeral):
+        value = ROMAN_VALUES[letter]
+        if i + 1 < len(numeral) and value < ROMAN_VALUES[numeral[i + 1]]:
+            total -= value
+        else:
+            total += value
+    return total if _to_roman(total) == numeral else None
+
+
+def _to_roman(n):
+    result = ""
+    for value, letters in [(50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]:
+        while n >= value:
+            result += letters
+            n -= value
+    return result
+
+
+def _digits(text):
+    return int(text.replace(",", ""))
+
+
+def _decimal_words(text):
+    whole, _, fraction = text.partition(".")
+    words = number_words(_digits(whole))
+    if fraction:
+        words += " point " + " ".join(ONES[int(digit)] for digit in fraction)
+    return words
+
+
+def _currency(match):
+    singular, plural = CURRENCIES[match["symbol"]]
+    amount, scale = match["amount"], match["scale"]
+    if scale:
+        return f"{_decimal_words(amount)} {scale} {plural}"
+    whole, _, cents = amount.partition(".")
+    words = f"{number_words(_digits(whole))} {singular if _digits(whole) == 1 else plural}"
+    if cents and int(cents) and match["symbol"] == "$" and len(cents) == 2:
+        words += f" and {number_words(int(cents))} {'cent' if int(cents) == 1 else 'cents'}"
+    elif cents and int(cents):
+        words = f"{_decimal_words(amount)} {plural}"
+    return words
+
+
+def _date(match):
+    if match["month_first"]:
+        month, day, year = match["month_first"], match["day_after"], match["year_after"]
+        words = f"{month} {ordinal_words(int(day))}"
+    else:
+        month, day, year = match["month_after"], match["day_first"], match["year_first"]
+        words = f"{match['article'] or 'the'} {ordinal_words(int(day))} of {month}"
+    return words + (f", {year_words(int(year))}" if year else "")
+
+
+def _time(match):
+    hour, minute, second = int(match["hour"]), int(match["minute"]), match["second"]
+    if minute == 0:
+        words = number_words(hour) + ("" if match["meridiem"] or second else " o'clock")
+    else:
+        words = f"{number_words(hour)} {number_words(minute) if minute >= 10 else 'oh ' + ONES[minute]}"
+    if second:
+        words += f" and {number_words(int(second))} {'second' if int(second) == 1 else 'seconds'}"
+    return words + (f" {match['meridiem']}" if match["meridiem"] else "")
+
+
+def _phone_number(match):
+    """Digits read one by one, in their groups ("five five five, one two three four")."""
+    return ", ".join(" ".join(ONES[int(digit)] for digit in group) for group in re.findall(r"\d+", match[0]))
+
+
+def _regnal(match):
+    value = roman_value(match["numeral"])
+    if not value or value > MAX_REGNAL_NUMBER:
+        return match[0]
+    if match["name"] in NON_REGNAL_WORDS:
+        return f"{match['name']} {number_words(value).capitalize()}"
+    return f"{match['name']} the {ordinal_words(value).capitalize()}"
+
+
+_MONTH = "|".join(MONTHS)
+# Words after which a four-digit number is a year ("in 1815", "the summer of 1815", "his 1905 paper")
+_YEAR_CONTEXT = (r"(?:[Ii]n|[Oo]f|[Ss]ince|[Uu]ntil|[Tt]ill|[Bb]y|[Ff]rom|[Tt]o|[Dd]uring|[Aa]round|[Cc]irca|c\.|[Bb]efore|[Aa]fter"
+                 r"|[Bb]etween|[Tt]hrough|[Yy]ear|[Ee]arly|[Ll]ate|[Mm]id|[Mm]y|[Yy]our|[Hh]is|[Hh]er|[Ii]ts|[Oo]ur|[Tt]heir)")
+# A four-digit year: 1000 to 2099, not part of a longer number
+_YEAR = r"(?P<year>1\d{3}|20\d{2})\b(?![,.]?\d)"
+# Rules applied to the text between lexicon matches, in order; each is (pattern, replacement)
+NORMALIZATION_RULES = [
+    # Times (other colons are ratios), dotted versions and phone numbers are spelled out first, so no later rule reads their parts
+    (re.compile(r"(?<![\d:.])\b(?P<hour>[01]?\d|2[0-3]):(?P<minute>[0-5]\d)(?::(?P<second>[0-5]\d))?\b(?![:.]\d)"
+                r"(?:\s*(?P<meridiem>[AaPp]\.?[Mm]\.?(?![a-z])))?"), _time),
+    (re.compile(r"(?<![\d:.])\b(?P<left>\d+):(?P<right>\d+)\b(?![:.]\d)"),
+     lambda m: f"{number_words(int(m['left']))} to {number_words(int(m['right']))}"),
+    (re.compile(r"(?<![\w.])(?P<version>\d+(?:\.\d+){2,})(?![\w]|\.\d)"),
+     lambda m: " point ".join(number_words(int(part)) for part in m["version"].split("."))),
+    (re.compile(r"(?<![\w\-+(])(?:\+?1[-. ])?(?:\(\d{3}\)\s?|\d{3}[-.])?\d{3}[-.]\d{4}(?![\w\-]|\.\d)"), _phone_number),
+    (re.compile(rf"\b(?:(?P<month_first>{_MONTH})\s+(?P<day_after>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<year_after>\d{{3,4}})\b)?"
+                rf"|(?:(?P<article>[Tt]he)\s+)?(?P<day_first>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_after>{_MONTH})(?:,?\s+(?P<year_first>\d{{3,4}})\b)?)\b"), _date),
+    (re.compile(r"(?P<symbol>[$£€])\s?(?P<amount>\d[\d,]*(?:\.\d+)?)(?:\s+(?P<scale>thousand|million|billion|trillion)\b)?"), _currency),
+    (re.compile(r"(?<![\d,.])\b(?P<year>\d{1,4})\s*(?P<era>BCE|BC|CE|AD)\b"), lambda m: f"{year_words(int(m['year']))} {m['era']}"),
+    (re.compile(r"\bAD\s+(?P<year>\d{1,4})\b"), lambda m: f"AD {year_words(int(m['year']))}"),
+    (re.compile(r"(?<![\d,.])\b(?P<start>1\d{3}|20\d{2})\s*[-–]\s*(?P<end>1\d{3}|20\d{2}|\d{2})\b(?![,.]?\d)"),
+     lambda m: f"{year_words(int(m['start']))} to {year_words(int(m['end']) if len(m['end']) == 4 else int(m['start'][:2] + m['end']))}"),
+    (re.compile(r"(?<![\d,.])\b(?P<decade>1\d{2}0|20\d0)s\b"), lambda m: decade_words(int(m["decade"]))),
+    (re.compile(r"\b(?P<number>\d+)(?:st|nd|rd|th)\b"), lambda m: ordinal_words(int(m["number"]))),
+    (re.compile(r"(?<![\d,.])\b(?P<number>\d[\d,]*(?:\.\d+)?)\s?%"), lambda m: f"{_decimal_words(m['number'])} percent"),
+    # Abbreviated years and decades: "'38", "the '60s"
+    (re.compile(r"(?<![\w'’])['’](?P<year>\d{2})(?P<plural>s)?\b"),
+     lambda m: decade_words(int(m["year"])) if m["plural"] else number_words(int(m["year"]))),
+    # Other four-digit numbers are only years where the text says so: after a word like "in" or "his",
+    # a month ("December 1843"), a comma ("Venice, 1299") or "'s" ("It's 1517"). "1500 soldiers" is a quantity.
+    (re.compile(rf"\b(?P<context>{_YEAR_CONTEXT}\s+(?:the\s+)?(?:(?:early|late|mid|spring|summer|autumn|fall|winter|year)\s+(?:of\s+)?)?)" + _YEAR),
+     lambda m: m["context"] + year_words(int(m["year"]))),
+    (re.compile(rf"(?P<context>(?:\b(?:{_MONTH})|(?<!\d),|\w['’]s)\s+)" + _YEAR), lambda m: m["context"] + year_words(int(m["year"]))),
+    (re.compile(r"(?<![\d.])\b(?P<number>\d{1,3}(?:,\d{3})+|\d+)(?:\.(?P<fraction>\d+))?\b(?!,\d)"),
+     lambda m: _decimal_words(m[0])),
+]
+# Regnal numbers: "Louis XIV" (single letters are left alone: "I" is a pronoun, "Malcolm X" a name).
+# Applied to the whole line before the lexicon, which may have an entry for the name.
+REGNAL_RULE = (re.compile(r"\b(?P<name>[A-Z][a-z]+)\s+(?P<numeral>[IVXL]{2,})\b"), _regnal)
+
+_BREAK = re.compile(r"\[pause(?:\s+(?P<seconds>\d+(?:\.\d+)?)\s*s)?\]", re.IGNORECASE)
+_EMPHASIS = re.compile(r"\*(?P<text>[^*\n]+)\*")
+_TAG = re.compile(r"(<[^>]+>)")
+
+
+def _is_word_character(character):
+    return character.isalnum() or character == "_"
+
+
+class LexiconMatcher:
+    """
+    Aho-Corasick automaton over the terms of a pronunciation lexicon.
+
+    Built once per lexicon, it finds every term in a line in a single pass
+    over the line, however many terms the lexicon has.
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, term in enumerate(self.terms):
+            state = 0
+            for character in term:
+                if character not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][character] = len(self.goto) - 1
+                state = self.goto[state][character]
+            self.output[state].append(index)
+
+        # Failure links, breadth first: the longest proper suffix that is also a trie path
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for character, target in self.goto[state].items():
+                pending.append(target)
+                fallback = self.fail[state]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(character, 0)
+                self.output[target] = self.output[target] + self.output[self.fail[target]]
+
+    def find(self, text):
+        """
+        Whole-word occurrences of the terms, leftmost and longest first, without overlaps.
+
+        Args:
+            text (str): Text to search, lowercased like the terms
+
+        Returns:
+            list: (start, end, term index) of every match, in order
+        """
+        matches = []
+        state = 0
+        for position, character in enumerate(text):
+            while state and character not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(character, 0)
+            for index in self.output[state]:
+                start = position + 1 - len(self.terms[index])
+                end = position + 1
+                if (start == 0 or not _is_word_character(text[start - 1])) and (end == len(text) or not _is_word_character(text[end])):
+                    matches.append((start, end, index))
+
+        selected = []
+        last_end = 0
+        for start, end, index in sorted(matches, key=lambda match: (match[0], match[0] - match[1])):
+            if start >= last_end:
+                selected.append((start, end, index))
+                last_end = end
+        return selected
+
+
+class Lexicon:
+    """Pronunciation entries, compiled into a LexiconMatcher."""
+
+    def __init__(self, entries):
+        self.entries = {}
+        for term, entry in entries.items():
+            if isinstance(entry, str):
+                entry = {"alias": entry}
+            self.entries[term.lower()] = dict(entry, term=term)
+        self.matcher = LexiconMatcher(self.entries)
+        self.keys = list(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def replacement(self, entry, written, phonemes):
+        """What is sent for a matched term, or None to leave it as written."""
+        if entry.get("case_sensitive") and written != entry["term"]:
+            return None
+        if phonemes and entry.get("ipa"):
+            return f'<phoneme alphabet="ipa" ph="{entry["ipa"]}">{written}</phoneme>'
+        if phonemes and entry.get("cmu"):
+            return f'<phoneme alphabet="cmu-arpabet" ph="{entry["cmu"]}">{written}</phoneme>'
+        return entry.get("alias")
+
+    def apply(self, text, transform, phonemes=False):
+        """
+        Replace the lexicon's terms in a line, and `transform` the text between them.
+
+        Returns:
+            tuple: (new text, number of terms replaced)
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):  # A few characters lowercase to two
+            lowered = "".join(character.lower() if len(character.lower()) == 1 else character for character in text)
+        parts = []
+        replaced = 0
+        position = 0
+        for start, end, index in self.matcher.find(lowered):
+            replacement = self.replacement(self.entries[self.keys[index]], text[start:end], phonemes)
+            if replacement is None:
+                continue
+            parts.append(transform(text[position:start]))
+            parts.append(replacement)
+            replaced += 1
+            position = end
+        parts.append(transform(text[position:]))
+        return "".join(parts), replaced
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def read_lexicon(path):
+    """The entries of a lexicon file, or {} if there is none."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, dict):
+        raise ValueError(f"{path}: expected a JSON object mapping words to pronunciations")
+    return entries
+
+
+def load_lexicon(episode_dir=None):
+    """
+    The global lexicon extended by the episode's, compiled once per version of the files.
+
+    Args:
+        episode_dir (str, optional): Episode folder holding EPISODE_LEXICON_FILE
+
+    Returns:
+        Lexicon: The compiled lexicon (episode entries take precedence)
+    """
+    paths = [path for path in (GLOBAL_LEXICON_PATH, episode_dir and os.path.join(episode_dir, EPISODE_LEXICON_FILE))
+             if path and os.path.exists(path)]
+    key = tuple((path, file_digest(path)) for path in paths)
+    with _lexicons_lock:
+        if key not in _lexicons:
+            entries = {}
+            for path in paths:
+                entries.update(read_lexicon(path))
+            with span("ssml.compile_lexicon", terms=len(entries)):
+                _lexicons[key] = Lexicon(entries)
+        return _lexicons[key]
+
+
+def normalize_text(text):
+    """Spell out times, dates, years, currencies, percentages, ordinals and numbers, outside of tags."""
+    parts = _TAG.split(text)
+    for i in range(0, len(parts), 2):  # Tags (<break time="1.5s" />) are at odd indices
+        for pattern, replacement in NORMALIZATION_RULES:
+            parts[i] = pattern.sub(replacement, parts[i])
+    return "".join(parts)
+
+
+def normalize_regnal(text):
+    """Spell out regnal numerals ("Louis XIV" becomes "Louis the Fourteenth")."""
+    pattern, replacement = REGNAL_RULE
+    return pattern.sub(replacement, text)
+
+
+def _normalize_around_markers(text):
+    """normalize_text, with "[pause]" markers turned into <break> tags rather than read as numbers."""
+    parts = []
+    position = 0
+    for match in _BREAK.finditer(text):
+        parts.append(normalize_text(text[position:match.start()]))
+        parts.append(_break(match))
+        position = match.end()
+    parts.append(normalize_text(text[position:]))
+    return "".join(parts)
+
+
+def _break(match):
+    seconds = min(float(match["seconds"] or DEFAULT_BREAK_SECONDS), MAX_BREAK_SECONDS)
+    return f'<break time="{seconds:g}s" />'
+
+
+def _emphasis(match):
+    text = match["text"]
+    if EMPHASIS_STYLE == "ssml":
+        return f'<emphasis level="moderate">{text}</emphasis>'
+    if EMPHASIS_STYLE == "caps":
+        # Tags (from the lexicon) keep their case
+        return "".join(part if _TAG.fullmatch(part) else part.upper() for part in _TAG.split(text))
+    return text
+
+
+def format_line(text, lexicon, phonemes=False):
+    """
+    Text sent to text-to-speech for a script line.
+
+    Regnal numerals are spelled out first, then lexicon terms are replaced (with
+    a <phoneme> tag when the model reads them and the entry has "ipa" or "cmu",
+    or else with its "alias"); the rest of the line is normalized by
+    normalize_text; then "[pause]" markers become
+    <break> tags and *emphasized* words are marked up as EMPHASIS_STYLE says.
+
+    Args:
+        text (str): The line as written in the script
+        lexicon (Lexicon): Compiled pronunciation lexicon
+        phonemes (bool, optional): Whether the model reads <phoneme> tags
+
+    Returns:
+        tuple: (formatted text, number of lexicon terms replaced)
+    """
+    # Tags already in the script (<break time="1.5s" />) are sent as they are
+    parts = _TAG.split(text)
+    replaced = 0
+    for i in range(0, len(parts), 2):
+        parts[i], terms = lexicon.apply(normalize_regnal(parts[i]), _normalize_around_markers, phonemes)
+        replaced += terms
+    formatted = "".join(parts)
+    formatted = _EMPHASIS.sub(_emphasis, formatted)
+    return re.sub(r"[ \t]{2,}", " ", formatted).strip(), replaced
+
+
+def format_episode(episode, model_id):
+    """
+    Format the text of every speech line of an episode for text-to-speech.
+
+    The formatted text is what segments are cached by, so a lexicon change
+    only invalidates the lines it changes.
+
+    Args:
+        episode (Episode): The episode, with its voices resolved
+        model_id (str): Text-to-speech model the lines are sent to
+
+    Returns:
+        int: Number of lines whose text was changed
+    """
+    lexicon = load_lexicon(episode.output_dir)
+    phonemes = model_id in PHONEME_MODELS
+    changed = 0
+    with span("ssml.format", lines=len(episode.speech_items), terms=len(lexicon)) as s:
+        replaced = 0
+        for item in episode.speech_items:
+            text, terms = format_line(item.text, lexicon, phonemes)
+            item.set_tts_text(text)
+            replaced += terms
+            changed += text != item.text
+        s.set("replaced", replaced)
+        count("ssml.lexicon_replacements", replaced)
+    return changed
+
+
+if __name__ == "__main__":
+    import sys
+    try:
+        from tools.episode_metadata import load_episode
+    except ImportError:  # Running this tool directly as a script
+        from episode_metadata import load_episode
+    if len(sys.argv) > 1:
+        episode = load_episode(sys.argv[1])
+        model_id = sys.argv[2] if len(sys.argv) > 2 else "eleven_multilingual_v2"
+        lexicon = load_lexicon(episode.output_dir)
+        for item in episode.speech_items:
+            text, _ = format_line(item.text, lexicon, model_id in PHONEME_MODELS)
+            if text != item.text:
+                print(f"{item.section}[{item.index}]\n  - {item.text}\n  + {text}")
+    else:
+        print("Usage: python ssml_formatting.py <script_path> [model_id]")
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Counters whose name ends with one of these suffixes are reported as hit ratios
+HIT_SUFFIX = ".hit"
+MISS_SUFFIX = ".miss"
+
+
+class Span:
+    """A timed piece of work, with free-form attributes (bytes, characters, cache status...)."""
+    __slots__ = ("name", "start", "duration", "thread_id", "attrs")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+
+class Tracer:
+    """
+    Collects spans and counters for one run.
+
+    Spans are appended to a JSON lines file as they finish; `finish()` also
+    writes a Chrome trace-event file (open it in chrome://tracing or
+    https://ui.perfetto.dev) and prints a summary table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.spans = []
+            self.counters = {}
+            self.jsonl_path = None
+            self.chrome_path = None
+            self._jsonl_file = None
+
+    def start(self, trace_dir, label="run"):
+        """
+        Start writing trace files for a run.
+
+        Args:
+            trace_dir (str): Folder for the trace files
+            label (str, optional): Name included in the file names
+
+        Returns:
+            str: Path of the JSON lines file
+        """
+        self.reset()
+        os.makedirs(trace_dir, exist_ok=True)
+        stem = os.path.join(trace_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{label.replace(' ', '_')}")
+        with self._lock:
+            self.jsonl_path = f"{stem}.jsonl"
+            self.chrome_path = f"{stem}.trace.json"
+            self._jsonl_file = open(self.jsonl_path, 'w', encoding='utf-8')
+        return self.jsonl_path
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            if self._jsonl_file:
+                self._jsonl_file.write(json.dumps({
+                    "name": span.name,
+                    "start": round(span.start - self.origin, 6),
+                    "duration": round(span.duration, 6),
+                    "thread": span.thread_id,
+                    **span.attrs
+                }, default=str) + "\n")
+                self._jsonl_file.flush()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def write_chrome_trace(self, path):
+        pid = os.getpid()
+        with self._lock:
+            events = [{
+                "name": span.name,
+                "ph": "X",
+                "ts": int((span.start - self.origin) * 1e6),
+                "dur": int(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: str(value) if not isinstance(value, (int, float, bool)) else value for key, value in span.attrs.items()}
+            } for span in self.spans]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self):
+        """
+        Aggregate spans by name and list counters and cache hit ratios.
+
+        Returns:
+            str: The formatted summary table
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+
+        by_name = {}
+        for span in spans:
+            stats = by_name.setdefault(span.name, {"count": 0, "total": 0.0, "max": 0.0, "bytes": 0})
+            stats["count"] += 1
+            stats["total"] += span.duration
+            stats["max"] = max(stats["max"], span.duration)
+            stats["bytes"] += span.attrs.get("bytes", 0) or 0
+
+        lines = [f"{'SPAN':<32}{'COUNT':>7}{'TOTAL s':>10}{'MEAN s':>9}{'MAX s':>9}{'MB':>9}"]
+        for name, stats in sorted(by_name.items(), key=lambda entry: -entry[1]["total"]):
+            lines.append(f"{name:<32}{stats['count']:>7}{stats['total']:>10.2f}{stats['total'] / stats['count']:>9.3f}"
+                         f"{stats['max']:>9.2f}{stats['bytes'] / 1e6:>9.2f}")
+
+        if counters:
+            lines.append("")
+            lines.append(f"{'COUNTER':<48}{'VALUE':>16}")
+            for name, value in sorted(counters.items()):
+                lines.append(f"{name:<48}{value:>16,.0f}" if isinstance(value, (int, float)) else f"{name:<48}{value:>16}")
+
+        ratios = []
+        for name, hits in sorted(counters.items()):
+            if name.endswith(HIT_SUFFIX):
+                base = name[:-len(HIT_SUFFIX)]
+                total = hits + counters.get(base + MISS_SUFFIX, 0)
+                if total:
+                    ratios.append(f"{base + ' hit ratio':<48}{hits / total:>15.1%}")
+        if ratios:
+            lines.append("")
+            lines.extend(ratios)
+        return "\n".join(lines)
+
+    def finish(self):
+        """Close the JSON lines file, write the Chrome trace and print the summary."""
+        with self._lock:
+            if self._jsonl_file:
+                self._jsonl_file.close()
+                self._jsonl_file = None
+        if self.chrome_path:
+            self.write_chrome_trace(self.chrome_path)
+        print("\n" + "=" * 64)
+        print("RUN METRICS".center(64))
+        print("=" * 64)
+        print(self.summary())
+        if self.jsonl_path:
+            print(f"\n📈 Spans saved to {self.jsonl_path}")
+            print(f"📈 Chrome trace saved to {self.chrome_path}")
+
+
+# Process-wide tracer used by every tool
+tracer = Tracer()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block of work.
+
+    Usage:
+        with span("tts.convert", characters=len(text)) as s:
+            audio = ...
+            s.set("bytes", len(audio))
+    """
+    current = Span(name, attrs)
+    try:
+        yield current
+    except Exception as e:
+        current.set("error", type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        tracer.record(current)
+
+
+def count(name, value=1):
+    """Add `value` to a run counter (API calls, retries, characters, tokens, cache hits...)."""
+    tracer.count(name, value)
+
+
+def record_openai_usage(response):
+    """Count the tokens reported by an OpenAI chat completion response."""
+    usage = getattr(response, "usage", None)
+    if usage:
+        count("openai.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        count("openai.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
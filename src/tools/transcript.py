@@ -1,11 +1,21 @@
 import os
-from dotenv import load_dotenv
 from io import BytesIO
-import requests
-from elevenlabs.client import ElevenLabs
-from openai import OpenAI
 import json
 
+try:
+    from tools.episode_metadata import load_episode
+    from tools.clients import get_openai, get_elevenlabs, get_http_session, ELEVEN_LABS_REQUEST_OPTIONS
+    from tools.resilience import call
+    from tools.tracing import span, record_openai_usage
+except ImportError:  # Running this tool directly as a script
+    from episode_metadata import load_episode
+    from clients import get_openai, get_elevenlabs, get_http_session, ELEVEN_LABS_REQUEST_OPTIONS
+    from resilience import call
+    from tracing import span, record_openai_usage
+
+# ElevenLabs speech-to-text model
+STT_MODEL_ID = "scribe_v1"
+
 def seconds_to_timestamp(seconds):
     """Convert seconds to VTT timestamp format (HH:MM:SS.mmm)"""
     millis = int((seconds - int(seconds)) * 1000)
@@ -14,19 +24,18 @@ def seconds_to_timestamp(seconds):
     secs = int(seconds % 60)
     return f"{hours:02}:{minutes:02}:{secs:02}.{millis:03}"
 
-def identify_speakers(script, transcript_text):
+def identify_speakers(episode, transcript_text):
     """
     Use OpenAI to identify which speaker_id corresponds to which character in the script
     
     Args:
-        script (dict): The podcast script with character information
+        episode (Episode): The podcast episode with character information
         transcript_text (str): The raw transcript text with speaker_ids
         
     Returns:
         dict: Mapping of speaker_ids to character names
     """
-    load_dotenv()
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_openai()
     
     system_prompt = """
     You are an expert at analyzing podcast transcripts and identifying speakers.
@@ -50,7 +59,7 @@ def identify_speakers(script, transcript_text):
     """
     
     # Extract character information from script
-    historical_figure = script.get("historical_figure", "Unknown Historical Figure")
+    historical_figure = episode.historical_figure
     
     user_prompt = f"""
     Here is information about the podcast:
@@ -58,7 +67,7 @@ def identify_speakers(script, transcript_text):
     Historical Figure: {historical_figure}
     
     Here is a sample of the script conversation:
-    {json.dumps(script.get('conversation', [])[:10], indent=2)}
+    {json.dumps(episode.section_dicts('conversation')[:10], indent=2)}
     
     Here is a sample of the transcript with generic speaker IDs:
     {transcript_text[:5000]}
@@ -66,13 +75,15 @@ def identify_speakers(script, transcript_text):
     Please identify which speaker_id corresponds to which character (Leo, {historical_figure}, or Narrator).
     """
     
-    response = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL"),
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    )
+    with span("openai.chat", purpose="speaker_identification"):
+        response = call("openai", lambda: client.chat.completions.create(
+            model=os.getenv("OPENAI_MODEL"),
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        ))
+    record_openai_usage(response)
     
     try:
         # Extract and parse the response
@@ -93,39 +104,50 @@ def identify_speakers(script, transcript_text):
         # Return empty mapping if parsing fails
         return {}
 
-def generate_vtt_from_audio(script, audio_path, output_file=None):
-    load_dotenv()
-    client = ElevenLabs(api_key=os.getenv("ELEVEN_LABS_API_KEY"))
+def generate_vtt_from_audio(episode, audio_path, output_file=None):
+    client = get_elevenlabs()
 
     if audio_path.startswith(('http://', 'https://')):
-        response = requests.get(audio_path)
+        with span("http.download", url=audio_path) as s:
+            response = get_http_session().get(audio_path)
+            response.raise_for_status()
+            s.set("bytes", len(response.content))
         audio_data = BytesIO(response.content)
     else:
         with open(audio_path, 'rb') as f:
             audio_data = BytesIO(f.read())
 
-    transcription = client.speech_to_text.convert(
-        file=audio_data,
-        model_id="scribe_v1",
-        tag_audio_events=True,
-        diarize=True,
-    )
+    def transcribe():
+        # A retry sends the whole file again
+        audio_data.seek(0)
+        return client.speech_to_text.convert(
+            file=audio_data,
+            model_id=STT_MODEL_ID,
+            tag_audio_events=True,
+            diarize=True,
+            request_options=ELEVEN_LABS_REQUEST_OPTIONS,
+        )
+
+    with span("elevenlabs.speech_to_text", bytes=audio_data.getbuffer().nbytes):
+        transcription = call("elevenlabs", transcribe)
 
     if output_file is None:
-        output_file = f"output/{script['historical_figure'].replace(' ', '_')}/transcript.vtt"
+        output_file = f"{episode.output_dir}/transcript.vtt"
 
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
     # Create a raw transcript text for speaker identification
     raw_transcript = ""
+    previous_speaker = None
     for word in transcription.words:
-        if not raw_transcript or word.speaker_id != transcription.words[transcription.words.index(word)-1].speaker_id:
+        if not raw_transcript or word.speaker_id != previous_speaker:
             raw_transcript += f"\n<v {word.speaker_id}> "
         raw_transcript += word.text + " "
+        previous_speaker = word.speaker_id
     
     # Identify speakers if script is provided
     speaker_mapping = {}
-    speaker_mapping = identify_speakers(script, raw_transcript)
+    speaker_mapping = identify_speakers(episode, raw_transcript)
     print(f"Identified speakers: {speaker_mapping}")
     
     vtt_content = ["WEBVTT\n"]
@@ -185,10 +207,7 @@ if __name__ == "__main__":
         audio_path = sys.argv[2]
         output_file = sys.argv[3] if len(sys.argv) > 3 else None
         
-        with open(script_path, 'r', encoding='utf-8') as f:
-            script_data = json.load(f)
-                
-        output_file = generate_vtt_from_audio(script_data, audio_path, output_file)
+        output_file = generate_vtt_from_audio(load_episode(script_path), audio_path, output_file)
         print(f"Generated transcript saved to: {output_file}")
     else:
         print("Usage: python transcript.py <script_path> <audio_path> [output_file]")
\ No newline at end of file
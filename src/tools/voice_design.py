@@ -1,15 +1,77 @@
-from dotenv import load_dotenv
 import base64
 import os
+import time
 import logging
-from elevenlabs import Voice, VoiceSettings, play
-from elevenlabs.client import ElevenLabs
-import openai
 import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pydub import AudioSegment
 
-def generate_voice_description(character_name, max_characters=1000):
-    """Generate a voice description for a historical character using OpenAI."""
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+try:
+    from tools.clients import get_openai, get_elevenlabs, ELEVEN_LABS_REQUEST_OPTIONS
+    from tools.resilience import call
+    from tools.workers import get_pool
+    from tools.tracing import span, count, record_openai_usage
+    from tools.loudness import to_float, integrated_loudness, TARGET_LUFS
+    from tools.voice_library import library_voice_id, save_to_library
+except ImportError:  # Running this tool directly as a script
+    from clients import get_openai, get_elevenlabs, ELEVEN_LABS_REQUEST_OPTIONS
+    from resilience import call
+    from workers import get_pool
+    from tracing import span, count, record_openai_usage
+    from loudness import to_float, integrated_loudness, TARGET_LUFS
+    from voice_library import library_voice_id, save_to_library
+
+# Descriptions, previews and the voices made from them, in the character's folder
+VOICE_DESIGN_DIR = "voice_design"
+# Generated previews can only be turned into a voice for a while; older ones are kept to listen to
+PREVIEW_MAX_AGE_HOURS = float(os.getenv("VOICE_PREVIEW_MAX_AGE_HOURS", "24"))
+
+# Descriptions written per round, each nudged differently, whose previews are all requested at once
+DESCRIPTION_VARIANTS = int(os.getenv("VOICE_DESCRIPTION_VARIANTS", "3"))
+DESCRIPTION_VARIANT_HINTS = [
+    "",
+    "Lean towards a warmer, more intimate and conversational delivery.",
+    "Lean towards a more formal, resonant and commanding delivery.",
+    "Lean towards a livelier, more animated and expressive delivery.",
+]
+
+# Preview checks used to rank them: loudness, speaking rate of the sample text, clipping, and dead air at the ends
+PREVIEW_MAX_LOUDNESS_OFFSET = 6.0     # LU from the episode loudness target
+PREVIEW_WORDS_PER_MINUTE = (110, 200)
+PREVIEW_CLIP_DBFS = -0.1
+PREVIEW_MAX_EDGE_SILENCE = 1.0        # seconds
+
+_files_lock = threading.Lock()
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+def design_dir(character_name):
+    return os.path.join("output", character_name.replace(" ", "_"), VOICE_DESIGN_DIR)
+
+def description_hash(description):
+    return hashlib.md5(description.encode()).hexdigest()[:12]
+
+def sample_text(character_name):
+    """Historically appropriate text read by the voice previews."""
+    return f"I am {character_name}. My words and actions have shaped history, and through this voice, you can hear an approximation of how I might have sounded during my time."
+
+def generate_voice_description(character_name, max_characters=1000, hint=""):
+    """Generate a voice description for a historical character using OpenAI (`hint` steers variants)."""
+    client = get_openai()
     
     prompt = f"""
     Create a detailed voice description for the historical figure {character_name}. Make it short but comprehensive and complete. It needs to be under {int(max_characters * 0.7)} characters.
@@ -24,91 +86,289 @@ def generate_voice_description(character_name, max_characters=1000):
     8. Ensure the voice carries appropriate emotion - whether passionate conviction, quiet determination, scholarly enthusiasm, or other emotions that would be characteristic of this historical figure's personality and circumstances
     
     Important: Do not mention the historical figure's name in the description itself. Refer to them using pronouns or as "the speaker" instead.
+    {hint}
     """
     
-    response = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL"),
-        messages=[
-            {"role": "system", "content": "You are a historical voice expert who specializes in creating authentic voice profiles for historical figures based on primary sources, biographical accounts, and period-appropriate linguistic patterns."},
-            {"role": "user", "content": prompt}
-        ],
-        max_completion_tokens=int(max_characters/6)
-    )
+    with span("openai.chat", purpose="voice_description"):
+        response = call("openai", lambda: client.chat.completions.create(
+            model=os.getenv("OPENAI_MODEL"),
+            messages=[
+                {"role": "system", "content": "You are a historical voice expert who specializes in creating authentic voice profiles for historical figures based on primary sources, biographical accounts, and period-appropriate linguistic patterns."},
+                {"role": "user", "content": prompt}
+            ],
+            max_completion_tokens=int(max_characters/6)
+        ))
+    record_openai_usage(response)
     
     voice_description = response.choices[0].message.content.strip()
     logging.info(f"Generated historical voice description ({len(voice_description)} characters): {voice_description}")
     return voice_description
 
-def generate_voice(character_name):
+def cached_voice_description(character_name, max_characters=1000, variant=0):
+    """
+    generate_voice_description, saved in the character's folder and reused afterwards.
+
+    Args:
+        variant (int, optional): Which of the DESCRIPTION_VARIANT_HINTS steers the description
+
+    Returns:
+        str: The voice description
+    """
+    path = os.path.join(design_dir(character_name), "descriptions.json")
+    key = str(max_characters) if variant == 0 else f"{max_characters}_{variant}"
+    with _files_lock:
+        descriptions = _read_json(path, {})
+    if key in descriptions:
+        count("cache.voice_description.hit")
+        return descriptions[key]["text"]
+    count("cache.voice_description.miss")
+    description = generate_voice_description(character_name, max_characters=max_characters,
+                                             hint=DESCRIPTION_VARIANT_HINTS[variant % len(DESCRIPTION_VARIANT_HINTS)])
+    with _files_lock:
+        descriptions = _read_json(path, {})
+        descriptions[key] = {"text": description, "hash": description_hash(description), "created_at": time.time()}
+        _write_json(path, descriptions)
+    return description
+
+def _previews_path(character_name):
+    return os.path.join(design_dir(character_name), "previews.json")
+
+def saved_previews(character_name, description=None, usable=False):
+    """
+    Previews saved for a character, oldest first.
+
+    Args:
+        description (str, optional): Only those of this description
+        usable (bool, optional): Only those recent enough to be made into a voice
+
+    Returns:
+        list: Preview entries (generated_voice_id, path, description_hash, created_at, and voice_id once made into a voice)
+    """
+    previews = _read_json(_previews_path(character_name), [])
+    if description is not None:
+        previews = [preview for preview in previews if preview["description_hash"] == description_hash(description)]
+    if usable:
+        previews = [preview for preview in previews
+                    if preview.get("voice_id") or time.time() - preview["created_at"] < PREVIEW_MAX_AGE_HOURS * 3600]
+    return [preview for preview in previews if os.path.exists(preview["path"])]
+
+def create_previews(client, character_name, description):
+    """
+    Request voice previews for a description, and save their audio in the character's folder.
+
+    Returns:
+        list: The new preview entries
+    """
+    with span("elevenlabs.create_previews"):
+        previews_response = call("elevenlabs", lambda: client.text_to_voice.create_previews(
+            voice_description=description,
+            text=sample_text(character_name),
+            quality=0.80,
+            guidance_scale=80.0,
+            request_options=ELEVEN_LABS_REQUEST_OPTIONS
+        ))
+
+    folder = os.path.join(design_dir(character_name), "previews", description_hash(description))
+    os.makedirs(folder, exist_ok=True)
+    created_at = time.time()
+    entries = []
+    for preview in previews_response.previews:
+        path = os.path.join(folder, f"{int(created_at)}_{preview.generated_voice_id}.mp3")
+        with open(path, 'wb') as f:
+            f.write(base64.b64decode(preview.audio_base_64))
+        entries.append({"generated_voice_id": preview.generated_voice_id, "path": path,
+                        "description_hash": description_hash(description), "created_at": created_at})
+    with _files_lock:
+        _write_json(_previews_path(character_name), _read_json(_previews_path(character_name), []) + entries)
+    return entries
+
+def design_round(client, character_name, descriptions, reuse_saved=True):
+    """
+    Previews of every description, requested concurrently.
+
+    Args:
+        descriptions (list): The voice descriptions
+        reuse_saved (bool, optional): Use saved previews still recent enough, instead of requesting new ones
+
+    Returns:
+        list: Preview entries of all the descriptions
+    """
+    def previews_of(description):
+        saved = saved_previews(character_name, description, usable=True) if reuse_saved else []
+        return saved or create_previews(client, character_name, description)
+
+    with span("voice_design.round", descriptions=len(descriptions)):
+        with ThreadPoolExecutor(max_workers=len(descriptions), thread_name_prefix="voice-design") as executor:
+            return [preview for previews in executor.map(previews_of, descriptions) for preview in previews]
+
+def check_preview(character_name, preview):
+    """
+    Decode a preview and measure it.
+
+    Returns:
+        dict: The preview entry with duration_seconds, lufs, peak_dbfs, edge_silence_seconds and problems
+    """
+    segment = AudioSegment.from_file(preview["path"])
+    samples = to_float(segment)
+    duration = len(samples) / segment.frame_rate
+    lufs = integrated_loudness(samples, segment.frame_rate)
+    level = np.abs(samples).max(axis=1) if len(samples) else np.zeros(0)
+    audible = np.flatnonzero(level > 10 ** (-50 / 20))
+    edge_silence = (max(audible[0], len(level) - 1 - audible[-1]) / segment.frame_rate) if len(audible) else duration
+    peak_dbfs = float(20 * np.log10(max(level.max() if len(level) else 0.0, 1e-10)))
+    words_per_minute = len(sample_text(character_name).split()) / max(duration - edge_silence, 0.1) * 60
+
+    problems = []
+    if not np.isfinite(lufs) or abs(lufs - TARGET_LUFS) > PREVIEW_MAX_LOUDNESS_OFFSET:
+        problems.append(f"loudness {lufs:.1f} LUFS")
+    if not PREVIEW_WORDS_PER_MINUTE[0] <= words_per_minute <= PREVIEW_WORDS_PER_MINUTE[1]:
+        problems.append(f"{words_per_minute:.0f} words per minute")
+    if peak_dbfs >= PREVIEW_CLIP_DBFS:
+        problems.append("clipped")
+    if edge_silence > PREVIEW_MAX_EDGE_SILENCE:
+        problems.append(f"{edge_silence:.1f}s of silence")
+    return dict(preview, duration_seconds=round(duration, 2), lufs=round(lufs, 1) if np.isfinite(lufs) else None,
+                peak_dbfs=round(peak_dbfs, 1), edge_silence_seconds=round(edge_silence, 2), problems=problems)
+
+def rank_previews(character_name, previews):
+    """
+    Decode and check every preview in parallel, then rank them.
+
+    Previews with fewer problems come first, then those closest to the
+    episode loudness target (they need the least levelling).
+
+    Returns:
+        list: Checked preview entries, best first
+    """
+    with span("voice_design.rank", previews=len(previews)):
+        checked = list(get_pool("encode").map(lambda preview: check_preview(character_name, preview), previews))
+    return sorted(checked, key=lambda preview: (len(preview["problems"]),
+                                                abs(preview["lufs"] - TARGET_LUFS) if preview["lufs"] is not None else float("inf")))
+
+def create_voice(client, character_name, preview):
+    """
+    Make a preview into a voice, once: a preview made into a voice before gets the same voice back.
+
+    Returns:
+        str: The voice ID
+    """
+    if preview.get("voice_id"):
+        count("cache.voice.hit")
+        return preview["voice_id"]
+    count("cache.voice.miss")
+    short_voice_description = cached_voice_description(character_name, max_characters=500)
+    # Creating a voice twice would leave a duplicate in the library: only retried after a 429
+    with span("elevenlabs.create_voice"):
+        voice_response = call("elevenlabs", lambda: client.text_to_voice.create_voice_from_preview(
+            voice_name=f"{character_name} - Historical Voice",
+            voice_description=short_voice_description,
+            generated_voice_id=preview["generated_voice_id"],
+            request_options=ELEVEN_LABS_REQUEST_OPTIONS,
+        ), idempotent=False)
+    with _files_lock:
+        previews = _read_json(_previews_path(character_name), [])
+        for saved in previews:
+            if saved["generated_voice_id"] == preview["generated_voice_id"]:
+                saved["voice_id"] = voice_response.voice_id
+        _write_json(_previews_path(character_name), previews)
+    return voice_response.voice_id
+
+def save_voice_id(character_name, voice_id, **details):
+    """Write the episode's voice_id.json and add the voice to the voice library."""
+    voice_file_path = os.path.join(os.path.join("output", character_name.replace(" ", "_")), "voice_id.json")
+    os.makedirs(os.path.dirname(voice_file_path), exist_ok=True)
+    with open(voice_file_path, 'w') as f:
+        json.dump(dict(details, voice_id=voice_id), f, indent=4)
+    save_to_library(character_name, voice_id, **details)
+    logging.info(f"Voice ID saved to {voice_file_path}")
+    return voice_file_path
+
+def generate_voice(character_name, interactive=True, reuse=True, variants=DESCRIPTION_VARIANTS):
+    """
+    Design a voice for a historical character and save it to ElevenLabs.
+    
+    A character already in the voice library gets its saved voice back
+    without any request. Otherwise several voice descriptions, each steered
+    differently, are written concurrently, and the previews of all of them
+    are requested concurrently, then decoded and checked in parallel. They
+    are presented as one set, best ranked first, so a voice is usually found
+    in a single round. Descriptions and previews are saved (in the
+    character's voice_design folder): running this again plays the previews
+    still recent enough to be used, and restarting asks for new previews of
+    the same descriptions.
+    
+    Args:
+        character_name (str): Name of the historical figure
+        interactive (bool, optional): Play the previews and let the user choose. When False,
+            the best ranked preview is selected without playing anything. Defaults to True.
+        reuse (bool, optional): Use the voice library and the saved previews. When False, new
+            previews are requested (of the saved descriptions) and a new voice is made. Defaults to True.
+        variants (int, optional): Descriptions per round. Defaults to DESCRIPTION_VARIANTS.
+    
+    Returns:
+        tuple: (voice_id, voice_file_path)
+    """
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    voice_id = library_voice_id(character_name) if reuse else None
+    if voice_id:
+        logging.info(f"Using the saved voice of {character_name} from the voice library: {voice_id}")
+        count("cache.voice_library.hit")
+        return voice_id, save_voice_id(character_name, voice_id, source="library")
+    count("cache.voice_library.miss")
     logging.info(f"Starting voice preview generation for historical figure: {character_name}")
     
-    load_dotenv()
-
-    # Generate voice description using OpenAI
-    voice_description = generate_voice_description(character_name, max_characters=1000)
+    # Generate the voice descriptions using OpenAI, concurrently, or reuse the saved ones
+    variants = max(1, variants)
+    with ThreadPoolExecutor(max_workers=variants, thread_name_prefix="voice-description") as executor:
+        descriptions = list(executor.map(lambda variant: cached_voice_description(character_name, max_characters=1000, variant=variant),
+                                         range(variants)))
+    variant_of = {description_hash(description): variant + 1 for variant, description in enumerate(descriptions)}
+    client = get_elevenlabs()
+    # New previews have new generated voice IDs, so a new voice is made from the one selected
+    reuse_saved = reuse
     
     while True:
-        client = ElevenLabs(api_key=os.getenv("ELEVEN_LABS_API_KEY"))
-
-        # Create voice previews with a historically appropriate sample text
-        sample_text = f"I am {character_name}. My words and actions have shaped history, and through this voice, you can hear an approximation of how I might have sounded during my time."
-        
-        previews_response = client.text_to_voice.create_previews(
-            voice_description=voice_description,
-            text=sample_text,
-            quality=0.80,
-            guidance_scale=80.0
-        )
-
-        if not previews_response.previews:
+        previews = design_round(client, character_name, descriptions, reuse_saved)
+        if not previews:
             logging.error("No voice previews generated.")
             return
-
-        logging.info("Voice previews generated successfully")
+        previews = rank_previews(character_name, previews)
+        logging.info(f"{len(previews)} voice previews of {len(descriptions)} descriptions ready, best first")
         
-        # Play each audio preview
-        for i, preview in enumerate(previews_response.previews):
-            generated_voice_id = preview.generated_voice_id
-            logging.info(f"Preview {i+1} - Generated voice ID: {generated_voice_id}")
-
-            # Decode and play the audio preview
-            audio_bytes = base64.b64decode(preview.audio_base_64)
-            logging.info(f"Playing audio preview {i+1}")
-            play(audio_bytes)
+        # Play each audio preview, best ranked first
+        for i, preview in enumerate(previews):
+            checks = ", ".join(preview["problems"]) or "no problems"
+            logging.info(f"Preview {i+1} - description {variant_of[preview['description_hash']]}, {preview['duration_seconds']}s, "
+                         f"{preview['lufs']} LUFS, {checks} - Generated voice ID: {preview['generated_voice_id']} ({preview['path']})")
+
+            if interactive:
+                from elevenlabs import play
+                with open(preview["path"], 'rb') as f:
+                    audio_bytes = f.read()
+                logging.info(f"Playing audio preview {i+1}")
+                play(audio_bytes)
         
         # Ask user to select a voice or restart
         while True:
-            user_choice = input("Enter 1, 2, or 3 to select a voice, or 'r' to restart voice generation: ")
+            user_choice = input(f"Enter 1 to {len(previews)} to select a voice, or 'r' to restart voice generation: ") if interactive else "1"
             
             if user_choice.lower() == 'r':
-                logging.info("Restarting voice generation...")
+                logging.info("Restarting voice generation with the same descriptions...")
+                reuse_saved = False
                 break
             
             try:
                 choice_index = int(user_choice) - 1
-                if 0 <= choice_index < len(previews_response.previews):
-                    selected_preview = previews_response.previews[choice_index]
-                    
-                    # Create a voice from the selected preview
-                    voice_response = client.text_to_voice.create_voice_from_preview(
-                        voice_name=f"{character_name} - Historical Voice",
-                        voice_description=generate_voice_description(character_name, max_characters=500),
-                        generated_voice_id=selected_preview.generated_voice_id,
-                    )
-
-                    logging.info(f"Historical voice creation completed. New Voice ID: {voice_response.voice_id}")
-                    
-                    # Save the voice ID to a file
-                    voice_file_path = os.path.join(os.path.join("output", character_name.replace(" ", "_")), "voice_id.json")
-                    os.makedirs(os.path.dirname(voice_file_path), exist_ok=True)
-                    with open(voice_file_path, 'w') as f:
-                        json.dump({"voice_id": voice_response.voice_id}, f, indent=4)
-                    
-                    logging.info(f"Voice ID saved to {voice_file_path}")
-                    return voice_response.voice_id, voice_file_path
+                if 0 <= choice_index < len(previews):
+                    selected_preview = previews[choice_index]
+                    voice_id = create_voice(client, character_name, selected_preview)
+                    logging.info(f"Historical voice creation completed. New Voice ID: {voice_id}")
+                    voice_file_path = save_voice_id(character_name, voice_id, description_hash=selected_preview["description_hash"],
+                                                    generated_voice_id=selected_preview["generated_voice_id"])
+                    return voice_id, voice_file_path
                 else:
-                    print(f"Please enter a number between 1 and {len(previews_response.previews)}")
+                    print(f"Please enter a number between 1 and {len(previews)}")
             except ValueError:
                 print("Invalid input. Please enter a number or 'r'")
 
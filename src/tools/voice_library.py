@@ -0,0 +1,39 @@
+import os
+import json
+import time
+import threading
+
+# Designed voices of every character, so a returning character gets its voice without any request
+VOICE_LIBRARY_PATH = "output/voice_library.json"
+
+_lock = threading.Lock()
+
+
+def _character_key(character_name):
+    return " ".join(character_name.lower().split())
+
+
+def read_library():
+    """{character key: entry} of every voice in the library."""
+    if not os.path.exists(VOICE_LIBRARY_PATH):
+        return {}
+    with open(VOICE_LIBRARY_PATH, 'r') as f:
+        return json.load(f)
+
+
+def library_voice_id(character_name):
+    """Voice ID of a character in the voice library, or None."""
+    entry = read_library().get(_character_key(character_name))
+    return entry["voice_id"] if entry else None
+
+
+def save_to_library(character_name, voice_id, **details):
+    """Add (or replace) a character's voice in the voice library."""
+    with _lock:
+        library = read_library()
+        library[_character_key(character_name)] = dict(details, character=character_name, voice_id=voice_id, saved_at=time.time())
+        os.makedirs(os.path.dirname(VOICE_LIBRARY_PATH), exist_ok=True)
+        tmp_path = f"{VOICE_LIBRARY_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(library, f, indent=4)
+        os.replace(tmp_path, VOICE_LIBRARY_PATH)
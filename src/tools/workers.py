@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from tools.tracing import count
+except ImportError:  # Running a tool directly as a script
+    from tracing import count
+
+# Global limits per external service: (initial concurrent requests, minimum seconds between request starts)
+RATE_LIMITS = {
+    "openai": (4, 0.0),
+    "elevenlabs": (4, 0.0),
+    "transistor": (2, 0.2),
+}
+
+# Most concurrent requests a service's limit can grow to while no rate limit is hit
+CONCURRENCY_CEILINGS = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+    "elevenlabs": int(os.getenv("ELEVEN_LABS_MAX_CONCURRENCY", "10")),
+    "transistor": int(os.getenv("TRANSISTOR_FM_MAX_CONCURRENCY", "4")),
+}
+
+# Size of the shared worker pools (per process, shared by every episode)
+POOL_SIZES = {
+    # Text-to-speech and sound effect requests, mostly waiting on the network. Enough threads
+    # for the ElevenLabs limit to reach its ceiling; the limiter decides how many actually run.
+    "synthesis": int(os.getenv("SYNTHESIS_WORKERS", str(CONCURRENCY_CEILINGS["elevenlabs"]))),
+    # ffmpeg decodes and encodes, bound by CPU
+    "encode": int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 2))),
+}
+
+_pools = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_pool(name):
+    """
+    Shared thread pool for a kind of work ("synthesis" or "encode").
+
+    Every episode produced by this process submits to the same pools, so
+    running several episodes at once does not multiply the number of
+    concurrent TTS requests or ffmpeg processes.
+    """
+    with _registry_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=name)
+        return _pools[name]
+
+
+class RateLimiter:
+    """
+    Caps concurrent requests to a service and spaces out their start times.
+
+    Used as a context manager around each API call:
+
+        with rate_limit("elevenlabs"):
+            client.text_to_speech.convert(...)
+
+    The concurrency limit adapts (AIMD): it grows by one after a full window
+    of successful requests, up to `ceiling`, and halves whenever the service
+    answers with a rate limit.
+    """
+
+    def __init__(self, name, max_concurrent, min_interval=0.0, ceiling=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.ceiling = max(ceiling or max_concurrent, max_concurrent)
+        self.in_flight = 0
+        self.total_requests = 0
+        self._next_start = 0.0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.max_concurrent:
+                self._condition.wait()
+            self.in_flight += 1
+            self.total_requests += 1
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+        count(f"api_calls.{self.name}")
+        if start > now:
+            count(f"rate_limit.{self.name}.wait_ms", int((start - now) * 1000))
+            time.sleep(start - now)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def set_max_concurrent(self, max_concurrent):
+        """Change the concurrency limit, waking up waiting requests if it grew."""
+        with self._condition:
+            self.max_concurrent = max(1, min(max_concurrent, self.ceiling))
+            self._condition.notify_all()
+
+    def record_success(self):
+        """Additive increase: one more concurrent request per window of successes."""
+        with self._condition:
+            self._successes += 1
+            if self._successes < self.max_concurrent or self.max_concurrent >= self.ceiling:
+                return
+            self._successes = 0
+        self.set_max_concurrent(self.max_concurrent + 1)
+
+    def record_throttle(self):
+        """Multiplicative decrease after the service answered with a rate limit."""
+        with self._condition:
+            self._successes = 0
+        count(f"rate_limit.{self.name}.throttled")
+        self.set_max_concurrent(self.max_concurrent // 2)
+
+    def pause(self, seconds):
+        """Hold back every request to the service for `seconds` (e.g. from a Retry-After header)."""
+        with self._condition:
+            self._next_start = max(self._next_start, time.monotonic() + seconds)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def rate_limit(service):
+    """Process-wide RateLimiter for an external service."""
+    with _registry_lock:
+        if service not in _limiters:
+            max_concurrent, min_interval = RATE_LIMITS.get(service, (1, 0.0))
+            _limiters[service] = RateLimiter(service, max_concurrent, min_interval, CONCURRENCY_CEILINGS.get(service))
+        return _limiters[service]
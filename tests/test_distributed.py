@@ -0,0 +1,116 @@
+import os
+import time
+
+import pytest
+
+from tools import distributed
+from tools.distributed import DECODE, MAX_TASK_ATTEMPTS, SYNTHESIZE, SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path))
+
+
+def expire(store, task):
+    """Age a claimed task's last heartbeat past the lease."""
+    past = time.time() - distributed.LEASE_SECONDS - 1
+    os.utime(store.task_path("claimed", task["id"]), (past, past))
+
+
+def test_publish_once(store):
+    assert store.publish(SYNTHESIZE, "a1", {})
+    assert not store.publish(SYNTHESIZE, "a1", {})
+    store.claim("w1")
+    assert not store.publish(SYNTHESIZE, "a1", {})
+
+
+def test_a_task_is_claimed_once(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    assert task["id"] == f"{SYNTHESIZE}-a1" and task["worker"] == "w1"
+    assert store.claim("w2") is None
+    assert store.owns(task)
+
+
+def test_decodes_are_claimed_first(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    store.publish(DECODE, "b2", {})
+    assert store.claim("w1")["kind"] == DECODE
+    assert store.claim("w1")["kind"] == SYNTHESIZE
+
+
+def test_heartbeat_keeps_the_lease(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    expire(store, task)
+    assert store.heartbeat(task["id"])
+    assert store.reclaim_expired() == 0
+    assert store.owns(task)
+
+
+def test_expired_lease_is_reclaimed(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    assert store.reclaim_expired() == 0
+    expire(store, task)
+    assert store.reclaim_expired() == 1
+    assert not store.owns(task)
+    assert not store.heartbeat(task["id"])
+
+    again = store.claim("w2")
+    assert again["id"] == task["id"] and again["worker"] == "w2"
+    assert store.owns(again)
+
+
+def test_complete_after_reclaim_leaves_the_new_lease(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    expire(store, task)
+    store.reclaim_expired()
+    again = store.claim("w2")
+
+    assert not store.complete(task)
+    assert store.owns(again)
+    assert store.complete(again)
+    assert not os.path.exists(store.task_path("claimed", task["id"]))
+
+
+def test_same_worker_reclaim_is_a_new_lease(store):
+    # Threads of a worker share its ID: only the lease token tells their claims apart
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    expire(store, task)
+    store.reclaim_expired()
+    again = store.claim("w1")
+    assert not store.complete(task)
+    assert store.owns(again)
+
+
+def test_fail_after_reclaim_is_not_recorded(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    task = store.claim("w1")
+    expire(store, task)
+    store.reclaim_expired()
+    again = store.claim("w2")
+
+    store.fail(task, "RuntimeError: too late")
+    assert store.owns(again)
+    assert store.claim("w3") is None
+    assert store.failed_task(task["id"]) is None
+
+
+def test_fail_retries_then_gives_up(store):
+    store.publish(SYNTHESIZE, "a1", {})
+    for attempt in range(1, MAX_TASK_ATTEMPTS + 1):
+        task = store.claim("w1")
+        assert task["attempts"] == attempt - 1
+        store.fail(task, "RuntimeError: boom")
+    assert store.claim("w1") is None
+    failed = store.failed_task(f"{SYNTHESIZE}-a1")
+    assert failed["attempts"] == MAX_TASK_ATTEMPTS and failed["error"] == "RuntimeError: boom"
+    assert "worker" not in failed and "lease" not in failed
+
+    # Publishing it again starts over
+    assert store.publish(SYNTHESIZE, "a1", {})
+    assert store.failed_task(f"{SYNTHESIZE}-a1") is None
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from tools.script_history import ScriptHistory, apply_delta, compute_delta
+
+
+def line(speaker, text):
+    return {"speaker": speaker, "text": text}
+
+
+BASE = {
+    "title": "The Engine",
+    "intro": [line("Host", "Welcome."), line("Ada", "Thank you.")],
+    "discussion": [line("Host", "One"), line("Ada", "Two"), line("Host", "Three"), line("Ada", "Four")],
+}
+
+
+def edited(**changes):
+    script = json.loads(json.dumps(BASE))
+    script.update(changes)
+    return script
+
+
+INSERTED = edited(discussion=BASE["discussion"][:2] + [line("Host", "Two and a half")] + BASE["discussion"][2:])
+DELETED = edited(discussion=BASE["discussion"][:1] + BASE["discussion"][2:])
+MODIFIED = edited(discussion=BASE["discussion"][:2] + [line("Host", "Three, again")] + BASE["discussion"][3:])
+RETITLED = edited(title="The Analytical Engine", outro=[line("Host", "Goodbye.")])
+WITHOUT_INTRO = {key: value for key, value in BASE.items() if key != "intro"}
+
+
+@pytest.mark.parametrize("new", [INSERTED, DELETED, MODIFIED, RETITLED, WITHOUT_INTRO, BASE],
+                         ids=["insert", "delete", "modify", "fields", "removed section", "unchanged"])
+def test_delta_round_trip(new):
+    delta = compute_delta(BASE, new)
+    assert apply_delta(BASE, delta) == new
+    assert json.loads(json.dumps(delta)) == delta
+
+
+def test_delta_stores_only_changed_lines():
+    delta = compute_delta(BASE, MODIFIED)
+    added = [item for op in delta["sections"]["discussion"] if op[0] == "+" for item in op[1]]
+    assert added == [line("Host", "Three, again")]
+    assert "intro" not in delta.get("sections", {})
+
+
+def test_apply_delta_does_not_change_its_input():
+    before = json.loads(json.dumps(BASE))
+    apply_delta(BASE, compute_delta(BASE, RETITLED))["intro"][0]["text"] = "Changed"
+    assert BASE == before
+
+
+@pytest.mark.parametrize("new, expected", [
+    (INSERTED, {0: 0, 1: 1, 3: 2, 4: 3}),
+    (DELETED, {0: 0, 1: 2, 2: 3}),
+    (MODIFIED, {0: 0, 1: 1, 3: 3}),
+], ids=["insert", "delete", "modify"])
+def test_reusable_lines(tmp_path, new, expected):
+    history = ScriptHistory(str(tmp_path))
+    history.record(BASE)
+    history.mark_rendered(1)
+    reusable = history.reusable_lines(new)
+    assert {j: i for (section, j), i in reusable.items() if section == "discussion"} == expected
+    assert {(section, j) for section, j in reusable if section == "intro"} == {("intro", 0), ("intro", 1)}
+
+
+def test_reusable_lines_without_rendered_iteration(tmp_path):
+    history = ScriptHistory(str(tmp_path))
+    history.record(BASE)
+    assert history.reusable_lines(MODIFIED) == {}
+
+
+def test_history_round_trip(tmp_path):
+    history = ScriptHistory(str(tmp_path))
+    versions = [BASE, INSERTED, MODIFIED, RETITLED, WITHOUT_INTRO]
+    for number, script in enumerate(versions, start=1):
+        assert history.record(script) == number
+    assert history.record(WITHOUT_INTRO) == len(versions)
+    history.mark_rendered(3)
+    history.save()
+
+    loaded = ScriptHistory.load(str(tmp_path))
+    assert [loaded.get(number) for number in range(1, len(versions) + 1)] == versions
+    assert loaded.rendered_iteration == 3
+    with pytest.raises(IndexError):
+        loaded.get(len(versions) + 1)
+
+
+def test_get_returns_copies(tmp_path):
+    history = ScriptHistory(str(tmp_path))
+    history.record(BASE)
+    history.record(MODIFIED)
+    for number in (1, 2):
+        script = history.get(number)
+        script["title"] = "Changed"
+        script["intro"][0]["text"] = "Changed"
+    assert history.get(1) == BASE
+    assert history.get(2) == MODIFIED
+    assert history.base == BASE
+
+
+def test_record_copies_the_script(tmp_path):
+    history = ScriptHistory(str(tmp_path))
+    script = json.loads(json.dumps(BASE))
+    history.record(script)
+    script["discussion"][0]["text"] = "Changed"
+    history.record(script)
+    script["discussion"][1]["text"] = "Changed too"
+    assert history.get(1) == BASE
+    assert history.get(2)["discussion"][1] == BASE["discussion"][1]
+
+
+def test_legacy_iterations_are_imported_in_order(tmp_path):
+    folder = tmp_path / "script_iterations"
+    folder.mkdir()
+    # Numeric order, not name order: 10 comes after 2
+    versions = {1: BASE, 2: INSERTED, 10: MODIFIED}
+    for number, script in versions.items():
+        (folder / f"Ada_Lovelace_script_iteration_{number}.json").write_text(json.dumps(script), encoding="utf-8")
+
+    history = ScriptHistory.load(str(tmp_path))
+    assert history.latest_iteration == 3
+    assert [history.get(number) for number in (1, 2, 3)] == [BASE, INSERTED, MODIFIED]
+    assert history.latest() == MODIFIED
@@ -0,0 +1,93 @@
+import pytest
+
+from tools import ssml_formatting
+from tools.ssml_formatting import Lexicon, format_line
+
+EMPTY = Lexicon({})
+
+CASES = [
+    # Tags already in the script are sent unchanged
+    ('that. <break time="1.5s" /> How', 'that. <break time="1.5s" /> How'),
+    ('In 1815 <break time="0.5s" /> he lost.', 'In eighteen fifteen <break time="0.5s" /> he lost.'),
+    ("[pause 1.5s] Then", '<break time="1.5s" /> Then'),
+    ("[pause] Then", '<break time="0.75s" /> Then'),
+    # Dates and years
+    ("June 18, 1815", "June eighteenth, eighteen fifteen"),
+    ("the 4th of July 1776", "the fourth of July, seventeen seventy-six"),
+    ("December 1843", "December eighteen forty-three"),
+    ("Venice, 1299", "Venice, twelve ninety-nine"),
+    ("It's 1517", "It's fifteen seventeen"),
+    ("your 1936 paper", "your nineteen thirty-six paper"),
+    ("in 1066", "in ten sixty-six"),
+    ("the summer of 1905", "the summer of nineteen oh five"),
+    ("From 1804 to 1815, he ruled.", "From eighteen oh four to eighteen fifteen, he ruled."),
+    ("1804-1815", "eighteen oh four to eighteen fifteen"),
+    ("1939-45", "nineteen thirty-nine to nineteen forty-five"),
+    ("in 2009", "in two thousand nine"),
+    ("'38", "thirty-eight"),
+    ("44 BC", "forty-four BC"),
+    # Quantities stay quantities
+    ("1500 soldiers", "one thousand five hundred soldiers"),
+    ("1,200,000 people", "one million two hundred thousand people"),
+    ("5, 1234 items", "five, one thousand two hundred thirty-four items"),
+    # Decades
+    ("the 1920s", "the nineteen twenties"),
+    ("the 1800s", "the eighteen hundreds"),
+    ("the '60s", "the sixties"),
+    # Currencies and percentages
+    ("$3.50", "three dollars and fifty cents"),
+    ("£1", "one pound"),
+    ("$2 million", "two million dollars"),
+    ("12% more", "twelve percent more"),
+    # Regnal numerals
+    ("Louis XIV", "Louis the Fourteenth"),
+    ("Henry VIII", "Henry the Eighth"),
+    ("World War II", "World War Two"),
+    ("Malcolm X", "Malcolm X"),
+    # Times, ratios, versions and phone numbers
+    ("10:30", "ten thirty"),
+    ("At 9:05 pm", "At nine oh five pm"),
+    ("by 12:00.", "by twelve o'clock."),
+    ("3:2 ratio", "three to two ratio"),
+    ("Version 2.0.1", "Version two point zero point one"),
+    ("Call 555-1234", "Call five five five, one two three four"),
+    # Ordinals and other numbers
+    ("the 21st century", "the twenty-first century"),
+    ("Pi is 3.14", "Pi is three point one four"),
+]
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_format_line(text, expected):
+    assert format_line(text, EMPTY) == (expected, 0)
+
+
+def test_lexicon_alias_and_regnal():
+    lexicon = Lexicon({"Louis": "Loo-ee"})
+    assert format_line("Louis XIV was king.", lexicon) == ("Loo-ee the Fourteenth was king.", 1)
+
+
+def test_lexicon_leaves_tags_alone():
+    lexicon = Lexicon({"time": "TIME"})
+    assert format_line('At that <break time="2s" /> time', lexicon) == ('At that <break time="2s" /> TIME', 1)
+
+
+def test_lexicon_phonemes():
+    lexicon = Lexicon({"Talleyrand": {"ipa": "tal.i.ʁɑ̃", "alias": "Tal-ee-rahn"}})
+    assert format_line("Talleyrand spoke", lexicon, phonemes=True)[0] == '<phoneme alphabet="ipa" ph="tal.i.ʁɑ̃">Talleyrand</phoneme> spoke'
+    assert format_line("Talleyrand spoke", lexicon)[0] == "Tal-ee-rahn spoke"
+
+
+def test_lexicon_longest_whole_word_match():
+    lexicon = Lexicon({"New York": "NY", "York": "Yawk"})
+    assert format_line("New York and Yorkshire and York", lexicon) == ("NY and Yorkshire and Yawk", 2)
+
+
+@pytest.mark.parametrize("style, expected", [
+    ("caps", "It was VERY cold"),
+    ("ssml", 'It was <emphasis level="moderate">very</emphasis> cold'),
+    ("none", "It was very cold"),
+])
+def test_emphasis(monkeypatch, style, expected):
+    monkeypatch.setattr(ssml_formatting, "EMPHASIS_STYLE", style)
+    assert format_line("It was *very* cold", EMPTY)[0] == expected